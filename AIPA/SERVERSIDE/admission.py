@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import config
+from monitoring import metrics
+
+SHED = metrics.REGISTRY.counter("aipa_shed_total", "Messages shed by admission control", ("type", "reason"))
+ADMISSION = metrics.REGISTRY.gauge("aipa_admission", "Admission controller state", ("state",))
+
+class AdmissionController:
+    """Decides which messages get processing time when the server is overloaded.
+
+    Audio queries (msg_type 2) are always admitted and only wait for one of the
+    reserved audio slots. Camera frames (msg_type 1) are thinned per connection,
+    capped in concurrency, charged against a CPU budget, and shed outright while
+    audio is waiting or answers miss their latency target.
+    """
+
+    def __init__(self):
+        self.cores = os.cpu_count() or 1
+        self.condition = threading.Condition()
+
+        # Frame work limits, tightened and relaxed based on audio latency
+        self.max_frame_workers = config.ADMISSION_FRAME_WORKERS
+        self.frame_workers = self.max_frame_workers
+        self.frame_interval = config.FRAME_MIN_INTERVAL
+        self.active_frames = 0
+        self.last_frame_at = {}
+        self.tightened_at = None
+
+        # CPU budget for frames as a token bucket of CPU-seconds
+        self.cpu_rate = config.FRAME_CPU_BUDGET * self.cores
+        self.cpu_tokens = self.cpu_rate
+        self.cpu_refilled_at = time.monotonic()
+
+        # Audio slots
+        self.audio_workers = config.ADMISSION_AUDIO_WORKERS
+        self.active_audio = 0
+        self.waiting_audio = 0
+
+        for state, func in (("frame_workers", lambda: self.frame_workers),
+                            ("frame_interval_seconds", lambda: self.frame_interval),
+                            ("active_frames", lambda: self.active_frames),
+                            ("active_audio", lambda: self.active_audio),
+                            ("waiting_audio", lambda: self.waiting_audio),
+                            ("cpu_tokens", lambda: self.cpu_tokens)):
+            ADMISSION.set_function(func, state=state)
+
+    def _refill(self, now):
+        self.cpu_tokens = min(self.cpu_rate, self.cpu_tokens + (now - self.cpu_refilled_at) * self.cpu_rate)
+        self.cpu_refilled_at = now
+
+    def admit_frame(self, connection):
+        """Returns None if the frame may be processed, otherwise the reason it was shed"""
+        now = time.monotonic()
+
+        with self.condition:
+            if self.tightened_at is not None and now - self.tightened_at > config.ADMISSION_RECOVERY_SECONDS:
+                # No slow answers for a while (or no audio at all): restore full frame capacity
+                self.frame_workers = self.max_frame_workers
+                self.frame_interval = config.FRAME_MIN_INTERVAL
+                self.tightened_at = None
+
+            if self.waiting_audio:
+                reason = "audio_priority"
+            elif now - self.last_frame_at.get(connection, 0.0) < self.frame_interval:
+                reason = "thinned"
+            elif self.active_frames >= self.frame_workers:
+                reason = "busy"
+            else:
+                self._refill(now)
+                reason = "cpu_budget" if self.cpu_tokens <= 0 else None
+
+            if reason is None:
+                self.active_frames += 1
+                self.last_frame_at[connection] = now
+
+        if reason is not None:
+            SHED.inc(type="frame", reason=reason)
+        return reason
+
+    def release_frame(self, cpu_seconds):
+        with self.condition:
+            self.active_frames -= 1
+            self.cpu_tokens -= cpu_seconds
+            self.condition.notify_all()
+
+    def acquire_audio(self):
+        with self.condition:
+            self.waiting_audio += 1
+            try:
+                while self.active_audio >= self.audio_workers:
+                    self.condition.wait()
+            finally:
+                self.waiting_audio -= 1
+            self.active_audio += 1
+
+    def release_audio(self, latency):
+        """Free an audio slot and adapt frame admission to how long the answer took"""
+        with self.condition:
+            self.active_audio -= 1
+
+            if latency > config.AUDIO_LATENCY_TARGET:
+                # Answers are slow: back frames off
+                self.frame_workers = max(1, self.frame_workers - 1)
+                self.frame_interval = min(config.FRAME_MAX_INTERVAL, self.frame_interval * 2)
+                self.tightened_at = time.monotonic()
+            elif latency < config.AUDIO_LATENCY_TARGET / 2:
+                # Plenty of headroom: let frames back in gradually
+                self.frame_workers = min(self.max_frame_workers, self.frame_workers + 1)
+                self.frame_interval = max(config.FRAME_MIN_INTERVAL, self.frame_interval * 0.75)
+
+            self.condition.notify_all()
+
+    def forget(self, connection):
+        with self.condition:
+            self.last_frame_at.pop(connection, None)
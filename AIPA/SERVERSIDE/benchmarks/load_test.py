@@ -0,0 +1,366 @@
+"""End-to-end load test: N simulated Raspberry Pi clients against a local Server.
+
+Run from the SERVERSIDE directory:
+
+    python benchmarks/load_test.py --clients 20 --fps 10 --duration 60 --output results.json
+    python benchmarks/load_test.py --clients 20 --compare results.json
+
+Speech-to-text and text-to-speech are replaced by stubs so no network is needed.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import resource
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+SERVERSIDE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PI_DIR = os.path.join(os.path.dirname(SERVERSIDE_DIR), "raspberry pi")
+sys.path.insert(0, SERVERSIDE_DIR)
+sys.path.insert(1, PI_DIR)
+
+import config
+from monitoring import metrics
+from network_client import NetworkClient
+
+SAMPLE_QUESTIONS = [
+    "what is the quadratic formula",
+    "who is here",
+    "explain gravity",
+    "define a noun",
+    "hello there"
+]
+
+class StubSpeechRecognition:
+    """Stands in for the speech_recognition module"""
+
+    class UnknownValueError(Exception):
+        pass
+
+    class RequestError(Exception):
+        pass
+
+def create_benchmark_server(transcripts, stub_recognizer=False, stt_delay=0.0, tts_delay=0.0):
+    """Build a Server on ephemeral ports with stub STT/TTS backends"""
+    from server import Server
+
+    class BenchmarkServer(Server):
+        def _load_speech_recognition(self):
+            self.speech_recognition = StubSpeechRecognition
+
+        def _load_face_recognizer(self):
+            if stub_recognizer:
+                self.face_recognizer = StubFaceRecognizer()
+            else:
+                Server._load_face_recognizer(self)
+
+        def _transcribe(self, audio_data):
+            # Utterances are tagged with their index in the first two bytes
+            time.sleep(stt_delay)
+            index = struct.unpack("!H", audio_data[:2])[0]
+            return transcripts[index % len(transcripts)]
+
+        def _synthesize_speech(self, text):
+            time.sleep(tts_delay)
+            return b"\x00\x00" * 1600
+
+    return BenchmarkServer(port=0, web_port=0)
+
+class StubFaceRecognizer:
+    def recognize_faces(self, frame_data):
+        return []
+
+class SimulatedClient(NetworkClient):
+    """A NetworkClient that replays frames and utterances and times the server's responses"""
+
+    def __init__(self, server_ip, server_port, frames, utterances, fps, audio_interval):
+        super().__init__(server_ip, server_port)
+        self.frames = frames
+        self.utterances = utterances
+        self.fps = fps
+        self.audio_interval = audio_interval
+        self.pending_lock = threading.Lock()
+        self.pending_audio = []
+        self.latencies = []
+        self.utterances_sent = 0
+        self.audio_responses = 0
+
+    def send_audio(self, audio_data):
+        with self.pending_lock:
+            self.pending_audio.append(time.perf_counter())
+        sent = super().send_audio(audio_data)
+        if sent:
+            self.utterances_sent += 1
+        return sent
+
+    def run(self, duration):
+        threads = []
+        if self.fps > 0 and self.frames:
+            threads.append(threading.Thread(target=self._stream_frames, args=(duration,)))
+        if self.audio_interval > 0 and self.utterances:
+            threads.append(threading.Thread(target=self._stream_audio, args=(duration,)))
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _stream_frames(self, duration):
+        interval = 1.0 / self.fps
+        deadline = time.perf_counter() + duration
+        next_send = time.perf_counter()
+        index = 0
+
+        while self.connected and time.perf_counter() < deadline:
+            self.send_frame(self.frames[index % len(self.frames)])
+            index += 1
+            next_send += interval
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+
+    def _stream_audio(self, duration):
+        deadline = time.perf_counter() + duration
+        index = 0
+
+        while self.connected and time.perf_counter() < deadline:
+            self.send_audio(self.utterances[index % len(self.utterances)])
+            index += 1
+            time.sleep(self.audio_interval)
+
+    def _handle_responses(self):
+        while self.connected:
+            try:
+                header = self._recv_all(5)
+                if not header:
+                    break
+
+                msg_type, data_len = struct.unpack("!BI", header)
+                data = self._recv_all(data_len)
+                if data is None:
+                    break
+
+                if msg_type == 4 and not data.startswith(b"Recognized:"):
+                    # First text answer to the oldest outstanding utterance
+                    with self.pending_lock:
+                        sent_at = self.pending_audio.pop(0) if self.pending_audio else None
+                    if sent_at is not None:
+                        self.latencies.append(time.perf_counter() - sent_at)
+                elif msg_type == 3:
+                    self.audio_responses += 1
+
+            except Exception:
+                break
+
+def load_frames(directory):
+    """Recorded JPEG frames, or a few synthetic ones if none are given"""
+    if directory:
+        paths = sorted(glob.glob(os.path.join(directory, "*.jp*g")))
+        frames = [open(path, "rb").read() for path in paths]
+        if frames:
+            return frames
+
+    try:
+        from PIL import Image
+
+        frames = []
+        for shade in (64, 128, 192):
+            buffer = io.BytesIO()
+            Image.new("RGB", (640, 480), (shade, shade, shade)).save(buffer, format="JPEG")
+            frames.append(buffer.getvalue())
+        return frames
+    except ImportError:
+        # Only usable together with --stub-recognizer
+        return [os.urandom(100 * 1024)]
+
+def load_utterances(directory):
+    """Recorded 16 kHz 16-bit PCM utterances with transcripts (file.pcm + file.txt)"""
+    utterances = []
+    transcripts = []
+
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.pcm")) + glob.glob(os.path.join(directory, "*.raw"))):
+            transcript_path = os.path.splitext(path)[0] + ".txt"
+            if os.path.exists(transcript_path):
+                transcripts.append(open(transcript_path).read().strip())
+            else:
+                transcripts.append(os.path.splitext(os.path.basename(path))[0].replace("_", " "))
+            utterances.append(open(path, "rb").read())
+
+    if not utterances:
+        # Two seconds of silence per question
+        transcripts = list(SAMPLE_QUESTIONS)
+        utterances = [b"\x00\x00" * 32000 for _ in transcripts]
+
+    # Tag each utterance with its index so the stub STT can return the right transcript
+    tagged = [struct.pack("!H", i) + data[2:] for i, data in enumerate(utterances)]
+    return tagged, transcripts
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+def run_benchmark(args):
+    # Keep the benchmark's databases away from the real ones; the knowledge base is
+    # seeded into the scratch copy on startup
+    workdir = tempfile.mkdtemp(prefix="aipa-bench-")
+    config.DATABASE_PATH = os.path.join(workdir, "benchmark.db")
+    config.ARCHIVE_PATH = os.path.join(workdir, "archive")
+    config.KNOWLEDGE_BASE_PATH = os.path.join(workdir, "knowledge_base.db")
+
+    frames = load_frames(args.frames)
+    utterances, transcripts = load_utterances(args.utterances)
+
+    server = create_benchmark_server(transcripts, args.stub_recognizer, args.stt_delay, args.tts_delay)
+    server_thread = threading.Thread(target=server.start, name="benchmark-server")
+    server_thread.daemon = True
+    server_thread.start()
+
+    if not server.startup.wait("socket", 10):
+        raise RuntimeError("Server failed to start")
+    for phase in ("face_model", "speech", "nlp"):
+        server.startup.wait(phase, 60)
+
+    clients = [
+        SimulatedClient("127.0.0.1", server.port, frames, utterances, args.fps, args.audio_interval)
+        for _ in range(args.clients)
+    ]
+    for client in clients:
+        if not client.connect():
+            raise RuntimeError("Simulated client failed to connect")
+
+    frames_received_before = metrics.FRAMES.total()
+    frames_dropped_before = metrics.FRAMES_DROPPED.total()
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+
+    client_threads = [threading.Thread(target=client.run, args=(args.duration,)) for client in clients]
+    for thread in client_threads:
+        thread.daemon = True
+        thread.start()
+    for thread in client_threads:
+        thread.join()
+
+    # Give in-flight answers a moment to arrive
+    time.sleep(args.drain)
+
+    wall = time.perf_counter() - wall_start
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_seconds = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+
+    frames_received = metrics.FRAMES.total() - frames_received_before
+    frames_dropped = metrics.FRAMES_DROPPED.total() - frames_dropped_before
+
+    for client in clients:
+        client.disconnect()
+    server.stop()
+
+    latencies = [latency for client in clients for latency in client.latencies]
+    utterances_sent = sum(client.utterances_sent for client in clients)
+    frames_sent = sum(client.frames_sent for client in clients)
+
+    return {
+        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'parameters': {
+            'clients': args.clients,
+            'fps': args.fps,
+            'audio_interval': args.audio_interval,
+            'duration': args.duration,
+            'stub_recognizer': args.stub_recognizer,
+            'stt_delay': args.stt_delay,
+            'tts_delay': args.tts_delay
+        },
+        'wall_seconds': wall,
+        'response_latency': {
+            'count': len(latencies),
+            'unanswered': utterances_sent - len(latencies),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None
+        },
+        'frames': {
+            'sent': frames_sent,
+            'received': frames_received,
+            'processed': frames_received - frames_dropped,
+            'dropped': frames_dropped,
+            'unreceived': frames_sent - frames_received
+        },
+        'cpu': {
+            'seconds': cpu_seconds,
+            'utilization': cpu_seconds / wall if wall else 0.0,
+            'per_client_seconds': cpu_seconds / args.clients if args.clients else 0.0
+        }
+    }
+
+def compare(results, baseline):
+    """Print the change of the headline numbers against a previous run"""
+    rows = [
+        ("p50 latency", results['response_latency']['p50'], baseline['response_latency']['p50']),
+        ("p95 latency", results['response_latency']['p95'], baseline['response_latency']['p95']),
+        ("p99 latency", results['response_latency']['p99'], baseline['response_latency']['p99']),
+        ("frames processed", results['frames']['processed'], baseline['frames']['processed']),
+        ("frames dropped", results['frames']['dropped'], baseline['frames']['dropped']),
+        ("CPU per client", results['cpu']['per_client_seconds'], baseline['cpu']['per_client_seconds'])
+    ]
+
+    for name, current, previous in rows:
+        if current is None or previous is None:
+            print(f"{name:>18}: {current} (baseline {previous})")
+            continue
+        change = (current - previous) / previous * 100 if previous else 0.0
+        print(f"{name:>18}: {current:.4f} (baseline {previous:.4f}, {change:+.1f}%)")
+
+def print_report(results):
+    latency = results['response_latency']
+    frames = results['frames']
+    cpu = results['cpu']
+
+    def ms(value):
+        return f"{value * 1000:.1f} ms" if value is not None else "n/a"
+
+    print(f"Clients: {results['parameters']['clients']}, wall time {results['wall_seconds']:.1f} s")
+    print(f"Responses: {latency['count']} (unanswered {latency['unanswered']}), "
+          f"p50 {ms(latency['p50'])}, p95 {ms(latency['p95'])}, p99 {ms(latency['p99'])}")
+    print(f"Frames: sent {frames['sent']}, processed {frames['processed']}, dropped {frames['dropped']}, "
+          f"not yet received {frames['unreceived']}")
+    print(f"CPU: {cpu['seconds']:.2f} s ({cpu['utilization'] * 100:.0f}% of one core), "
+          f"{cpu['per_client_seconds']:.3f} s per client")
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-client end-to-end load test")
+    parser.add_argument("--clients", type=int, default=10, help="number of simulated Pis")
+    parser.add_argument("--fps", type=float, default=10.0, help="frames per second per client")
+    parser.add_argument("--audio-interval", type=float, default=5.0, help="seconds between utterances per client")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to stream")
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for outstanding answers")
+    parser.add_argument("--frames", help="directory of recorded JPEG frames")
+    parser.add_argument("--utterances", help="directory of recorded .pcm utterances with .txt transcripts")
+    parser.add_argument("--stub-recognizer", action="store_true", help="skip face recognition (protocol overhead only)")
+    parser.add_argument("--stt-delay", type=float, default=0.0, help="simulated STT latency in seconds")
+    parser.add_argument("--tts-delay", type=float, default=0.0, help="simulated TTS latency in seconds")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="compare against a previous JSON result")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
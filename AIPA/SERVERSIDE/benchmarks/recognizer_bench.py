@@ -0,0 +1,233 @@
+"""Micro-benchmarks for FaceRecognizer across gallery sizes and faces per frame.
+
+Run from the SERVERSIDE directory:
+
+    python benchmarks/recognizer_bench.py --gallery-sizes 100 1000 10000 100000 --faces 0 1 5 20 40
+    python benchmarks/recognizer_bench.py --face-image sample_face.jpg --output recognizer.json
+
+Galleries are synthetic 128-d encodings. With --face-image the frames contain real, detectable
+faces; without it detection runs on empty frames and encoding uses synthetic face boxes.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+SERVERSIDE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVERSIDE_DIR)
+
+import numpy as np
+from PIL import Image
+
+import config
+
+ENCODING_SIZE = 128
+FRAME_SIZE = (640, 480)
+TOLERANCE = 0.6
+
+def make_gallery(size, seed=0):
+    """Synthetic gallery encodings shaped like dlib's (unit-ish 128-d vectors)"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.09, (size, ENCODING_SIZE))
+    names = [f"S_{i:06d}" for i in range(size)]
+    return list(encodings), names
+
+def make_queries(gallery, count, seed=1):
+    """Face encodings close to random gallery members, as a live camera would produce"""
+    rng = np.random.default_rng(seed)
+    if count == 0 or not gallery:
+        return []
+    picks = rng.integers(0, len(gallery), count)
+    return [gallery[i] + rng.normal(0.0, 0.02, ENCODING_SIZE) for i in picks]
+
+def face_grid(count):
+    """Non-overlapping (top, right, bottom, left) boxes for up to 40 faces in a 640x480 frame"""
+    columns, rows = 8, 5
+    width, height = FRAME_SIZE[0] // columns, FRAME_SIZE[1] // rows
+    boxes = []
+    for i in range(count):
+        row, column = divmod(i, columns)
+        top, left = row * height, column * width
+        boxes.append((top, left + width, top + height, left))
+    return boxes
+
+def make_frame(face_count, face_image=None):
+    """JPEG frame with face_count faces pasted on a grid (plain noise when no face image is given)"""
+    rng = np.random.default_rng(face_count)
+    pixels = rng.integers(0, 255, (FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8)
+    frame = Image.fromarray(pixels)
+
+    if face_image is not None:
+        for top, right, bottom, left in face_grid(face_count):
+            frame.paste(face_image.resize((right - left, bottom - top)), (left, top))
+
+    buffer = io.BytesIO()
+    frame.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+def time_call(func, *args, repeat=5):
+    """Median wall time of func(*args) and its last result"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], result
+
+# Matching strategies compared side by side
+
+def match_compare_faces(recognizer, gallery_matrix, face_encodings):
+    """What recognize_faces does today: compare_faces + face_distance per face"""
+    return recognizer._match_faces(face_encodings)
+
+def match_numpy_loop(recognizer, gallery_matrix, face_encodings):
+    """One vectorized distance computation per face against the stacked gallery"""
+    names = []
+    for encoding in face_encodings:
+        distances = np.linalg.norm(gallery_matrix - encoding, axis=1)
+        best = int(np.argmin(distances))
+        if distances[best] <= TOLERANCE and recognizer.known_face_names[best] not in names:
+            names.append(recognizer.known_face_names[best])
+    return names
+
+def match_numpy_batched(recognizer, gallery_matrix, face_encodings, gallery_norms=None):
+    """All faces at once: |a - b|^2 = |a|^2 + |b|^2 - 2ab as a single matrix product"""
+    if not face_encodings:
+        return []
+    if gallery_norms is None:
+        gallery_norms = np.einsum("ij,ij->i", gallery_matrix, gallery_matrix)
+
+    queries = np.asarray(face_encodings)
+    squared = gallery_norms[None, :] + np.einsum("ij,ij->i", queries, queries)[:, None] - 2.0 * queries @ gallery_matrix.T
+    best = np.argmin(squared, axis=1)
+    best_distances = np.sqrt(np.maximum(squared[np.arange(len(best)), best], 0.0))
+
+    names = []
+    for index, distance in zip(best, best_distances):
+        name = recognizer.known_face_names[index]
+        if distance <= TOLERANCE and name not in names:
+            names.append(name)
+    return names
+
+STRATEGIES = {
+    'compare_faces': match_compare_faces,
+    'numpy_loop': match_numpy_loop,
+    'numpy_batched': match_numpy_batched
+}
+
+def _measure_load(embeddings_path, queue):
+    """Child process: time load_model() and report its peak RSS"""
+    config.EMBEDDINGS_PATH = embeddings_path
+    from face_recognition.recognizer import FaceRecognizer
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    recognizer = FaceRecognizer()
+    start = time.perf_counter()
+    recognizer.load_model()
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in kilobytes on Linux
+    queue.put({'load_seconds': elapsed, 'peak_rss_kb': peak_rss, 'load_rss_kb': peak_rss - baseline_rss})
+
+def measure_load(recognizer, embeddings_path):
+    recognizer._save_encodings()
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure_load, args=(embeddings_path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def run_benchmarks(args):
+    from face_recognition.recognizer import FaceRecognizer
+
+    face_image = Image.open(args.face_image).convert("RGB") if args.face_image else None
+    frames = {count: make_frame(count, face_image) for count in args.faces}
+    workdir = tempfile.mkdtemp(prefix="aipa-recognizer-bench-")
+    config.EMBEDDINGS_PATH = workdir
+
+    results = {'parameters': vars(args), 'frames': [], 'galleries': []}
+
+    # Decode, detection and encoding do not depend on the gallery
+    recognizer = FaceRecognizer()
+    for count, frame_data in frames.items():
+        decode_time, image = time_call(recognizer._decode_frame, frame_data, repeat=args.repeat)
+        detect_time, locations = time_call(recognizer._detect_faces, image, repeat=args.repeat)
+        faces_detected = len(locations)
+        if face_image is None:
+            locations = face_grid(count)
+        encode_time, _ = time_call(recognizer._encode_faces, image, locations, repeat=args.repeat)
+
+        results['frames'].append({
+            'faces': count,
+            'frame_bytes': len(frame_data),
+            'faces_detected': faces_detected,
+            'decode_seconds': decode_time,
+            'detect_seconds': detect_time,
+            'encode_seconds': encode_time
+        })
+        print(f"{count:>3} faces: decode {decode_time * 1000:7.2f} ms, detect {detect_time * 1000:8.2f} ms, "
+              f"encode {encode_time * 1000:8.2f} ms")
+
+    for size in args.gallery_sizes:
+        recognizer = FaceRecognizer()
+        recognizer.known_face_encodings, recognizer.known_face_names = make_gallery(size)
+        recognizer.model_loaded = True
+        gallery_matrix = np.asarray(recognizer.known_face_encodings)
+
+        entry = {'gallery_size': size, 'matching': []}
+        entry.update(measure_load(recognizer, workdir))
+
+        # add_person rewrites the whole encodings file every time
+        entry['add_person_save_seconds'], _ = time_call(recognizer._save_encodings, repeat=args.repeat)
+
+        print(f"gallery {size:>6}: load {entry['load_seconds'] * 1000:8.1f} ms, "
+              f"load RSS {entry['load_rss_kb'] / 1024:7.1f} MB, add_person save {entry['add_person_save_seconds'] * 1000:8.1f} ms")
+
+        for count in args.faces:
+            queries = make_queries(recognizer.known_face_encodings, count)
+            row = {'faces': count}
+            for name in args.strategies:
+                seconds, matched = time_call(STRATEGIES[name], recognizer, gallery_matrix, queries, repeat=args.repeat)
+                row[name] = seconds
+                row[name + '_matched'] = len(matched)
+            entry['matching'].append(row)
+
+            timings = ", ".join(f"{name} {row[name] * 1000:9.3f} ms" for name in args.strategies)
+            print(f"    match {count:>3} faces: {timings}")
+
+        results['galleries'].append(entry)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="FaceRecognizer micro-benchmarks")
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--faces", type=int, nargs="+", default=[0, 1, 5, 10, 20, 40], help="faces per frame (max 40)")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--face-image", help="cropped face photo pasted into the synthetic frames")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is reported)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if any(count > 40 or count < 0 for count in args.faces):
+        parser.error("--faces must be between 0 and 40")
+
+    results = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import itertools
+import socket
+import threading
+import time
+import sys
+sys.path.append('..')
+import config
+from cluster import protocol
+from cluster.frame_ring import SharedFrame
+from monitoring import metrics
+
+JOBS = metrics.REGISTRY.counter("aipa_cluster_jobs_total", "Jobs dispatched to worker nodes", ("type", "outcome"))
+WORKER_LOAD = metrics.REGISTRY.gauge("aipa_cluster_worker_load", "In-flight jobs per worker node", ("worker",))
+HEALTHY_WORKERS = metrics.REGISTRY.gauge("aipa_cluster_healthy_workers", "Worker nodes currently accepting jobs")
+
+class ClusterError(Exception):
+    pass
+
+class _PendingJob:
+    def __init__(self):
+        self.event = threading.Event()
+        self.meta = None
+        self.data = b''
+        self.lost = False
+        self.on_finish = None  # set when the caller gave up waiting, see WorkerHandle.discard
+
+class WorkerHandle:
+    """Front-end side of the job connection to one worker node"""
+
+    def __init__(self, worker_id, host, port, capacity, jobs, local=False):
+        self.worker_id = worker_id
+        self.address = (host, port)
+        self.capacity = max(1, capacity)
+        self.jobs = set(jobs)
+        self.local = local  # same host, so it can read frames from shared memory
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.reported_active = 0
+        self.last_heartbeat = time.monotonic()
+        self.healthy = False
+
+    @property
+    def load(self):
+        """Share of capacity in use, counting jobs we have sent and jobs the worker reports"""
+        with self.lock:
+            return max(len(self.pending), self.reported_active) / self.capacity
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, timeout=config.CLUSTER_WORKER_TIMEOUT)
+        self.sock.settimeout(None)
+        self.healthy = True
+
+        reader = threading.Thread(target=self._read_results, args=(self.sock,), name=f"cluster-{self.worker_id}")
+        reader.daemon = True
+        reader.start()
+
+    def submit(self, job_id, meta, data):
+        job = _PendingJob()
+        with self.lock:
+            self.pending[job_id] = job
+        WORKER_LOAD.set(len(self.pending), worker=self.worker_id)
+
+        try:
+            protocol.send_message(self.sock, protocol.JOB, job_id, meta, data, lock=self.send_lock)
+        except OSError:
+            self.close()
+        return job
+
+    def discard(self, job_id, on_finish=None):
+        """Stop waiting for a job; on_finish runs once the worker answers it anyway or is lost"""
+        with self.lock:
+            job = self.pending.get(job_id) if on_finish else self.pending.pop(job_id, None)
+            if job is not None:
+                job.on_finish = on_finish
+        if on_finish is not None and job is None:
+            # The result or the loss came in while the caller was timing out
+            on_finish()
+
+    def close(self, sock=None):
+        """Mark the worker down and fail its in-flight jobs so they are retried elsewhere"""
+        if sock is not None and sock is not self.sock:
+            # A connection that has already been replaced
+            sock.close()
+            return
+
+        self.healthy = False
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending.clear()
+
+        for job in pending:
+            job.lost = True
+            job.event.set()
+            if job.on_finish is not None:
+                job.on_finish()
+        WORKER_LOAD.set(0, worker=self.worker_id)
+
+    def _read_results(self, sock):
+        try:
+            while self.healthy:
+                message = protocol.recv_message(sock)
+                if message is None:
+                    break
+
+                kind, job_id, meta, data = message
+                if kind != protocol.RESULT:
+                    continue
+
+                with self.lock:
+                    job = self.pending.pop(job_id, None)
+                    in_flight = len(self.pending)
+                WORKER_LOAD.set(in_flight, worker=self.worker_id)
+
+                if job is not None:
+                    job.meta = meta or {}
+                    job.data = data
+                    job.event.set()
+                    if job.on_finish is not None:
+                        job.on_finish()
+        except OSError:
+            pass
+        finally:
+            if self.healthy and sock is self.sock:
+                print(f"Lost job connection to worker {self.worker_id}")
+            self.close(sock)
+
+class Coordinator:
+    """Tracks worker nodes (registration, heartbeats, load) and dispatches jobs to the least loaded one"""
+
+    def __init__(self, port=None, frame_ring=None):
+        self.port = port if port is not None else config.COORDINATOR_PORT
+        self.frame_ring = frame_ring
+        self.host_id = socket.gethostname()
+        self.server_socket = None
+        self.running = False
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.job_ids = itertools.count(1)
+
+        HEALTHY_WORKERS.set_function(lambda: len(self._healthy_workers()))
+
+    def start(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(16)
+        self.port = self.server_socket.getsockname()[1]
+        self.running = True
+        print(f"Coordinator listening for workers on port {self.port}")
+
+        for target, name in ((self._accept_workers, "coordinator"), (self._monitor_health, "coordinator-health")):
+            thread = threading.Thread(target=target, name=name)
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.server_socket:
+            self.server_socket.close()
+        with self.lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.close()
+
+    def _accept_workers(self):
+        while self.running:
+            try:
+                conn, address = self.server_socket.accept()
+            except OSError:
+                break
+
+            thread = threading.Thread(target=self._serve_worker, args=(conn, address),
+                                      name=f"coordinator-{address[0]}:{address[1]}")
+            thread.daemon = True
+            thread.start()
+
+    def _serve_worker(self, conn, address):
+        worker = None
+
+        try:
+            while self.running:
+                message = protocol.recv_message(conn)
+                if message is None:
+                    break
+
+                kind, job_id, meta, data = message
+                if kind == protocol.REGISTER:
+                    worker = self._register(meta)
+                elif kind == protocol.HEARTBEAT and worker is not None:
+                    with worker.lock:
+                        worker.reported_active = meta.get('active', 0)
+                    worker.last_heartbeat = time.monotonic()
+
+                    if not worker.healthy:
+                        # Still alive but its job connection dropped: bring it back into rotation
+                        self._reconnect(worker)
+        except (OSError, ValueError) as e:
+            print(f"Worker control connection from {address} failed: {str(e)}")
+        finally:
+            conn.close()
+
+    def _register(self, meta):
+        local = self.frame_ring is not None and meta.get('host_id') == self.host_id
+        worker = WorkerHandle(meta['worker_id'], meta['host'], meta['port'], meta.get('capacity', 1),
+                              meta.get('jobs', []), local)
+
+        with self.lock:
+            previous = self.workers.get(worker.worker_id)
+            self.workers[worker.worker_id] = worker
+        if previous is not None:
+            previous.close()
+
+        if self._reconnect(worker):
+            print(f"Worker {worker.worker_id} registered at {worker.address[0]}:{worker.address[1]} "
+                  f"(capacity {worker.capacity}, jobs: {', '.join(sorted(worker.jobs))}"
+                  f"{', shared memory' if worker.local else ''})")
+        return worker
+
+    def _reconnect(self, worker):
+        try:
+            worker.connect()
+            return True
+        except OSError as e:
+            print(f"Could not connect to worker {worker.worker_id}: {str(e)}")
+            return False
+
+    def _monitor_health(self):
+        while self.running:
+            time.sleep(config.CLUSTER_HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+
+            with self.lock:
+                workers = list(self.workers.values())
+
+            for worker in workers:
+                if worker.healthy and now - worker.last_heartbeat > config.CLUSTER_WORKER_TIMEOUT:
+                    print(f"Worker {worker.worker_id} missed heartbeats, taking it out of rotation")
+                    worker.close()
+
+    def _healthy_workers(self, job_type=None):
+        with self.lock:
+            return [w for w in self.workers.values() if w.healthy and (job_type is None or job_type in w.jobs)]
+
+    def wait_for_workers(self, timeout=None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self._healthy_workers():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def submit(self, job_type, data=b'', meta=None, timeout=None):
+        """Run a job on the least loaded healthy worker, retrying elsewhere if that worker is lost.
+
+        data may be a SharedFrame: local workers then get only its slot description,
+        remote ones a copy of the bytes. Returns (result_meta, result_data).
+        Raises ClusterError if no worker could finish the job.
+        """
+        timeout = timeout or config.CLUSTER_JOB_TIMEOUT
+        job_meta = dict(meta or {}, type=job_type)
+        tried = set()
+
+        for attempt in range(config.CLUSTER_JOB_RETRIES + 1):
+            candidates = [w for w in self._healthy_workers(job_type) if w.worker_id not in tried]
+            if not candidates:
+                break
+
+            worker = min(candidates, key=lambda w: w.load)
+            tried.add(worker.worker_id)
+
+            payload_meta, payload = job_meta, data
+            if isinstance(data, SharedFrame):
+                if worker.local:
+                    payload_meta, payload = dict(job_meta, frame=data.describe()), b''
+                else:
+                    payload = data.tobytes()
+
+            job_id = next(self.job_ids) % 0xFFFFFFFF
+            job = worker.submit(job_id, payload_meta, payload)
+
+            if not job.event.wait(timeout):
+                if isinstance(data, SharedFrame) and worker.local:
+                    # The worker may still be reading the slot: it stays taken until the
+                    # worker is done with it, and further attempts get a copy of the frame
+                    copy = data.tobytes()
+                    worker.discard(job_id, on_finish=data.detach().release)
+                    data = copy
+                else:
+                    worker.discard(job_id)
+                JOBS.inc(type=job_type, outcome="timeout")
+                continue
+            if job.lost:
+                JOBS.inc(type=job_type, outcome="retried")
+                continue
+
+            JOBS.inc(type=job_type, outcome="error" if 'error' in job.meta else "ok")
+            return job.meta, job.data
+
+        JOBS.inc(type=job_type, outcome="failed")
+        raise ClusterError(f"No worker could run the {job_type} job")
+
+    def get_status(self):
+        with self.lock:
+            workers = list(self.workers.values())
+
+        now = time.monotonic()
+        return [{
+            'worker_id': w.worker_id,
+            'address': f"{w.address[0]}:{w.address[1]}",
+            'healthy': w.healthy,
+            'capacity': w.capacity,
+            'load': w.load,
+            'jobs': sorted(w.jobs),
+            'seconds_since_heartbeat': now - w.last_heartbeat
+        } for w in workers]
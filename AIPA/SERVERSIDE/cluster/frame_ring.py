@@ -0,0 +1,127 @@
+import queue
+from multiprocessing import shared_memory, resource_tracker
+import sys
+sys.path.append('..')
+import config
+
+class SharedFrame:
+    """A frame that lives in a FrameRing slot; only (ring, slot, length) ever crosses a process boundary"""
+
+    def __init__(self, ring, slot, length):
+        self.ring = ring
+        self.slot = slot
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def view(self):
+        return self.ring.view(self.slot, self.length)
+
+    def tobytes(self):
+        return bytes(self.view())
+
+    def describe(self):
+        return {'ring': self.ring.name, 'slots': self.ring.slots, 'slot_size': self.ring.slot_size,
+                'slot': self.slot, 'length': self.length}
+
+    def detach(self):
+        """Hand the slot over to a new SharedFrame; releasing this one no longer frees it"""
+        frame = SharedFrame(self.ring, self.slot, self.length)
+        self.ring = None
+        return frame
+
+    def release(self):
+        if self.ring is not None:
+            self.ring.release(self.slot)
+            self.ring = None
+
+class FrameRing:
+    """Fixed-size frame slots in one shared-memory block.
+
+    The front-end owns the ring and hands out free slots; connection handlers receive
+    frames straight into a slot and workers on the same host read them in place.
+    """
+
+    def __init__(self, slots=None, slot_size=None, name=None, create=True):
+        self.slots = slots or config.FRAME_RING_SLOTS
+        self.slot_size = slot_size or config.FRAME_SLOT_SIZE
+        self.owner = create
+
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_size)
+            self.free = queue.Queue()
+            for slot in range(self.slots):
+                self.free.put(slot)
+        else:
+            # Attached rings belong to the front-end; this process's resource tracker
+            # must not unlink the block when the worker exits
+            if sys.version_info >= (3, 13):
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            else:
+                self.shm = shared_memory.SharedMemory(name=name)
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            self.free = None
+
+        self.name = self.shm.name
+
+    @classmethod
+    def attach(cls, name, slots, slot_size):
+        return cls(slots, slot_size, name=name, create=False)
+
+    def describe(self):
+        return {'ring': self.name, 'slots': self.slots, 'slot_size': self.slot_size}
+
+    def acquire(self):
+        """A free slot index, or None when every slot is in use"""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot):
+        self.free.put(slot)
+
+    def free_slots(self):
+        return self.free.qsize() if self.free is not None else 0
+
+    def view(self, slot, length):
+        offset = slot * self.slot_size
+        return self.shm.buf[offset:offset + length]
+
+    def recv_frame(self, sock, length):
+        """Receive a frame of the given length straight into a free slot.
+
+        Returns a SharedFrame, None if the peer closed the connection, or False if the
+        frame is empty, does not fit or no slot is free (the caller then falls back to
+        bytes). An empty SharedFrame would be falsy and end the connection without
+        its slot being released.
+        """
+        if length == 0 or length > self.slot_size:
+            return False
+
+        slot = self.acquire()
+        if slot is None:
+            return False
+
+        view = self.view(slot, length)
+        received = 0
+        try:
+            while received < length:
+                count = sock.recv_into(view[received:], length - received)
+                if not count:
+                    self.release(slot)
+                    return None
+                received += count
+        except OSError:
+            self.release(slot)
+            raise
+        finally:
+            view.release()
+
+        return SharedFrame(self, slot, length)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
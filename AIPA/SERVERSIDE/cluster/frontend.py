@@ -0,0 +1,96 @@
+import sys
+sys.path.append('..')
+from server import Server
+from cluster.coordinator import Coordinator, ClusterError
+from cluster.frame_ring import FrameRing, SharedFrame
+import config
+from monitoring import metrics
+
+RING_FALLBACKS = metrics.REGISTRY.counter(
+    "aipa_frame_ring_fallbacks_total", "Frames received as bytes because no shared-memory slot was usable")
+
+class RemoteSpeechErrors:
+    """Exception types raised for STT failures reported by a worker"""
+
+    class UnknownValueError(Exception):
+        pass
+
+    class RequestError(Exception):
+        pass
+
+class FrontEndServer(Server):
+    """Terminates Pi connections and hands recognition, STT and TTS jobs to worker nodes.
+
+    Connection handling, admission control, intents, queries, the response cache and all
+    database writes stay here; each job's result returns to the connection that sent it.
+    """
+
+    def __init__(self, port=None, web_port=None, coordinator_port=None):
+        super().__init__(port, web_port)
+        self.frame_ring = FrameRing() if config.FRAME_RING_SLOTS else None
+        self.coordinator = Coordinator(coordinator_port, self.frame_ring)
+
+        if self.frame_ring is not None:
+            metrics.QUEUE_DEPTH.set_function(
+                lambda: self.frame_ring.slots - self.frame_ring.free_slots(), queue="frame_ring_slots_in_use")
+
+    def start(self):
+        self.coordinator.start()
+        super().start()
+
+    def stop(self):
+        super().stop()
+        self.coordinator.stop()
+        if self.frame_ring is not None:
+            self.frame_ring.close()
+
+    def _recv_payload(self, sock, msg_type, n):
+        # Frames go straight from the socket into a shared-memory slot
+        if msg_type == 1 and self.frame_ring is not None:
+            frame = self.frame_ring.recv_frame(sock, n)
+            if frame is not False:
+                return frame
+            RING_FALLBACKS.inc()
+        return self._recv_all(sock, n)
+
+    def _release_payload(self, data):
+        # Recognition has finished (or the frame was shed): recycle the slot
+        if isinstance(data, SharedFrame):
+            data.release()
+
+    def _load_face_recognizer(self):
+        # The face gallery lives on the workers
+        pass
+
+    def _load_speech_recognition(self):
+        self.speech_recognition = RemoteSpeechErrors
+
+    def _recognize(self, frame_data):
+        try:
+            meta, _ = self.coordinator.submit('recognize', frame_data)
+        except ClusterError:
+            metrics.FRAMES_DROPPED.inc(reason="no_worker")
+            return []
+
+        if 'error' in meta:
+            print(f"Remote recognition failed: {meta.get('message')}")
+            return []
+        return meta['names']
+
+    def _transcribe(self, audio_data):
+        try:
+            meta, _ = self.coordinator.submit('transcribe', audio_data)
+        except ClusterError as e:
+            raise RemoteSpeechErrors.RequestError(str(e))
+
+        if meta.get('error') == 'unknown_value':
+            raise RemoteSpeechErrors.UnknownValueError()
+        if 'error' in meta:
+            raise RemoteSpeechErrors.RequestError(meta.get('message', meta['error']))
+        return meta['text']
+
+    def _synthesize_speech(self, text):
+        meta, audio_data = self.coordinator.submit('synthesize', meta={'text': text})
+        if 'error' in meta:
+            raise RuntimeError(meta.get('message', meta['error']))
+        return audio_data
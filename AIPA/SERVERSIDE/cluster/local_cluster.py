@@ -0,0 +1,50 @@
+"""Run a front-end and several worker processes on localhost.
+
+Run from the SERVERSIDE directory:
+
+    python cluster/local_cluster.py --workers 3
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SERVERSIDE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVERSIDE_DIR)
+
+import config
+from cluster.frontend import FrontEndServer
+
+def spawn_workers(count, coordinator_port, capacity=None):
+    workers = []
+    for _ in range(count):
+        command = [sys.executable, "server.py", "--mode", "worker", "--coordinator", f"127.0.0.1:{coordinator_port}"]
+        if capacity:
+            command += ["--capacity", str(capacity)]
+        workers.append(subprocess.Popen(command, cwd=SERVERSIDE_DIR))
+    return workers
+
+def main():
+    parser = argparse.ArgumentParser(description="Local front-end plus worker processes")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--capacity", type=int, help="concurrent jobs per worker")
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--coordinator-port", type=int, default=config.COORDINATOR_PORT)
+    args = parser.parse_args()
+
+    frontend = FrontEndServer(args.port, coordinator_port=args.coordinator_port)
+    workers = spawn_workers(args.workers, args.coordinator_port, args.capacity)
+
+    try:
+        frontend.start()
+    except KeyboardInterrupt:
+        print("Shutting down local cluster...")
+        frontend.stop()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=5)
+
+if __name__ == "__main__":
+    main()
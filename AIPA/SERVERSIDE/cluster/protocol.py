@@ -0,0 +1,55 @@
+import json
+import struct
+
+# Header: message kind, job id, metadata length, payload length
+HEADER = struct.Struct("!BIII")
+
+REGISTER = 1   # worker -> coordinator: worker id, job address, capacity
+HEARTBEAT = 2  # worker -> coordinator: current load
+JOB = 3        # front-end -> worker: job type and payload
+RESULT = 4     # worker -> front-end: result metadata and payload
+
+def send_message(sock, kind, job_id=0, meta=None, data=b'', lock=None):
+    """Send one message; pass a lock when several threads share the socket"""
+    meta_bytes = json.dumps(meta).encode('utf-8') if meta is not None else b''
+    message = HEADER.pack(kind, job_id, len(meta_bytes), len(data)) + meta_bytes + data
+
+    if lock is None:
+        sock.sendall(message)
+    else:
+        with lock:
+            sock.sendall(message)
+
+def recv_message(sock):
+    """Returns (kind, job_id, meta, data), or None when the peer has closed the connection"""
+    header = _recv_all(sock, HEADER.size)
+    if header is None:
+        return None
+
+    kind, job_id, meta_len, data_len = HEADER.unpack(header)
+
+    meta = None
+    if meta_len:
+        meta_bytes = _recv_all(sock, meta_len)
+        if meta_bytes is None:
+            return None
+        meta = json.loads(meta_bytes.decode('utf-8'))
+
+    data = b''
+    if data_len:
+        data = _recv_all(sock, data_len)
+        if data is None:
+            return None
+
+    return kind, job_id, meta, data
+
+def _recv_all(sock, n):
+    chunks = []
+    remaining = n
+    while remaining:
+        packet = sock.recv(remaining)
+        if not packet:
+            return None
+        chunks.append(packet)
+        remaining -= len(packet)
+    return b''.join(chunks)
@@ -0,0 +1,191 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import sys
+sys.path.append('..')
+import config
+from cluster import protocol
+from cluster.frame_ring import FrameRing
+from nlp import speech
+
+class RecognitionWorker:
+    """Worker node that runs recognition, speech-to-text and text-to-speech jobs for a front-end"""
+
+    def __init__(self, port=0, coordinator_address=None, capacity=None, worker_id=None):
+        self.port = port
+        self.coordinator_address = coordinator_address or (config.COORDINATOR_HOST, config.COORDINATOR_PORT)
+        self.capacity = capacity or config.WORKER_CAPACITY
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.server_socket = None
+        self.running = False
+        self.executor = ThreadPoolExecutor(self.capacity, thread_name_prefix="worker-job")
+
+        # Load statistics reported in heartbeats
+        self.lock = threading.Lock()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+        self.face_recognizer = None
+        self.speech_recognition = None
+        self.frame_rings = {}
+        self.handlers = {
+            'recognize': self._recognize,
+            'transcribe': self._transcribe,
+            'synthesize': self._synthesize
+        }
+
+    def start(self):
+        # Load everything before registering, so the coordinator only sees ready workers
+        self._load_subsystems()
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(5)
+        self.port = self.server_socket.getsockname()[1]
+        self.running = True
+        print(f"Worker {self.worker_id} listening on port {self.port}")
+
+        heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat")
+        heartbeat_thread.daemon = True
+        heartbeat_thread.start()
+
+        while self.running:
+            try:
+                conn, address = self.server_socket.accept()
+                print(f"Front-end connected from {address}")
+
+                conn_thread = threading.Thread(target=self._serve_connection, args=(conn,),
+                                               name=f"frontend-{address[0]}:{address[1]}")
+                conn_thread.daemon = True
+                conn_thread.start()
+            except Exception as e:
+                if self.running:
+                    print(f"Error accepting front-end connection: {str(e)}")
+
+    def stop(self):
+        self.running = False
+        if self.server_socket:
+            self.server_socket.close()
+        self.executor.shutdown(wait=False)
+        for ring in self.frame_rings.values():
+            ring.close()
+        print(f"Worker {self.worker_id} stopped")
+
+    def _load_subsystems(self):
+        try:
+            from face_recognition.recognizer import FaceRecognizer
+
+            self.face_recognizer = FaceRecognizer()
+            self.face_recognizer.load_model()
+        except Exception as e:
+            print(f"Face recognition unavailable on this worker: {str(e)}")
+            self.handlers.pop('recognize')
+
+        try:
+            import speech_recognition
+            self.speech_recognition = speech_recognition
+        except ImportError as e:
+            print(f"Speech recognition unavailable on this worker: {str(e)}")
+            self.handlers.pop('transcribe')
+
+    def _heartbeat_loop(self):
+        """Register with the coordinator and keep reporting load; reconnect if it goes away"""
+        while self.running:
+            try:
+                sock = socket.create_connection(self.coordinator_address, timeout=config.CLUSTER_WORKER_TIMEOUT)
+                protocol.send_message(sock, protocol.REGISTER, meta={
+                    'worker_id': self.worker_id,
+                    'host': config.WORKER_HOST,
+                    'host_id': socket.gethostname(),
+                    'port': self.port,
+                    'capacity': self.capacity,
+                    'jobs': sorted(self.handlers)
+                })
+
+                while self.running:
+                    protocol.send_message(sock, protocol.HEARTBEAT, meta=self.get_load())
+                    time.sleep(config.CLUSTER_HEARTBEAT_INTERVAL)
+            except OSError as e:
+                print(f"Coordinator unreachable ({str(e)}), retrying")
+                time.sleep(config.CLUSTER_HEARTBEAT_INTERVAL)
+
+    def get_load(self):
+        with self.lock:
+            return {'active': self.active, 'completed': self.completed, 'failed': self.failed}
+
+    def _serve_connection(self, conn):
+        send_lock = threading.Lock()
+
+        try:
+            while self.running:
+                message = protocol.recv_message(conn)
+                if message is None:
+                    break
+
+                kind, job_id, meta, data = message
+                if kind == protocol.JOB:
+                    with self.lock:
+                        self.active += 1
+                    self.executor.submit(self._run_job, conn, send_lock, job_id, meta, data)
+        except OSError as e:
+            print(f"Front-end connection error: {str(e)}")
+        finally:
+            conn.close()
+
+    def _run_job(self, conn, send_lock, job_id, meta, data):
+        handler = self.handlers.get(meta.get('type'))
+
+        try:
+            if handler is None:
+                result_meta, result_data = {'error': 'unsupported', 'message': f"Unsupported job {meta.get('type')}"}, b''
+            else:
+                result_meta, result_data = handler(meta, data)
+        except Exception as e:
+            result_meta, result_data = {'error': 'failed', 'message': str(e)}, b''
+
+        with self.lock:
+            self.active -= 1
+            if 'error' in result_meta:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+        try:
+            protocol.send_message(conn, protocol.RESULT, job_id, result_meta, result_data, lock=send_lock)
+        except OSError as e:
+            print(f"Error returning result for job {job_id}: {str(e)}")
+
+    def _recognize(self, meta, data):
+        frame = meta.get('frame')
+        if frame is None:
+            return {'names': self.face_recognizer.recognize_faces(data)}, b''
+
+        # Read the frame in place from the front-end's shared-memory ring
+        view = self._attach_ring(frame).view(frame['slot'], frame['length'])
+        try:
+            return {'names': self.face_recognizer.recognize_faces(view)}, b''
+        finally:
+            view.release()
+    
+    def _attach_ring(self, frame):
+        with self.lock:
+            ring = self.frame_rings.get(frame['ring'])
+            if ring is None:
+                ring = self.frame_rings[frame['ring']] = FrameRing.attach(frame['ring'], frame['slots'], frame['slot_size'])
+            return ring
+
+    def _transcribe(self, meta, data):
+        sr = self.speech_recognition
+        try:
+            return {'text': speech.transcribe(sr, data)}, b''
+        except sr.UnknownValueError:
+            return {'error': 'unknown_value'}, b''
+        except sr.RequestError as e:
+            return {'error': 'request_error', 'message': str(e)}, b''
+
+    def _synthesize(self, meta, data):
+        return {}, speech.synthesize(meta['text'])
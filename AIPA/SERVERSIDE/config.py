@@ -4,4 +4,97 @@ FACE_RECOGNITION_MODEL_PATH = "face_recognition/models"
 EMBEDDINGS_PATH = "face_recognition/embeddings"
 STUDENT_IMAGES_PATH = "face_recognition/student_images"
 TEACHER_IMAGES_PATH = "face_recognition/teacher_images"
-WEB_PORT = 8080
\ No newline at end of file
+WEB_PORT = 8080
+# Response cache for repeated spoken questions
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 3600  # seconds
+
+# Startup
+STARTUP_AUDIO_WAIT = 5  # seconds an utterance may wait for STT/NLP to finish loading
+
+# Sampling profiler (toggled through the web interface)
+PROFILER_RATE = 100  # samples per second
+PROFILE_OUTPUT_PATH = "profiles"
+
+# Admission control and load shedding
+ADMISSION_FRAME_WORKERS = 4  # frames processed concurrently at most
+ADMISSION_AUDIO_WORKERS = 2  # audio queries processed concurrently
+FRAME_CPU_BUDGET = 0.75  # share of all CPU cores frames may use
+FRAME_MIN_INTERVAL = 0.1  # seconds between processed frames per connection
+FRAME_MAX_INTERVAL = 2.0  # thinning limit under overload
+FRAME_FEEDBACK_INTERVAL = 1.0  # seconds between frame feedback messages to each Pi
+AUDIO_LATENCY_TARGET = 3.0  # seconds from utterance received to answer sent
+ADMISSION_RECOVERY_SECONDS = 30  # restore full frame capacity after this long without slow answers
+
+# Scale-out mode (front-end + recognition workers)
+COORDINATOR_HOST = "127.0.0.1"  # where workers find the front-end's coordinator
+COORDINATOR_PORT = 5100
+WORKER_HOST = "127.0.0.1"  # address the front-end uses to reach this worker
+WORKER_CAPACITY = 2  # concurrent jobs per worker
+CLUSTER_HEARTBEAT_INTERVAL = 1.0  # seconds
+CLUSTER_WORKER_TIMEOUT = 5.0  # seconds without a heartbeat before a worker is taken out of rotation
+CLUSTER_JOB_TIMEOUT = 10.0  # seconds
+CLUSTER_JOB_RETRIES = 1  # extra workers tried when one is lost mid-job
+
+# Shared-memory frame ring between the front-end and local workers
+FRAME_RING_SLOTS = 64  # 0 disables the ring
+FRAME_SLOT_SIZE = 512 * 1024  # bytes; larger frames are sent inline
+
+# SQLite connections (one per thread, WAL journal)
+DB_BUSY_TIMEOUT = 5.0  # seconds a writer waits for the lock
+DB_SYNCHRONOUS = "NORMAL"  # safe with WAL; FULL fsyncs on every commit
+
+# Write-behind attendance recorder
+ATTENDANCE_BATCH_INTERVAL = 0.2  # seconds between group commits
+ATTENDANCE_BATCH_SIZE = 500  # events per commit at most
+ATTENDANCE_QUEUE_SIZE = 10000  # frame handlers block when this many events are waiting
+ATTENDANCE_QUEUE_POLL = 0.01  # seconds between retries of a blocked frame handler
+ATTENDANCE_WRITE_ATTEMPTS = 5  # tries per batch before its events are written one by one
+ATTENDANCE_RETRY_DELAY = 0.1  # seconds before the first retry, doubled for each further one
+
+# Schema migrations
+MIGRATION_CHUNK_SIZE = 5000  # rows backfilled per transaction
+
+# Attendance summaries
+ATTENDANCE_SUMMARY_DAYS = 62  # days of per-class summaries kept in memory
+ATTENDANCE_SUMMARY_RANGE = 31  # wider date ranges are read without being kept in memory
+
+# Bulk import
+IMPORT_CHUNK_SIZE = 1000  # rows per executemany call
+IMPORT_TRANSACTION_ROWS = 50000  # rows per commit
+IMPORT_CACHE_KB = 200000  # SQLite page cache during an import
+IMPORT_ERRORS_SHOWN = 20  # rejected rows printed; the rest only go to --errors
+
+# Performance analytics
+ANALYTICS_RECENT_DAYS = 30  # window for recent averages and the weekly trend
+ANALYTICS_MOVING_AVERAGE = 5  # metrics per moving-average point
+ANALYTICS_ROSTER_TTL = 60  # seconds before class membership is re-read
+AT_RISK_SCORE = 50.0  # subject average below this flags a student
+AT_RISK_DROP = 10.0  # recent average this far below the overall one flags a student
+
+# Archive partitions
+ARCHIVE_PATH = "database/archive"  # one read-only YYYY-MM.db per archived month
+ARCHIVE_HOT_MONTHS = 3  # current month plus this many minus one stay in the hot database
+ARCHIVE_INTERVAL = 86400  # seconds between archiving runs
+
+# Reminders
+REMINDER_DEFAULT_DELAY = 3600  # seconds until a reminder without a time is due
+REMINDER_DEFAULT_HOUR = 9  # hour of day for "tomorrow" / weekday reminders without a time
+REMINDER_STALE_SECONDS = 86400  # reminders overdue by more than this at startup are dropped
+REMINDER_SPEAK = True  # read reminders out loud as well as sending the text
+CLASSROOMS = {}  # client IP -> classroom name; unlisted clients are their own classroom
+
+# Knowledge base
+KNOWLEDGE_BASE_PATH = "database/knowledge_base.db"  # SQLite FTS5 store, filled with python -m nlp.knowledge_base
+KNOWLEDGE_CACHE_SIZE = 2000  # entries kept in memory, least recently used dropped first
+KNOWLEDGE_PAGE_SIZE = 50  # entries per page when browsing a category
+KNOWLEDGE_CHANGES_KEPT = 100000  # change log rows kept for servers catching up
+
+# Spelling correction of transcribed queries
+SPELLING_MAX_DISTANCE = 2  # edits between a heard word and a knowledge base term
+SPELLING_PREFIX_LENGTH = 7  # only this many leading characters are indexed
+SPELLING_MIN_LENGTH = 4  # shorter words are never corrected
+
+# Hot reload
+RELOAD_INTERVAL = 5  # seconds between checks for knowledge base and keyword changes
+INTENT_KEYWORDS_PATH = "nlp/intent_keywords.json"  # {intent: [phrases]}; replaces the built-in phrases
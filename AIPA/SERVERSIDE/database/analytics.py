@@ -0,0 +1,267 @@
+import calendar
+import threading
+import time
+import warnings
+import numpy as np
+import sys
+sys.path.append('..')
+import config
+
+WEEK = 7 * 86400
+
+class _Codes:
+    """Dense integer codes for strings (student IDs, subjects, classes)"""
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, name):
+        code = self.index.get(name)
+        if code is None:
+            code = self.index[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def codes(self, names):
+        return np.fromiter((self.code(name) for name in names), dtype=np.int32, count=len(names))
+
+class PerformanceAnalytics:
+    """Columnar copy of performance_metrics with vectorized rollups.
+
+    Rows are held as parallel NumPy arrays (student code, subject code, value, ts)
+    and per (student, subject) sums and counts are kept up to date as rows arrive,
+    so class-wide averages, percentiles and at-risk checks are a handful of array
+    operations instead of a query per student. refresh() only reads rows added
+    since the last call.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.last_id = 0
+
+        self.students = _Codes()
+        self.subjects = _Codes()
+        self.classes = _Codes()
+        self.student_class = np.full(0, -1, dtype=np.int32)  # student code -> class code
+        self.roster_loaded_at = None
+
+        # Columns; only the first self.size entries are in use
+        self.size = 0
+        self.student = np.empty(1024, dtype=np.int32)
+        self.subject = np.empty(1024, dtype=np.int32)
+        self.value = np.empty(1024, dtype=np.float64)
+        self.ts = np.empty(1024, dtype=np.int64)
+
+        # Rollups per (student, subject)
+        self.sums = np.zeros((0, 0))
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def refresh(self):
+        """Pull in metrics added since the last refresh and fold them into the rollups"""
+        cursor = self.db._get_connection().cursor()
+        with self.lock:
+            cursor.execute("""
+                SELECT id, student_id, subject, value, COALESCE(ts, 0)
+                FROM performance_metrics
+                WHERE id > ?
+                ORDER BY id
+            """, (self.last_id,))
+            rows = cursor.fetchall()
+
+            if rows:
+                ids, students, subjects, values, ts = zip(*rows)
+                self._append(self.students.codes(students), self.subjects.codes(subjects),
+                             np.array(values, dtype=np.float64), np.array(ts, dtype=np.int64))
+                self.last_id = ids[-1]
+
+            if self.roster_loaded_at is None or time.time() - self.roster_loaded_at > config.ANALYTICS_ROSTER_TTL:
+                self._load_roster(cursor)
+            elif len(self.student_class) < len(self.students):
+                self._grow_roster()
+
+    def _append(self, student, subject, value, ts):
+        count = len(value)
+        needed = self.size + count
+        if needed > len(self.value):
+            capacity = max(needed, 2 * len(self.value))
+            for name in ("student", "subject", "value", "ts"):
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+
+        end = self.size + count
+        self.student[self.size:end] = student
+        self.subject[self.size:end] = subject
+        self.value[self.size:end] = value
+        self.ts[self.size:end] = ts
+        self.size = end
+
+        # Fold only the new rows into the rollups
+        shape = (len(self.students), len(self.subjects))
+        self.sums = _grow(self.sums, shape)
+        self.counts = _grow(self.counts, shape)
+        self.sums += _grouped(student, subject, shape, value)
+        self.counts += _grouped(student, subject, shape).astype(np.int64)
+
+    def _load_roster(self, cursor):
+        cursor.execute("SELECT id, class_id FROM students")
+        self.student_class = np.full(len(self.students), -1, dtype=np.int32)
+        for row in cursor.fetchall():
+            code = self.students.index.get(row['id'])
+            if code is not None and row['class_id'] is not None:
+                self.student_class[code] = self.classes.code(row['class_id'])
+        self.roster_loaded_at = time.time()
+
+    def _grow_roster(self):
+        grown = np.full(len(self.students), -1, dtype=np.int32)
+        grown[:len(self.student_class)] = self.student_class
+        self.student_class = grown
+
+    def _class_students(self, class_id):
+        """Boolean mask over student codes"""
+        if class_id is None:
+            return np.ones(len(self.students), dtype=bool)
+        code = self.classes.index.get(class_id)
+        if code is None:
+            return np.zeros(len(self.students), dtype=bool)
+        return self.student_class == code
+
+    def _window(self, days):
+        """Sums and counts per (student, subject) for rows newer than the given number of days"""
+        shape = self.sums.shape
+        if days is None:
+            return self.sums, self.counts
+
+        recent = self.ts[:self.size] >= _now() - days * 86400
+        sums = _grouped(self.student[:self.size][recent], self.subject[:self.size][recent], shape,
+                        self.value[:self.size][recent])
+        counts = _grouped(self.student[:self.size][recent], self.subject[:self.size][recent], shape)
+        return sums, counts
+
+    def class_report(self, class_id=None, window_days=None):
+        """Averages, percentiles, weekly trend and at-risk students for a class, or everyone"""
+        self.refresh()
+
+        with self.lock:
+            members = self._class_students(class_id)
+            sums, counts = self._window(window_days)
+            sums, counts = sums[members], counts[members]
+            student_ids = np.array(self.students.names, dtype=object)[members]
+            subjects = list(self.subjects.names)
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means = sums / counts  # NaN where a student has no metrics in a subject
+                subject_average = sums.sum(axis=0) / counts.sum(axis=0)
+            percentiles = np.full((3, len(subjects)), np.nan)
+            if len(means):
+                with warnings.catch_warnings():
+                    # Subjects nobody in the class has metrics for
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    percentiles = np.nanpercentile(means, [25, 50, 75], axis=0)
+
+            at_risk = self._at_risk(members, student_ids, means, subjects)
+            weekly = self._weekly_average(members, window_days)
+
+        report = {
+            'class_id': class_id,
+            'window_days': window_days,
+            'students': int(members.sum()),
+            'subjects': subjects,
+            'subject_average': {s: _number(subject_average[j]) for j, s in enumerate(subjects)},
+            'subject_percentiles': {s: {'p25': _number(percentiles[0, j]), 'p50': _number(percentiles[1, j]),
+                                        'p75': _number(percentiles[2, j])} for j, s in enumerate(subjects)},
+            'weekly_average': weekly,
+            'at_risk': at_risk
+        }
+        if class_id is not None:
+            report['student_averages'] = {
+                student_id: {s: _number(means[i, j]) for j, s in enumerate(subjects) if counts[i, j]}
+                for i, student_id in enumerate(student_ids)
+            }
+        return report
+
+    def _at_risk(self, members, student_ids, means, subjects):
+        """Students averaging below AT_RISK_SCORE in a subject, or dropping AT_RISK_DROP points recently"""
+        recent_sums, recent_counts = self._window(config.ANALYTICS_RECENT_DAYS)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            recent = recent_sums[members] / recent_counts[members]
+
+        low = means < config.AT_RISK_SCORE
+        dropping = ~low & (means - recent > config.AT_RISK_DROP)
+
+        at_risk = []
+        for reason, mask in (("low_average", low), ("dropping", dropping)):
+            for i, j in zip(*np.nonzero(mask)):
+                at_risk.append({
+                    'student_id': student_ids[i],
+                    'subject': subjects[j],
+                    'average': _number(means[i, j]),
+                    'recent_average': _number(recent[i, j]),
+                    'reason': reason
+                })
+        return at_risk
+
+    def _weekly_average(self, members, window_days):
+        """[(week start, average value)] for the class over the window (default ANALYTICS_RECENT_DAYS)"""
+        days = window_days or config.ANALYTICS_RECENT_DAYS
+        start = (_now() - days * 86400) // WEEK * WEEK
+
+        rows = (self.ts[:self.size] >= start) & members[self.student[:self.size]]
+        if not rows.any():
+            return []
+
+        week = (self.ts[:self.size][rows] - start) // WEEK
+        sums = np.bincount(week, weights=self.value[:self.size][rows])
+        counts = np.bincount(week)
+        return [(time.strftime("%Y-%m-%d", time.gmtime(start + n * WEEK)), _number(sums[n] / counts[n]))
+                for n in np.nonzero(counts)[0]]
+
+    def trend(self, student_id, subject, points=None):
+        """A student's values in one subject over time with their moving average"""
+        self.refresh()
+        points = points or config.ANALYTICS_MOVING_AVERAGE
+
+        with self.lock:
+            student = self.students.index.get(student_id)
+            code = self.subjects.index.get(subject)
+            if student is None or code is None:
+                return []
+
+            rows = (self.student[:self.size] == student) & (self.subject[:self.size] == code)
+            ts = self.ts[:self.size][rows]
+            order = np.argsort(ts, kind="stable")
+            ts, values = ts[order], self.value[:self.size][rows][order]
+
+        # Moving average over the last `points` values (fewer at the start of the series)
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        window = np.minimum(np.arange(1, len(values) + 1), points)
+        moving = (cumulative[1:] - cumulative[np.arange(1, len(values) + 1) - window]) / window
+
+        return [{'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(int(t))),
+                 'value': float(v), 'moving_average': _number(m)} for t, v, m in zip(ts, values, moving)]
+
+def _grouped(student, subject, shape, weights=None):
+    """Sum (or count) rows per (student, subject) cell"""
+    flat = student.astype(np.int64) * shape[1] + subject
+    return np.bincount(flat, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+
+def _grow(matrix, shape):
+    if matrix.shape == shape:
+        return matrix
+    grown = np.zeros(shape, dtype=matrix.dtype)
+    grown[:matrix.shape[0], :matrix.shape[1]] = matrix
+    return grown
+
+def _now():
+    # ts columns hold local wall-clock time as naive epoch seconds
+    return calendar.timegm(time.localtime())
+
+def _number(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
@@ -0,0 +1,128 @@
+import glob
+import os
+import re
+import stat
+import threading
+import time
+import sys
+sys.path.append('..')
+import config
+
+# Tables moved out of the hot database, one archive file per month
+ARCHIVED_TABLES = ("attendance", "teacher_presence", "query_log")
+
+PARTITION_NAME = re.compile(r"^(\d{4})-(\d{2})\.db$")
+
+class PartitionArchive:
+    """Monthly archive partitions for the tables that grow forever.
+
+    Rows older than the ARCHIVE_HOT_MONTHS most recent months are moved into
+    ARCHIVE_PATH/YYYY-MM.db, which is then made read-only. Reads that need old days
+    attach the matching partitions read-only for the duration of the query (see
+    DatabaseOperations._select_across_partitions), so the hot database only ever
+    holds a few months of rows.
+    """
+
+    def __init__(self, db, path=None):
+        self.db = db
+        self.path = path or config.ARCHIVE_PATH
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Archive now and then every ARCHIVE_INTERVAL seconds in a background thread"""
+        self.thread = threading.Thread(target=self._run, name="archive")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.archive_old_partitions()
+            except Exception as e:
+                print(f"Error archiving old partitions: {str(e)}")
+            time.sleep(config.ARCHIVE_INTERVAL)
+
+    def partitions(self, first_day=None, last_day=None):
+        """[(month, path)] of archive partitions overlapping the YYYYMMDD day range, oldest first"""
+        found = []
+        for path in glob.glob(os.path.join(self.path, "*.db")):
+            match = PARTITION_NAME.match(os.path.basename(path))
+            if not match:
+                continue
+            month = int(match.group(1)) * 100 + int(match.group(2))
+            if first_day is not None and month < first_day // 100:
+                continue
+            if last_day is not None and month > last_day // 100:
+                continue
+            found.append((month, path))
+        return sorted(found)
+
+    def cutoff_day(self):
+        """First day (YYYYMMDD) that stays in the hot database"""
+        year, month = time.localtime()[:2]
+        month -= config.ARCHIVE_HOT_MONTHS - 1
+        while month < 1:
+            month += 12
+            year -= 1
+        return year * 10000 + month * 100 + 1
+
+    def archive_old_partitions(self):
+        """Move every month older than the hot window into its archive file"""
+        with self.lock:
+            conn = self.db._get_connection()
+            cutoff = self.cutoff_day()
+
+            months = set()
+            for table in ARCHIVED_TABLES:
+                for row in conn.execute(f"SELECT DISTINCT day / 100 FROM {table} WHERE day < ?", (cutoff,)):
+                    months.add(row[0])
+
+            for month in sorted(months):
+                start = time.time()
+                moved = self._archive_month(conn, month)
+                print(f"Archived {moved} rows from {month // 100}-{month % 100:02d} in {time.time() - start:.1f}s")
+
+            return sorted(months)
+
+    def _archive_month(self, conn, month):
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"{month // 100}-{month % 100:02d}.db")
+        first_day, last_day = month * 100 + 1, month * 100 + 31
+
+        if os.path.exists(path):
+            # A late (backdated) row for an archived month: reopen the partition for writing
+            os.chmod(path, stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH)
+
+        conn.execute("ATTACH DATABASE ? AS archive_partition", (path,))
+        moved = 0
+        try:
+            for table in ARCHIVED_TABLES:
+                self._create_partition_table(conn, table)
+
+                # Copy first and delete afterwards: commits across attached WAL databases
+                # aren't atomic, and an interrupted run must not lose rows. Copying again
+                # is harmless because ids are kept.
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO archive_partition.{table}
+                    SELECT * FROM main.{table} WHERE day BETWEEN ? AND ?
+                """, (first_day, last_day))
+                conn.commit()
+
+                cursor = conn.execute(f"DELETE FROM main.{table} WHERE day BETWEEN ? AND ?", (first_day, last_day))
+                moved += cursor.rowcount
+                conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE archive_partition")
+
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return moved
+
+    def _create_partition_table(self, conn, table):
+        sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                           (table,)).fetchone()[0]
+        # Same columns in the same order as the hot table, so SELECT * copies line up
+        sql = re.sub(r"^CREATE TABLE\s+\"?" + table + "\"?",
+                     f"CREATE TABLE IF NOT EXISTS archive_partition.{table}", sql)
+        conn.execute(sql)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS archive_partition.idx_{table}_day ON {table} (day)")
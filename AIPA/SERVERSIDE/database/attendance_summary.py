@@ -0,0 +1,196 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+import sys
+sys.path.append('..')
+import config
+from database.migrations import day_number
+
+class _Day:
+    """Who arrived on one day, grouped by class, with the rendered answers cached"""
+
+    def __init__(self, date):
+        self.date = date
+        self.classes = {}  # class_id -> {student_id: (name, timestamp)}
+        self.texts = {}    # class_id (None for all classes) -> rendered summary
+
+    def add(self, class_id, student_id, name, timestamp):
+        students = self.classes.setdefault(class_id, {})
+        if student_id in students and students[student_id][1] <= timestamp:
+            return False
+        students[student_id] = (name, timestamp)
+        self.texts.clear()
+        return True
+
+    def text(self, class_id=None):
+        text = self.texts.get(class_id)
+        if text is None:
+            text = self.texts[class_id] = self._render(class_id)
+        return text
+
+    def _render(self, class_id):
+        if class_id is None:
+            class_ids = sorted(self.classes, key=lambda c: (c is not None, c or ""))
+        else:
+            class_ids = [class_id] if self.classes.get(class_id) else []
+
+        if not class_ids:
+            if class_id is None:
+                return f"No attendance records for {self.date}"
+            return f"No attendance records for {class_id} on {self.date}"
+
+        lines = [f"Attendance for {self.date}:"]
+        for current_class in class_ids:
+            if current_class is not None:
+                lines.append(f"\n{current_class}:")
+            for name, timestamp in sorted(self.classes[current_class].values()):
+                lines.append(f"- {name} (arrived at {timestamp.split()[1]})")
+
+        return "\n".join(lines) + "\n"
+
+    def counts(self, class_id=None):
+        if class_id is not None:
+            return {class_id: len(self.classes.get(class_id, {}))}
+        return {c: len(students) for c, students in self.classes.items()}
+
+class AttendanceSummary:
+    """Per-day, per-class attendance kept in memory and updated on every insert.
+
+    Days are loaded from the database the first time they are asked for and then
+    maintained incrementally, so repeated "who is here" questions are served from
+    the cached text. At most ATTENDANCE_SUMMARY_DAYS days are kept; ranges wider
+    than ATTENDANCE_SUMMARY_RANGE days are read without being kept, so one long
+    report does not push out the days the dashboard keeps asking for. Who is in
+    which class is re-read every ANALYTICS_ROSTER_TTL seconds, like the analytics
+    roster.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.days = OrderedDict()  # "%Y-%m-%d" -> _Day
+        self.students = {}  # student_id -> (name, class_id)
+        self.students_loaded_at = None
+        self.loading = {}   # date being read from the database -> inserts seen meanwhile
+        self.lock = threading.Lock()
+
+    def load_students(self):
+        cursor = self.db._get_connection().cursor()
+        cursor.execute("SELECT id, name, class_id FROM students")
+        students = {row['id']: (row['name'], row['class_id']) for row in cursor.fetchall()}
+        with self.lock:
+            self.students = students
+            self.students_loaded_at = time.time()
+
+    def _student(self, student_id):
+        with self.lock:
+            stale = (self.students_loaded_at is None
+                     or time.time() - self.students_loaded_at > config.ANALYTICS_ROSTER_TTL)
+        if stale:
+            # Students may have changed class, e.g. through a bulk import
+            self.load_students()
+
+        with self.lock:
+            info = self.students.get(student_id)
+        if info is None:
+            # Added since the roster was loaded
+            cursor = self.db._get_connection().cursor()
+            cursor.execute("SELECT name, class_id FROM students WHERE id = ?", (student_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            info = (row['name'], row['class_id'])
+            with self.lock:
+                self.students[student_id] = info
+        return info
+
+    def add(self, student_id, timestamp):
+        """Record a committed attendance insert"""
+        info = self._student(student_id)
+        if info is None:
+            return
+
+        date = timestamp.split()[0]
+        event = (info[1], student_id, info[0], timestamp)
+        with self.lock:
+            if date in self.loading:
+                # Being read from the database right now; applied once the read is in
+                self.loading[date].append(event)
+            elif date in self.days:
+                self.days[date].add(*event)
+            # Otherwise it is read from the database in full when first asked for
+
+    def _load(self, dates):
+        """Read the given days from the database; returns {date: _Day}"""
+        first_day, last_day = day_number(dates[0]), day_number(dates[-1])
+        rows = self.db._select_across_partitions("attendance", """
+            SELECT a.student_id, s.name, s.class_id, a.timestamp
+            FROM {table} a
+            JOIN main.students s ON a.student_id = s.id
+            WHERE a.day BETWEEN ? AND ?
+        """, first_day, last_day, (first_day, last_day))
+
+        loaded = {date: _Day(date) for date in dates}
+        for row in rows:
+            day = loaded.get(row['timestamp'].split()[0])
+            if day is not None:
+                day.add(row['class_id'], row['student_id'], row['name'], row['timestamp'])
+        return loaded
+
+    def _get_days(self, first, last):
+        dates = _date_range(first, last)
+        if len(dates) > config.ATTENDANCE_SUMMARY_RANGE:
+            return self._read_days(dates)
+
+        while True:
+            with self.lock:
+                missing = [date for date in dates if date not in self.days]
+                if not missing:
+                    for date in dates:
+                        self.days.move_to_end(date)
+                    days = [self.days[date] for date in dates]
+                    while len(self.days) > config.ATTENDANCE_SUMMARY_DAYS:
+                        self.days.popitem(last=False)
+                    return days
+
+                for date in missing:
+                    self.loading.setdefault(date, [])
+
+            loaded = {}
+            try:
+                loaded = self._load(missing)
+            finally:
+                with self.lock:
+                    for date in missing:
+                        events = self.loading.pop(date, [])
+                        if date in self.days or date not in loaded:
+                            continue
+                        # Inserts committed while the read was running may or may not be in it
+                        day = loaded[date]
+                        for event in events:
+                            day.add(*event)
+                        self.days[date] = day
+
+    def _read_days(self, dates):
+        """Days of a range too wide to keep: cached days as they are, the others read just for this call"""
+        with self.lock:
+            cached = {date: self.days[date] for date in dates if date in self.days}
+        missing = [date for date in dates if date not in cached]
+        loaded = self._load(missing) if missing else {}
+        return [cached.get(date) or loaded[date] for date in dates]
+
+    def get_text(self, date, class_id=None):
+        day = self._get_days(date, date)[0]
+        with self.lock:
+            return day.text(class_id)
+
+    def get_counts(self, first, last, class_id=None):
+        """[(date, {class_id: students present})] for every day from first to last"""
+        days = self._get_days(first, last)
+        with self.lock:
+            return [(day.date, day.counts(class_id)) for day in days]
+
+def _date_range(first, last):
+    start = datetime.date.fromisoformat(first)
+    end = datetime.date.fromisoformat(last)
+    return [(start + datetime.timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
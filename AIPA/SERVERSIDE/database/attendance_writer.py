@@ -0,0 +1,153 @@
+import atexit
+import queue
+import threading
+import time
+import sys
+sys.path.append('..')
+import config
+from monitoring import metrics
+
+BATCH_SIZE = metrics.REGISTRY.histogram(
+    "aipa_attendance_batch_size", "Presence events committed per transaction",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+
+_STOP = object()
+
+class AttendanceWriter:
+    """Write-behind recorder for attendance and teacher presence.
+
+    Recognitions are queued by the connection threads and group-committed by a
+    single writer thread every ATTENDANCE_BATCH_INTERVAL seconds or
+    ATTENDANCE_BATCH_SIZE events, whichever comes first. stop() (also run at
+    interpreter exit) commits everything still queued before returning.
+    """
+
+    def __init__(self, db, on_recorded=None):
+        self.db = db
+        self.on_recorded = on_recorded
+        self.queue = queue.Queue(maxsize=config.ATTENDANCE_QUEUE_SIZE)
+        self.thread = None
+        self.stopped = False
+        self.lock = threading.Lock()
+
+        metrics.QUEUE_DEPTH.set_function(self.queue.qsize, queue="attendance")
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="attendance-writer")
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def record_attendance(self, student_id, timestamp):
+        self._enqueue(("student", student_id, timestamp))
+
+    def record_teacher_presence(self, teacher_id, timestamp):
+        self._enqueue(("teacher", teacher_id, timestamp))
+
+    def _enqueue(self, event):
+        while True:
+            # Checked and queued under the lock stop() takes, so no event lands behind the final drain
+            with self.lock:
+                running = not self.stopped and self.thread is not None
+                if running:
+                    try:
+                        self.queue.put_nowait(event)
+                        return
+                    except queue.Full:
+                        pass
+
+            if not running:
+                # Not running (or shutting down): write through so nothing is lost
+                self._write([event])
+                return
+
+            # Full: push back on the frame handlers, but wait outside the lock so stop() isn't held up
+            time.sleep(config.ATTENDANCE_QUEUE_POLL)
+
+    def stop(self):
+        """Flush everything queued and stop the writer thread"""
+        with self.lock:
+            if self.stopped or self.thread is None:
+                return
+            self.stopped = True
+
+        self.queue.put(_STOP)
+        self.thread.join()
+        atexit.unregister(self.stop)
+
+    def _run(self):
+        running = True
+
+        while running:
+            batch = [self.queue.get()]
+            if batch[0] is _STOP:
+                break
+
+            deadline = time.monotonic() + config.ATTENDANCE_BATCH_INTERVAL
+            while len(batch) < config.ATTENDANCE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    running = False
+                    break
+                batch.append(event)
+
+            self._write(batch)
+
+        # Anything enqueued while stopping
+        leftover = []
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                leftover.append(event)
+        if leftover:
+            self._write(leftover)
+
+    def _write(self, batch):
+        # The same person is usually seen in many frames of a batch; only write each once per day
+        unique = {}
+        for kind, person_id, timestamp in batch:
+            unique.setdefault((kind, person_id, timestamp.split()[0]), (kind, person_id, timestamp))
+
+        events = list(unique.values())
+        recorded = self._commit(events, config.ATTENDANCE_WRITE_ATTEMPTS)
+        if recorded is None:
+            # One bad event must not cost everybody else in the batch their attendance
+            recorded = []
+            if len(events) > 1:
+                for event in events:
+                    recorded += self._commit([event], 1) or []
+
+        BATCH_SIZE.observe(len(unique))
+        if recorded and self.on_recorded:
+            self.on_recorded(recorded)
+
+    def _commit(self, events, attempts):
+        """record_presence_batch, retried with exponential backoff; None if every attempt failed.
+
+        A failed attempt is rolled back and releases its claims on the presence
+        index, so retrying records the same events again.
+        """
+        delay = config.ATTENDANCE_RETRY_DELAY
+        for attempt in range(1, attempts + 1):
+            try:
+                with metrics.STAGE_SECONDS.time(stage="db_write"):
+                    return self.db.record_presence_batch(events)
+            except Exception as e:
+                if attempt == attempts:
+                    print(f"Error writing {len(events)} attendance events, giving up after "
+                          f"{attempts} attempts: {str(e)}")
+                    return None
+                print(f"Error writing {len(events)} attendance events (attempt {attempt}), "
+                      f"retrying in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+                delay *= 2
@@ -0,0 +1,235 @@
+"""Bulk import of rosters and historical performance data from CSV or JSON Lines.
+
+Run from the SERVERSIDE directory:
+
+    python -m database.bulk_import students district_roster.csv
+    python -m database.bulk_import teachers staff.jsonl
+    python -m database.bulk_import performance_metrics grades.csv --errors grades_errors.jsonl
+
+CSV files need a header row with the column names; JSONL files one object per line.
+Rows that fail validation are reported and skipped; the rest of the file still loads.
+Students and teachers that already exist are updated in place.
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+import sys
+sys.path.append('..')
+import config
+from database.migrations import migrate, time_columns
+
+# table -> (columns, required columns)
+IMPORT_TABLES = {
+    "students": (("id", "name", "class_id", "email", "registration_date"), ("id", "name")),
+    "teachers": (("id", "name", "subject", "email"), ("id", "name")),
+    "performance_metrics": (("student_id", "subject", "metric_type", "value", "timestamp"),
+                            ("student_id", "subject", "metric_type", "value", "timestamp"))
+}
+
+class BulkImporter:
+    """Streams rows into one table with chunked executemany calls inside large transactions"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or config.DATABASE_PATH
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=config.DB_BUSY_TIMEOUT)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        migrate(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def import_file(self, table, path, errors_path=None):
+        """Import every valid row of a CSV or JSONL file; returns a result summary dict"""
+        if table not in IMPORT_TABLES:
+            raise ValueError(f"Cannot import into {table}; choose one of {', '.join(IMPORT_TABLES)}")
+
+        with open(path, newline="", encoding="utf-8") as f:
+            return self.import_rows(table, _read_rows(f, path), errors_path)
+
+    def import_rows(self, table, rows, errors_path=None):
+        """Import (line number, dict) pairs"""
+        validate = getattr(self, f"_validate_{table}")
+        statement = _insert_statement(table)
+        students = self._student_ids() if table == "performance_metrics" else None
+
+        result = {'table': table, 'rows': 0, 'imported': 0, 'errors': 0}
+        errors_file = open(errors_path, "w", encoding="utf-8") if errors_path else None
+        start = time.time()
+
+        indexes = self._drop_indexes(table)
+        self._set_import_pragmas(True)
+        try:
+            chunk = []
+            in_transaction = 0
+            for line, row in rows:
+                result['rows'] += 1
+                try:
+                    if '_error' in row:
+                        raise ValueError(row['_error'])
+                    chunk.append(validate(row, students))
+                except (ValueError, KeyError, TypeError) as e:
+                    result['errors'] += 1
+                    self._report_error(result, line, row, e, errors_file)
+                    continue
+
+                if len(chunk) >= config.IMPORT_CHUNK_SIZE:
+                    self.conn.executemany(statement, chunk)
+                    result['imported'] += len(chunk)
+                    in_transaction += len(chunk)
+                    chunk = []
+
+                    if in_transaction >= config.IMPORT_TRANSACTION_ROWS:
+                        self.conn.commit()
+                        in_transaction = 0
+                        _print_progress(result, start)
+
+            if chunk:
+                self.conn.executemany(statement, chunk)
+                result['imported'] += len(chunk)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self._set_import_pragmas(False)
+            self._restore_indexes(indexes)
+            if errors_file:
+                errors_file.close()
+
+        result['seconds'] = time.time() - start
+        result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] else 0.0
+        return result
+
+    def _report_error(self, result, line, row, error, errors_file):
+        if errors_file:
+            errors_file.write(json.dumps({'line': line, 'error': str(error), 'row': row}) + "\n")
+        if result['errors'] <= config.IMPORT_ERRORS_SHOWN:
+            print(f"Line {line}: {error}")
+        elif result['errors'] == config.IMPORT_ERRORS_SHOWN + 1:
+            print("Further errors not shown" + ("; all are in the errors file" if errors_file else ""))
+
+    def _student_ids(self):
+        return {row[0] for row in self.conn.execute("SELECT id FROM students")}
+
+    def _drop_indexes(self, table):
+        """Drop the table's secondary indexes so they are built once at the end, not row by row.
+
+        If the import dies before _restore_indexes, migrate() recreates them on the
+        next server start or import.
+        """
+        indexes = self.conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        ).fetchall()
+        for name, _ in indexes:
+            self.conn.execute(f"DROP INDEX {name}")
+        self.conn.commit()
+        return indexes
+
+    def _restore_indexes(self, indexes):
+        for name, sql in indexes:
+            print(f"Rebuilding index {name}")
+            self.conn.execute(sql)
+        self.conn.commit()
+
+    def _set_import_pragmas(self, importing):
+        if importing:
+            # The source file is still there if the machine dies mid-import
+            self.conn.execute("PRAGMA synchronous=OFF")
+            self.conn.execute(f"PRAGMA cache_size=-{config.IMPORT_CACHE_KB}")
+            self.conn.execute("PRAGMA temp_store=MEMORY")
+        else:
+            self.conn.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
+            self.conn.execute("PRAGMA cache_size=-2000")
+            self.conn.execute("PRAGMA temp_store=DEFAULT")
+
+    def _validate_students(self, row, students):
+        values = _clean(row, "students")
+        if values[4] is None:
+            values[4] = time.strftime("%Y-%m-%d")
+        else:
+            time.strptime(values[4], "%Y-%m-%d")
+        return values
+
+    def _validate_teachers(self, row, students):
+        return _clean(row, "teachers")
+
+    def _validate_performance_metrics(self, row, students):
+        values = _clean(row, "performance_metrics")
+        if values[0] not in students:
+            raise ValueError(f"Unknown student {values[0]}")
+        values[3] = float(values[3])
+        return values + list(time_columns(values[4]))
+
+# TEXT ids; JSON numbers must not end up stored as integers that never match them
+ID_COLUMNS = ("id", "student_id")
+
+def _clean(row, table):
+    columns, required = IMPORT_TABLES[table]
+    values = []
+    for column in columns:
+        value = row.get(column)
+        if column in ID_COLUMNS and value is not None and not isinstance(value, str):
+            value = str(value)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if value is None and column in required:
+            raise ValueError(f"Missing {column}")
+        values.append(value)
+    return values
+
+def _insert_statement(table):
+    columns, _ = IMPORT_TABLES[table]
+    if table == "performance_metrics":
+        columns = columns + ("ts", "day")
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    # Re-importing a roster updates people that already exist
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}")
+
+def _read_rows(f, path):
+    """Yield (line number, dict) pairs from a CSV or JSON Lines file"""
+    if path.lower().endswith((".jsonl", ".json")):
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {'_error': f"Invalid JSON: {e}"}
+            yield line_number, row if isinstance(row, dict) else {'_error': "Not a JSON object"}
+    else:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+
+def _print_progress(result, start):
+    elapsed = time.time() - start
+    print(f"{result['rows']} rows read, {result['imported']} imported, "
+          f"{result['rows'] / elapsed if elapsed else 0:.0f} rows/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import students, teachers or performance metrics")
+    parser.add_argument("table", choices=sorted(IMPORT_TABLES))
+    parser.add_argument("path", help="CSV file with a header row, or a JSON Lines file (.jsonl)")
+    parser.add_argument("--db", help="Database to import into (default: the server's database)")
+    parser.add_argument("--errors", help="Write every rejected row to this JSON Lines file")
+    args = parser.parse_args()
+
+    importer = BulkImporter(args.db)
+    try:
+        result = importer.import_file(args.table, args.path, args.errors)
+    finally:
+        importer.close()
+
+    print(f"Imported {result['imported']} of {result['rows']} rows into {result['table']} "
+          f"in {result['seconds']:.1f}s ({result['rows_per_second']:.0f} rows/s), {result['errors']} rejected")
+
+if __name__ == "__main__":
+    main()
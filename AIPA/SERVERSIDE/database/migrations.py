@@ -0,0 +1,206 @@
+"""Versioned schema migrations.
+
+Applied in order by DatabaseOperations.initialize_database(); the schema_version
+table records which ones a database has had. Every migration is safe to re-run,
+so a server stopped half way through one simply finishes it on the next start.
+
+To migrate the configured database by hand and check that the hot queries use
+their indexes, run from the SERVERSIDE directory:
+
+    python -m database.migrations
+"""
+import calendar
+import time
+import sys
+sys.path.append('..')
+import config
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Tables that get integer ts (epoch seconds) and day (YYYYMMDD) columns
+TIMED_TABLES = ("attendance", "teacher_presence", "query_log", "performance_metrics")
+
+def day_number(timestamp):
+    """YYYYMMDD integer for a "%Y-%m-%d" date or a full timestamp"""
+    return int(timestamp[:10].replace("-", ""))
+
+def time_columns(timestamp):
+    """The (ts, day) column values for a timestamp string.
+
+    Timestamps are local wall-clock times; ts keeps them as naive epoch seconds,
+    which is exactly what SQLite's strftime('%s', timestamp) gives for old rows.
+    """
+    return calendar.timegm(time.strptime(timestamp, TIMESTAMP_FORMAT)), day_number(timestamp)
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _baseline(conn):
+    from database.models import create_tables
+    create_tables(conn)
+
+def _add_time_columns(conn):
+    for table in TIMED_TABLES:
+        columns = _columns(conn, table)
+        if "ts" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+        if "day" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN day INTEGER")
+        conn.commit()
+
+        # Backfill by id range in short transactions so a large table doesn't block writers
+        max_id = conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+        for start in range(0, max_id, config.MIGRATION_CHUNK_SIZE):
+            conn.execute(f"""
+                UPDATE {table}
+                SET ts = CAST(strftime('%s', timestamp) AS INTEGER),
+                    day = CAST(strftime('%Y%m%d', timestamp) AS INTEGER)
+                WHERE id > ? AND id <= ? AND ts IS NULL
+            """, (start, start + config.MIGRATION_CHUNK_SIZE))
+            conn.commit()
+
+def _add_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_day ON attendance (student_id, day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_day ON attendance (day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_teacher_presence_teacher_day ON teacher_presence (teacher_id, day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_teacher_presence_day ON teacher_presence (day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_performance_student_subject_ts "
+                 "ON performance_metrics (student_id, subject, ts)")
+    conn.commit()
+
+def _add_query_log_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_query_log_day ON query_log (day)")
+    conn.commit()
+
+def _add_reminder_schedule(conn):
+    columns = _columns(conn, "reminders")
+    if "due_ts" not in columns:
+        conn.execute("ALTER TABLE reminders ADD COLUMN due_ts INTEGER")
+    if "classroom" not in columns:
+        conn.execute("ALTER TABLE reminders ADD COLUMN classroom TEXT")
+
+    # Older reminders had no due time; they count as due an hour after they were set
+    conn.execute("""
+        UPDATE reminders
+        SET due_ts = CAST(strftime('%s', timestamp) AS INTEGER) + ?
+        WHERE due_ts IS NULL
+    """, (config.REMINDER_DEFAULT_DELAY,))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (due_ts) WHERE completed = 0")
+    conn.commit()
+
+# (version, description, function); append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "Baseline tables", _baseline),
+    (2, "Integer ts and day columns", _add_time_columns),
+    (3, "Composite indexes for per-day and per-student lookups", _add_indexes),
+    (4, "Day index on the query log for archiving", _add_query_log_index),
+    (5, "Reminder due times, target classroom and pending index", _add_reminder_schedule)
+]
+
+# Every index the migrations create. Checked on each migrate(), so an index lost
+# outside a migration (e.g. a bulk import killed before it rebuilt its indexes) comes back
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_attendance_student_day ON attendance (student_id, day)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_day ON attendance (day)",
+    "CREATE INDEX IF NOT EXISTS idx_teacher_presence_teacher_day ON teacher_presence (teacher_id, day)",
+    "CREATE INDEX IF NOT EXISTS idx_teacher_presence_day ON teacher_presence (day)",
+    "CREATE INDEX IF NOT EXISTS idx_performance_student_subject_ts ON performance_metrics (student_id, subject, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_query_log_day ON query_log (day)",
+    "CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders (due_ts) WHERE completed = 0"
+]
+
+def ensure_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.commit()
+
+def get_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def migrate(conn):
+    """Apply every pending migration; returns the resulting schema version"""
+    version = get_version(conn)
+
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+
+        print(f"Applying migration {number}: {description}")
+        start = time.time()
+        apply(conn)
+        conn.execute(
+            "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+            (number, description, time.strftime(TIMESTAMP_FORMAT))
+        )
+        conn.commit()
+        print(f"Migration {number} done in {time.time() - start:.2f}s")
+        version = number
+
+    ensure_indexes(conn)
+    return version
+
+# Hot queries and the index each one must use: (description, sql, params, index)
+QUERY_PLAN_CHECKS = [
+    ("attendance dedup", "SELECT id FROM attendance WHERE student_id = ? AND day = ?",
+     ("S001", 20240101), "idx_attendance_student_day"),
+    ("teacher presence dedup", "SELECT id FROM teacher_presence WHERE teacher_id = ? AND day = ?",
+     ("T001", 20240101), "idx_teacher_presence_teacher_day"),
+    ("attendance summary", """
+        SELECT a.student_id, s.name, s.class_id, a.timestamp
+        FROM attendance a
+        JOIN students s ON a.student_id = s.id
+        WHERE a.day BETWEEN ? AND ?
+     """, (20240101, 20240131), "idx_attendance_day"),
+    ("present today", "SELECT student_id FROM attendance WHERE day = ?",
+     (20240101,), "idx_attendance_day"),
+    ("teachers present today", "SELECT teacher_id FROM teacher_presence WHERE day = ?",
+     (20240101,), "idx_teacher_presence_day"),
+    ("performance by subject", """
+        SELECT metric_type, value, timestamp
+        FROM performance_metrics
+        WHERE student_id = ? AND subject = ?
+        ORDER BY ts DESC
+     """, ("S001", "Mathematics"), "idx_performance_student_subject_ts"),
+    ("performance for student", """
+        SELECT subject, metric_type, value, timestamp
+        FROM performance_metrics
+        WHERE student_id = ?
+        ORDER BY subject, ts DESC
+     """, ("S001",), "idx_performance_student_subject_ts"),
+    ("pending reminders", """
+        SELECT id, text, timestamp, due_ts, classroom
+        FROM reminders
+        WHERE completed = 0
+        ORDER BY due_ts
+     """, (), "idx_reminders_pending")
+]
+
+def check_query_plans(conn):
+    """EXPLAIN QUERY PLAN every hot query; returns (description, uses_index, plan) tuples"""
+    results = []
+    for description, sql, params, index in QUERY_PLAN_CHECKS:
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        results.append((description, any(index in step for step in plan), plan))
+    return results
+
+if __name__ == "__main__":
+    from database.operations import DatabaseOperations
+
+    db = DatabaseOperations()
+    db.initialize_database()
+    conn = db._get_connection()
+    print(f"Schema version {get_version(conn)}")
+
+    failed = 0
+    for description, uses_index, plan in check_query_plans(conn):
+        failed += not uses_index
+        print(f"{'ok  ' if uses_index else 'SCAN'} {description}: {'; '.join(plan)}")
+    sys.exit(1 if failed else 0)
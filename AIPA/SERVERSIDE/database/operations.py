@@ -1,32 +1,103 @@
 import sqlite3
 import os
+import urllib.request
 import time
+import threading
 import sys
 sys.path.append('..')
 import config
+from database.migrations import day_number, time_columns
+from database.attendance_summary import AttendanceSummary
+from database.archive import PartitionArchive
+
+# Presence kind -> (people table, presence table, person column)
+PRESENCE_TABLES = {
+    "student": ("students", "attendance", "student_id"),
+    "teacher": ("teachers", "teacher_presence", "teacher_id")
+}
 
 class DatabaseOperations:
     def __init__(self):
         self.db_path = config.DATABASE_PATH
-        self.conn = None
+        self.local = threading.local()
+        self.connections = {}  # thread -> connection, so close() can reach all of them
+        self.lock = threading.Lock()
+        
+        # In-memory roster and per-day set of IDs already recorded, so repeat
+        # recognitions are answered without touching the database
+        self.index_lock = threading.Lock()
+        self.roster = {kind: set() for kind in PRESENCE_TABLES}
+        self.present = {kind: set() for kind in PRESENCE_TABLES}
+        self.present_day = None
+        
+        # Per-day, per-class attendance answers, maintained on insert
+        self.summary = AttendanceSummary(self)
+        self.analytics = None  # Columnar performance rollups, built on first use
+        
+        # Monthly archive files for attendance, teacher presence and the query log
+        self.archive = PartitionArchive(self)
     
     def _get_connection(self):
-        """Get a database connection, creating the database if it doesn't exist"""
-        if self.conn is None:
+        """Get this thread's database connection, creating the database if it doesn't exist"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
             # Ensure the directory exists
             os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-            self.conn = sqlite3.connect(self.db_path)
-            self.conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        return self.conn
+            conn = sqlite3.connect(self.db_path, timeout=config.DB_BUSY_TIMEOUT, check_same_thread=False,
+                                   uri=True)  # so archive partitions can be attached read-only
+            conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+            
+            # WAL lets readers run alongside the writer; NORMAL only fsyncs at checkpoints
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={config.DB_SYNCHRONOUS}")
+            conn.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT * 1000)}")
+            
+            self.local.conn = conn
+            with self.lock:
+                self._close_finished_threads()
+                self.connections[threading.current_thread()] = conn
+        return conn
+    
+    def _select_across_partitions(self, table, sql, first_day, last_day, params=()):
+        """Run a query against the hot table and every archive partition overlapping the days.
+        
+        sql names the table as {table}; first_day and last_day are YYYYMMDD integers.
+        Returns the rows from all of them, hot rows first.
+        """
+        conn = self._get_connection()
+        rows = conn.execute(sql.format(table=table), params).fetchall()
+        
+        if first_day >= self.archive.cutoff_day():
+            return rows  # Everything asked for is still in the hot database
+        
+        for month, path in self.archive.partitions(first_day, last_day):
+            uri = "file:" + urllib.request.pathname2url(os.path.abspath(path)) + "?mode=ro"
+            conn.execute("ATTACH DATABASE ? AS archived", (uri,))
+            try:
+                rows += conn.execute(sql.format(table=f"archived.{table}"), params).fetchall()
+            finally:
+                conn.execute("DETACH DATABASE archived")
+        return rows
+    
+    def archive_old_data(self):
+        """Move attendance, presence and query log rows older than the hot window into archive partitions"""
+        return self.archive.archive_old_partitions()
+    
+    def _close_finished_threads(self):
+        """Close connections left behind by client threads that have exited"""
+        for thread in [t for t in self.connections if not t.is_alive()]:
+            self.connections.pop(thread).close()
     
     def initialize_database(self):
         """Initialize the database with required tables"""
         conn = self._get_connection()
-        from database.models import create_tables
-        create_tables(conn)
+        from database.migrations import migrate
+        migrate(conn)
         
         # Add some sample data if the database is empty
         self._add_sample_data()
+        self._load_presence_index()
+        self.summary.load_students()
     
     def _add_sample_data(self):
         """Add sample data if tables are empty"""
@@ -66,79 +137,177 @@ class DatabaseOperations:
     
     def record_attendance(self, student_id, timestamp=None):
         """Record student attendance"""
+        return self._record_presence("student", student_id, timestamp)
+    
+    def record_teacher_presence(self, teacher_id, timestamp=None):
+        """Record teacher presence"""
+        return self._record_presence("teacher", teacher_id, timestamp)
+    
+    def _record_presence(self, kind, person_id, timestamp):
         if timestamp is None:
             timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         
+        if self._lookup_presence(kind, person_id, timestamp, claim=False) == "recorded":
+            return False  # Already recorded today, no SQL needed
+        
+        return bool(self.record_presence_batch([(kind, person_id, timestamp)]))
+    
+    def record_presence_batch(self, events):
+        """Record many (kind, person_id, timestamp) events in one transaction.
+        
+        kind is "student" or "teacher". Returns the events that were newly recorded.
+        """
         conn = self._get_connection()
         cursor = conn.cursor()
+        recorded = []
+        
+        try:
+            with conn:
+                for kind, person_id, timestamp in events:
+                    if self._insert_presence(cursor, kind, person_id, timestamp):
+                        recorded.append((kind, person_id, timestamp))
+        except Exception:
+            # Rolled back: nothing in this batch is recorded after all
+            for kind, person_id, timestamp in recorded:
+                self._forget_presence(kind, person_id, timestamp)
+            raise
         
-        # Check if the student exists
-        cursor.execute("SELECT id FROM students WHERE id = ?", (student_id,))
-        result = cursor.fetchone()
+        for kind, person_id, timestamp in recorded:
+            if kind == "student":
+                self.summary.add(person_id, timestamp)
+        
+        return recorded
+    
+    def _insert_presence(self, cursor, kind, person_id, timestamp):
+        """Insert one presence event unless it is a repeat or the person is unknown; does not commit"""
+        people, table, column = PRESENCE_TABLES[kind]
+        ts, day = time_columns(timestamp)
         
-        if result:
-            # Check if attendance already recorded for today
-            today = timestamp.split()[0]
+        state = self._lookup_presence(kind, person_id, timestamp)
+        if state == "recorded":
+            return False  # Already recorded today
+        
+        if state is None:
+            # The index can't tell (backdated event, or a person added since it was loaded)
+            cursor.execute(f"SELECT id FROM {people} WHERE id = ?", (person_id,))
+            if not cursor.fetchone():
+                return False  # Person not found
+            
             cursor.execute(
-                "SELECT id FROM attendance WHERE student_id = ? AND date(timestamp) = date(?)",
-                (student_id, timestamp)
+                f"SELECT id FROM {table} WHERE {column} = ? AND day = ?",
+                (person_id, day)
             )
+            if cursor.fetchone():
+                return False  # Already recorded
+            if day < self.archive.cutoff_day() and self._archived_presence(table, column, person_id, day):
+                return False  # Already recorded in a month that has been archived
             
-            if not cursor.fetchone():
-                # Record new attendance
-                cursor.execute(
-                    "INSERT INTO attendance (student_id, timestamp) VALUES (?, ?)",
-                    (student_id, timestamp)
-                )
-                conn.commit()
-                return True
-            return False  # Already recorded
-        else:
-            return False  # Student not found
+            self._remember_presence(kind, person_id, timestamp)
+        
+        try:
+            cursor.execute(
+                f"INSERT INTO {table} ({column}, timestamp, ts, day) VALUES (?, ?, ?, ?)",
+                (person_id, timestamp, ts, day)
+            )
+        except Exception:
+            # Release the claim taken above, or a retry would take the event for a repeat
+            self._forget_presence(kind, person_id, timestamp)
+            raise
+        return True
     
-    def record_teacher_presence(self, teacher_id, timestamp=None):
-        """Record teacher presence"""
-        if timestamp is None:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    def _archived_presence(self, table, column, person_id, day):
+        """Whether the archive partition for the day already has a presence row for the person.
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        Partitions are opened on their own read-only connection: this runs inside
+        the batch transaction, where _select_across_partitions can't ATTACH.
+        """
+        for month, path in self.archive.partitions(day, day):
+            uri = "file:" + urllib.request.pathname2url(os.path.abspath(path)) + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=config.DB_BUSY_TIMEOUT)
+            try:
+                if conn.execute(f"SELECT 1 FROM {table} WHERE {column} = ? AND day = ?",
+                                (person_id, day)).fetchone():
+                    return True
+            finally:
+                conn.close()
+        return False
+    
+    def _load_presence_index(self, day=None):
+        """Load the roster and the IDs already recorded on the given day (default today)"""
+        if day is None:
+            day = time.strftime("%Y-%m-%d")
         
-        # Check if the teacher exists
-        cursor.execute("SELECT id FROM teachers WHERE id = ?", (teacher_id,))
-        result = cursor.fetchone()
+        cursor = self._get_connection().cursor()
+        roster = {}
+        present = {}
+        for kind, (people, table, column) in PRESENCE_TABLES.items():
+            cursor.execute(f"SELECT id FROM {people}")
+            roster[kind] = {row[0] for row in cursor.fetchall()}
+            cursor.execute(f"SELECT {column} FROM {table} WHERE day = ?", (day_number(day),))
+            present[kind] = {row[0] for row in cursor.fetchall()}
         
-        if result:
-            # Check if presence already recorded for today
-            today = timestamp.split()[0]
-            cursor.execute(
-                "SELECT id FROM teacher_presence WHERE teacher_id = ? AND date(timestamp) = date(?)",
-                (teacher_id, timestamp)
-            )
-            
-            if not cursor.fetchone():
-                # Record new presence
-                cursor.execute(
-                    "INSERT INTO teacher_presence (teacher_id, timestamp) VALUES (?, ?)",
-                    (teacher_id, timestamp)
-                )
-                conn.commit()
-                return True
-            return False  # Already recorded
-        else:
-            return False  # Teacher not found
+        with self.index_lock:
+            # Another thread may have rolled over to this day already and started claiming IDs
+            if self.present_day is None or day > self.present_day:
+                self.roster = roster
+                self.present = present
+                self.present_day = day
+    
+    def _lookup_presence(self, kind, person_id, timestamp, claim=True):
+        """What the in-memory index knows about a presence event.
+        
+        Returns "recorded" for a repeat, "new" for a known person not yet seen that day
+        (claiming the day for them unless claim is False), or None when only the
+        database can tell.
+        """
+        day = timestamp.split()[0]
+        
+        with self.index_lock:
+            if self.present_day is None:
+                return None  # Index not loaded
+            rolled_over = day > self.present_day
+        
+        if rolled_over:
+            # First event after midnight
+            self._load_presence_index(day)
+        
+        with self.index_lock:
+            if day != self.present_day:
+                return None  # Backdated event
+            if person_id in self.present[kind]:
+                return "recorded"
+            if person_id not in self.roster[kind]:
+                return None
+            if claim:
+                self.present[kind].add(person_id)
+            return "new"
+    
+    def _remember_presence(self, kind, person_id, timestamp):
+        with self.index_lock:
+            if self.present_day is None:
+                return
+            self.roster[kind].add(person_id)
+            if timestamp.split()[0] == self.present_day:
+                self.present[kind].add(person_id)
+    
+    def _forget_presence(self, kind, person_id, timestamp):
+        with self.index_lock:
+            if timestamp.split()[0] == self.present_day:
+                self.present[kind].discard(person_id)
     
-    def add_reminder(self, text, timestamp=None):
-        """Add a new reminder"""
+    def add_reminder(self, text, timestamp=None, due_ts=None, classroom=None):
+        """Add a new reminder, due at due_ts (naive epoch seconds) for a classroom (None for all)"""
         if timestamp is None:
             timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        if due_ts is None:
+            due_ts = time_columns(timestamp)[0] + config.REMINDER_DEFAULT_DELAY
         
         conn = self._get_connection()
         cursor = conn.cursor()
         
         cursor.execute(
-            "INSERT INTO reminders (text, timestamp) VALUES (?, ?)",
-            (text, timestamp)
+            "INSERT INTO reminders (text, timestamp, due_ts, classroom) VALUES (?, ?, ?, ?)",
+            (text, timestamp, due_ts, classroom)
         )
         conn.commit()
         return cursor.lastrowid
@@ -152,8 +321,8 @@ class DatabaseOperations:
         cursor = conn.cursor()
         
         cursor.execute(
-            "INSERT INTO query_log (query, response, timestamp) VALUES (?, ?, ?)",
-            (query, response, timestamp)
+            "INSERT INTO query_log (query, response, timestamp, ts, day) VALUES (?, ?, ?, ?, ?)",
+            (query, response, timestamp) + time_columns(timestamp)
         )
         conn.commit()
     
@@ -166,54 +335,34 @@ class DatabaseOperations:
         cursor = conn.cursor()
         
         cursor.execute(
-            "INSERT INTO performance_metrics (student_id, subject, metric_type, value, timestamp) VALUES (?, ?, ?, ?, ?)",
-            (student_id, subject, metric_type, value, timestamp)
+            "INSERT INTO performance_metrics (student_id, subject, metric_type, value, timestamp, ts, day) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (student_id, subject, metric_type, value, timestamp) + time_columns(timestamp)
         )
         conn.commit()
     
-    def get_attendance_summary(self, date=None):
-        """Get attendance summary for a specific date or today"""
+    def get_attendance_summary(self, date=None, class_id=None):
+        """Get attendance summary for a specific date or today, optionally for one class"""
         if date is None:
             date = time.strftime("%Y-%m-%d")
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT s.name, s.class_id, a.timestamp
-            FROM attendance a
-            JOIN students s ON a.student_id = s.id
-            WHERE date(a.timestamp) = date(?)
-            ORDER BY s.class_id, s.name
-        """, (date,))
-        
-        results = cursor.fetchall()
-        
-        if results:
-            summary = f"Attendance for {date}:\n"
-            current_class = None
-            
-            for row in results:
-                if row['class_id'] != current_class:
-                    current_class = row['class_id']
-                    summary += f"\n{current_class}:\n"
-                
-                summary += f"- {row['name']} (arrived at {row['timestamp'].split()[1]})\n"
-            
-            return summary
-        else:
-            return f"No attendance records for {date}"
+        return self.summary.get_text(date, class_id)
+    
+    def get_attendance_counts(self, start_date, end_date=None, class_id=None):
+        """Get [(date, {class_id: students present})] for each day from start_date to end_date"""
+        return self.summary.get_counts(start_date, end_date or start_date, class_id)
     
     def get_active_reminders(self):
-        """Get all active (incomplete) reminders"""
+        """Get all active (incomplete) reminders, soonest due first"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
+        # Served by the partial index on incomplete reminders
         cursor.execute("""
-            SELECT id, text, timestamp
+            SELECT id, text, timestamp, due_ts, classroom
             FROM reminders
             WHERE completed = 0
-            ORDER BY timestamp
+            ORDER BY due_ts
         """)
         
         results = cursor.fetchall()
@@ -224,7 +373,9 @@ class DatabaseOperations:
                 reminders.append({
                     'id': row['id'],
                     'text': row['text'],
-                    'timestamp': row['timestamp']
+                    'timestamp': row['timestamp'],
+                    'due_ts': row['due_ts'],
+                    'classroom': row['classroom']
                 })
             return reminders
         else:
@@ -232,16 +383,20 @@ class DatabaseOperations:
     
     def mark_reminder_completed(self, reminder_id):
         """Mark a reminder as completed"""
+        return self.mark_reminders_completed([reminder_id]) > 0
+    
+    def mark_reminders_completed(self, reminder_ids):
+        """Mark several reminders as completed in one transaction; returns how many were updated"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        cursor.execute(
+        cursor.executemany(
             "UPDATE reminders SET completed = 1 WHERE id = ?",
-            (reminder_id,)
+            [(reminder_id,) for reminder_id in reminder_ids]
         )
         conn.commit()
         
-        return cursor.rowcount > 0
+        return cursor.rowcount
     
     def get_student_performance(self, student_id, subject=None):
         """Get performance metrics for a student"""
@@ -253,14 +408,14 @@ class DatabaseOperations:
                 SELECT metric_type, value, timestamp
                 FROM performance_metrics
                 WHERE student_id = ? AND subject = ?
-                ORDER BY timestamp DESC
+                ORDER BY ts DESC
             """, (student_id, subject))
         else:
             cursor.execute("""
                 SELECT subject, metric_type, value, timestamp
                 FROM performance_metrics
                 WHERE student_id = ?
-                ORDER BY subject, timestamp DESC
+                ORDER BY subject, ts DESC
             """, (student_id,))
         
         results = cursor.fetchall()
@@ -282,8 +437,27 @@ class DatabaseOperations:
         else:
             return []
     
+    def get_class_report(self, class_id=None, window_days=None):
+        """Get subject averages, percentiles, weekly trend and at-risk students for a class (or everyone)"""
+        return self._get_analytics().class_report(class_id, window_days)
+    
+    def get_performance_trend(self, student_id, subject):
+        """Get a student's metrics in one subject over time with their moving average"""
+        return self._get_analytics().trend(student_id, subject)
+    
+    def _get_analytics(self):
+        with self.lock:
+            if self.analytics is None:
+                from database.analytics import PerformanceAnalytics
+                self.analytics = PerformanceAnalytics(self)
+            return self.analytics
+    
     def close(self):
-        """Close the database connection"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
\ No newline at end of file
+        """Close every thread's database connection"""
+        with self.lock:
+            connections = list(self.connections.values())
+            self.connections.clear()
+        
+        for conn in connections:
+            conn.close()
+        self.local = threading.local()
\ No newline at end of file
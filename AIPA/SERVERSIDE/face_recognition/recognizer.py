@@ -8,6 +8,7 @@ from PIL import Image
 import sys
 sys.path.append('..')
 import config
+from monitoring.metrics import STAGE_SECONDS, FACES_RECOGNIZED
 
 class FaceRecognizer:
     def __init__(self):
@@ -41,19 +42,22 @@ class FaceRecognizer:
         
         # Save the encodings
         if self.known_face_encodings:
-            encodings_file = os.path.join(config.EMBEDDINGS_PATH, "encodings.pkl")
-            data = {"encodings": self.known_face_encodings, "names": self.known_face_names}
-            
-            os.makedirs(config.EMBEDDINGS_PATH, exist_ok=True)
-            
-            with open(encodings_file, "wb") as f:
-                pickle.dump(data, f)
+            self._save_encodings()
             
             self.model_loaded = True
             print(f"Model trained with {len(self.known_face_names)} face profiles")
         else:
             print("No faces found for training")
     
+    def _save_encodings(self):
+        encodings_file = os.path.join(config.EMBEDDINGS_PATH, "encodings.pkl")
+        data = {"encodings": self.known_face_encodings, "names": self.known_face_names}
+        
+        os.makedirs(config.EMBEDDINGS_PATH, exist_ok=True)
+        
+        with open(encodings_file, "wb") as f:
+            pickle.dump(data, f)
+    
     def _train_from_directory(self, directory, prefix):
         if not os.path.exists(directory):
             os.makedirs(directory)
@@ -92,16 +96,35 @@ class FaceRecognizer:
             return []
         
         # Convert frame data to image
+        with STAGE_SECONDS.time(stage="decode"):
+            rgb_image = self._decode_frame(frame_data)
+        
+        # Find all faces in the current frame
+        with STAGE_SECONDS.time(stage="detect"):
+            face_locations = self._detect_faces(rgb_image)
+        with STAGE_SECONDS.time(stage="encode"):
+            face_encodings = self._encode_faces(rgb_image, face_locations)
+        
+        with STAGE_SECONDS.time(stage="match"):
+            recognized_names = self._match_faces(face_encodings)
+        
+        FACES_RECOGNIZED.inc(len(recognized_names))
+        return recognized_names
+    
+    def _decode_frame(self, frame_data):
         image = Image.open(BytesIO(frame_data))
         image_np = np.array(image)
         
         # Convert RGB to BGR (for OpenCV)
-        rgb_image = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        
-        # Find all faces in the current frame
-        face_locations = face_recognition.face_locations(rgb_image)
-        face_encodings = face_recognition.face_encodings(rgb_image, face_locations)
-        
+        return cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
+    
+    def _detect_faces(self, image):
+        return face_recognition.face_locations(image)
+    
+    def _encode_faces(self, image, face_locations):
+        return face_recognition.face_encodings(image, face_locations)
+    
+    def _match_faces(self, face_encodings):
         recognized_names = []
         
         for face_encoding in face_encodings:
@@ -151,11 +174,7 @@ class FaceRecognizer:
                 self.known_face_names.append(prefix + person_id)
                 
                 # Save the updated encodings
-                encodings_file = os.path.join(config.EMBEDDINGS_PATH, "encodings.pkl")
-                data = {"encodings": self.known_face_encodings, "names": self.known_face_names}
-                
-                with open(encodings_file, "wb") as f:
-                    pickle.dump(data, f)
+                self._save_encodings()
                 
                 return True
             else:
@@ -0,0 +1,243 @@
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond matching up to slow STT/TTS calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(self._key(labels), 0)
+
+    def total(self):
+        """Sum over all label combinations"""
+        with self.lock:
+            return sum(self.values.values())
+
+    def _samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+        self.functions = {}
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func, **labels):
+        """Compute the value lazily at scrape time"""
+        with self.lock:
+            self.functions[self._key(labels)] = func
+
+    def get(self, **labels):
+        key = self._key(labels)
+        with self.lock:
+            func = self.functions.get(key)
+            if func is None:
+                return self.values.get(key, 0)
+        return func()
+
+    def _samples(self):
+        with self.lock:
+            values = dict(self.values)
+            functions = dict(self.functions)
+
+        for key, func in functions.items():
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager that observes the elapsed wall time"""
+        return _Timer(self, labels)
+
+    def get_count(self, **labels):
+        with self.lock:
+            series = self.series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile from the bucket counts (upper bound of the bucket it falls in)"""
+        with self.lock:
+            series = self.series.get(self._key(labels))
+            if not series or not series[2]:
+                return None
+            counts = list(series[0])
+            total = series[2]
+
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def _samples(self):
+        with self.lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self.series.items())
+
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class MetricsRegistry:
+    """In-process registry rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = [self.metrics[name] for name in sorted(self.metrics)]
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry shared by the server, recognizer and web interface
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "aipa_stage_seconds",
+    "Latency of each processing stage (recv, decode, detect, encode, match, db_write, stt, intent, query, tts)",
+    ("stage",)
+)
+MESSAGES = REGISTRY.counter("aipa_messages_total", "Messages received from clients", ("type",))
+FRAMES = REGISTRY.counter("aipa_frames_total", "Camera frames received per client", ("client",))
+FRAMES_DROPPED = REGISTRY.counter("aipa_frames_dropped_total", "Camera frames dropped without processing", ("reason",))
+PI_FRAMES = REGISTRY.counter("aipa_pi_frames_total", "Camera frames handled on the Pi, as reported by it",
+                             ("client", "outcome"))
+FACES_RECOGNIZED = REGISTRY.counter("aipa_faces_recognized_total", "Known faces recognized in frames")
+BYTES_RECEIVED = REGISTRY.counter("aipa_received_bytes_total", "Payload bytes received from clients", ("type",))
+CONNECTED_CLIENTS = REGISTRY.gauge("aipa_connected_clients", "Currently connected classroom clients")
+QUEUE_DEPTH = REGISTRY.gauge("aipa_queue_depth", "Items waiting in internal queues", ("queue",))
+IN_FLIGHT = REGISTRY.gauge("aipa_in_flight_messages", "Messages currently being processed", ("type",))
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class SamplingProfiler:
+    """Periodically samples the stacks of every thread and aggregates them as collapsed stacks.
+
+    Nothing runs while the profiler is stopped, so it costs nothing until switched on.
+    """
+
+    def __init__(self, rate=100, max_depth=64):
+        self.rate = rate
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, rate=None):
+        """Start sampling at the given rate (samples per second)"""
+        if rate:
+            self.rate = max(1, min(int(rate), 1000))
+
+        if self.running:
+            return False
+
+        self._stop_event.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler")
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return False
+
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed += time.time() - self.started_at
+        return True
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.sample_count = 0
+            self.elapsed = 0.0
+
+    def _run(self):
+        own_id = threading.get_ident()
+
+        # The rate is read every time, so start(rate) takes effect while sampling
+        while not self._stop_event.wait(1.0 / self.rate):
+            self._sample(own_id)
+
+    def _sample(self, own_id):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            calls = []
+            while frame is not None and len(calls) < self.max_depth:
+                code = frame.f_code
+                calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            calls.append(names.get(thread_id, f"thread-{thread_id}"))
+            calls.reverse()
+            stacks.append(";".join(calls))
+
+        with self.lock:
+            self.samples.update(stacks)
+            self.sample_count += 1
+
+    def get_collapsed(self):
+        """Stacks in the collapsed format understood by flamegraph.pl and speedscope"""
+        with self.lock:
+            items = sorted(self.samples.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def dump(self, path):
+        """Write the collapsed stacks to a file and return its path"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.get_collapsed())
+        return path
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'running': self.running,
+                'rate': self.rate,
+                'samples': self.sample_count,
+                'unique_stacks': len(self.samples),
+                'elapsed': self.elapsed + (time.time() - self.started_at if self.running else 0.0)
+            }
@@ -1,65 +1,186 @@
+import json
+import os
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+from collections import deque
+import sys
+sys.path.append('..')
+import config
 
-# Download NLTK resources if not already downloaded
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Words as the matcher sees them; contractions ("who's", "don't") stay one word
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+def tokenize(text):
+    return WORD.findall(text.lower().replace("’", "'"))
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over words.
+
+    Every keyword phrase of every intent is compiled into one trie with failure
+    links, so a single left-to-right pass over the words of an utterance finds all
+    matching phrases. Matching whole words makes it word-boundary correct ("note"
+    does not match "notebook") and the cost per word does not grow with the size
+    of the vocabulary.
+    """
+
+    def __init__(self, keywords):
+        # State 0 is the root; goto[state] maps a word to the next state
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # state -> [(intent, phrase length)]
+
+        for intent, phrases in keywords.items():
+            for phrase in phrases:
+                self._add(intent, tokenize(phrase))
+        self._link()
+
+    def _add(self, intent, words):
+        if not words:
+            return
+        state = 0
+        for word in words:
+            next_state = self.goto[state].get(word)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][word] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append((intent, len(words)))
+
+    def _link(self):
+        # Breadth-first, so a state's failure target is always finished before it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self.goto[state].items():
+                queue.append(next_state)
+
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(word, 0)
+                self.fail[next_state] = target if target != next_state else 0
+
+                # A phrase ending here also ends every phrase that is its suffix
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def scan(self, words):
+        """Yield (intent, phrase length) for every keyword phrase found in the words"""
+        state = 0
+        for word in words:
+            while state and word not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(word, 0)
+            yield from self.output[state]
 
 class IntentClassifier:
-    def __init__(self):
+    # Highest priority first: a reminder that mentions homework is still a reminder,
+    # and the generic academic phrases only decide when nothing else matched
+    INTENTS = ("attendance_query", "reminder", "academic_query")
+    KEYWORD_LISTS = {"attendance_query": "attendance_keywords", "reminder": "reminder_keywords",
+                     "academic_query": "academic_keywords"}
+
+    def __init__(self, keywords_path=None):
+        self.keywords_path = keywords_path or config.INTENT_KEYWORDS_PATH
+
         self.attendance_keywords = [
-            'attendance', 'present', 'absent', 'who is here', 'who\'s here', 
+            'attendance', 'present', 'absent', 'who is here', 'who\'s here',
             'who came', 'mark attendance', 'take attendance', 'record attendance',
             'class attendance', 'students present'
         ]
-        
+
         self.academic_keywords = [
             'what is', 'define', 'explain', 'how to', 'when was', 'who is',
             'where is', 'why does', 'calculate', 'solve', 'formula', 'concept',
             'subject', 'topic', 'chapter', 'homework', 'assignment', 'question',
             'problem', 'solution', 'answer', 'help me', 'can you help'
         ]
-        
+
         self.reminder_keywords = [
-            'remind', 'reminder', 'remember', 'note', 'don\'t forget', 
+            'remind', 'reminder', 'remember', 'note', 'don\'t forget',
             'schedule', 'set reminder', 'set a reminder', 'create reminder',
             'remind me', 'remind us', 'remind the class'
         ]
-        
-        self.stopwords = set(stopwords.words('english'))
-    
+
+        self.default_keywords = {intent: list(getattr(self, attribute))
+                                 for intent, attribute in self.KEYWORD_LISTS.items()}
+        self.compile()
+        try:
+            self.load_keywords()
+        except (OSError, ValueError) as e:
+            # A broken keyword file must not keep the NLP phase from starting; reload() reports it
+            print(f"Error loading intent keywords: {str(e)}; using the built-in phrases")
+
+    def compile(self):
+        """Rebuild the matcher from the keyword lists (call after changing them)"""
+        self.automaton = KeywordAutomaton({intent: getattr(self, attribute)
+                                           for intent, attribute in self.KEYWORD_LISTS.items()})
+
+    def load_keywords(self, path=None):
+        """Apply the keyword file (INTENT_KEYWORDS_PATH) to the live matcher.
+
+        The file maps intent names to phrase lists, which replace the built-in
+        phrases of those intents; intents it leaves out, or a missing file, mean the
+        built-in phrases. Returns {intent: (added, removed)} for the intents that
+        changed. A new matcher is built on the side and swapped in with one
+        assignment, so classification never waits or sees a half-built matcher.
+        """
+        path = path or self.keywords_path
+        overrides = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                overrides = json.load(f)
+            if not isinstance(overrides, dict):
+                raise ValueError(f"{path} must map intent names to phrase lists")
+            unknown = set(overrides) - set(self.KEYWORD_LISTS)
+            if unknown:
+                raise ValueError(f"Unknown intents in {path}: {', '.join(sorted(unknown))}")
+
+        changes = {}
+        keywords = {}
+        for intent, attribute in self.KEYWORD_LISTS.items():
+            current = getattr(self, attribute)
+            phrases = [str(phrase).lower() for phrase in overrides.get(intent, self.default_keywords[intent])]
+            added = [phrase for phrase in phrases if phrase not in current]
+            removed = [phrase for phrase in current if phrase not in phrases]
+            if added or removed:
+                changes[intent] = (added, removed)
+            keywords[intent] = phrases
+
+        if changes:
+            automaton = KeywordAutomaton(keywords)
+            for intent, attribute in self.KEYWORD_LISTS.items():
+                setattr(self, attribute, keywords[intent])
+            self.automaton = automaton
+        return changes
+
+    def score(self, text):
+        """Per-intent scores for an utterance: the number of words covered by matching phrases"""
+        scores = dict.fromkeys(self.INTENTS, 0)
+        for intent, length in self.automaton.scan(tokenize(text)):
+            scores[intent] += length
+        return scores
+
     def classify(self, text):
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Tokenize
-        words = word_tokenize(text)
-        
-        # Remove stopwords
-        filtered_words = [w for w in words if w not in self.stopwords]
-        
-        # Check for keywords
-        for keyword in self.attendance_keywords:
-            if keyword in text:
-                return "attendance_query"
-        
-        for keyword in self.reminder_keywords:
-            if keyword in text:
-                return "reminder"
-        
-        # Academic query is more generic, so check it last
-        for keyword in self.academic_keywords:
-            if keyword in text:
-                return "academic_query"
-        
+        return self._pick(self.score(text))
+
+    def _pick(self, scores):
+        # The highest-priority intent with any match wins
+        for intent in self.INTENTS:
+            if scores[intent]:
+                return intent
+
         # If no specific intent is found, treat as a general query
         return "general_query"
+
+    def classify_batch(self, texts, with_scores=False):
+        """Classify many utterances (e.g. replaying the query log) with one compiled matcher.
+
+        Returns a list of intents, or of (intent, scores) pairs when with_scores is True.
+        """
+        results = []
+        for text in texts:
+            scores = self.score(text)
+            results.append((self._pick(scores), scores) if with_scores else self._pick(scores))
+        return results
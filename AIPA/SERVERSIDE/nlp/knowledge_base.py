@@ -0,0 +1,415 @@
+"""Disk-backed knowledge base with SQLite FTS5 full-text search.
+
+Import a curriculum from the SERVERSIDE directory:
+
+    python -m nlp.knowledge_base grade7_science.jsonl
+    python -m nlp.knowledge_base textbooks.json --replace
+    python -m nlp.knowledge_base grade7_science.jsonl --sync
+
+JSONL files hold one {"category", "subcategory", "topic", "answer"} object per line.
+JSON files hold either a list of such objects or the nested
+{category: {subcategory: {topic: answer}}} layout of the built-in knowledge base.
+Topics that already exist (same category, subcategory and topic) are updated.
+With --sync the files are the whole of their categories: topics of those categories
+that the files no longer list are removed. A running server picks the changes up
+without a restart (see reloader.py).
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import sys
+sys.path.append('..')
+import config
+from nlp.search_index import Document, InvertedIndex
+from nlp.spelling import DeletionIndex
+
+COLUMNS = ("category", "subcategory", "topic", "answer")
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        id INTEGER PRIMARY KEY,
+        category TEXT NOT NULL,
+        subcategory TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        UNIQUE (category, subcategory, topic)
+    )
+    """,
+    # Every insert, update and delete, so running servers can refresh only what changed
+    """
+    CREATE TABLE IF NOT EXISTS entry_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        entry_id INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_changed_ai AFTER INSERT ON entries BEGIN
+        INSERT INTO entry_changes (entry_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_changed_au AFTER UPDATE ON entries BEGIN
+        INSERT INTO entry_changes (entry_id) VALUES (new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_changed_ad AFTER DELETE ON entries BEGIN
+        INSERT INTO entry_changes (entry_id) VALUES (old.id);
+    END
+    """
+]
+
+FTS_SCHEMA = [
+    # External-content index: the text lives once, in entries; porter folds word endings
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+        topic, category, subcategory, answer,
+        content='entries', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+        INSERT INTO entries_fts (rowid, topic, category, subcategory, answer)
+        VALUES (new.id, new.topic, new.category, new.subcategory, new.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+        INSERT INTO entries_fts (entries_fts, rowid, topic, category, subcategory, answer)
+        VALUES ('delete', old.id, old.topic, old.category, old.subcategory, old.answer);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+        INSERT INTO entries_fts (entries_fts, rowid, topic, category, subcategory, answer)
+        VALUES ('delete', old.id, old.topic, old.category, old.subcategory, old.answer);
+        INSERT INTO entries_fts (rowid, topic, category, subcategory, answer)
+        VALUES (new.id, new.topic, new.category, new.subcategory, new.answer);
+    END
+    """
+]
+
+UPSERT = """
+    INSERT INTO entries (category, subcategory, topic, answer) VALUES (?, ?, ?, ?)
+    ON CONFLICT (category, subcategory, topic) DO UPDATE SET answer = excluded.answer
+    WHERE answer != excluded.answer
+"""
+
+class KnowledgeBase:
+    """Knowledge base entries kept on disk and searched with FTS5.
+
+    Nothing is read at startup: searches rank entries inside SQLite and only the
+    few best entries are loaded, categories are listed and paged through on demand,
+    and the most recently used entries stay in a bounded LRU cache. search() has
+    the same interface as InvertedIndex.search, so QueryProcessor uses either.
+
+    SQLite builds without FTS5 fall back to an in-memory InvertedIndex of the store.
+    """
+
+    def __init__(self, path=None, cache_size=None):
+        self.path = path or config.KNOWLEDGE_BASE_PATH
+        self.cache_size = cache_size if cache_size is not None else config.KNOWLEDGE_CACHE_SIZE
+        self.local = threading.local()
+        self.cache = OrderedDict()  # entry id -> Document, least recently used first
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.memory_index = None
+        self.spelling = DeletionIndex()
+
+        conn = self._get_connection()
+        self.spelling.create(conn)
+        for statement in TABLES:
+            conn.execute(statement)
+        conn.commit()
+        try:
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            if "fts5" not in str(e):
+                raise
+            print(f"SQLite has no FTS5 ({str(e)}); indexing the knowledge base in memory")
+            self.memory_index = self._build_memory_index()
+
+        # Last change this process has seen, see refresh()
+        self.version = self._latest_version(conn)
+
+        if not conn.execute("SELECT 1 FROM vocabulary LIMIT 1").fetchone() and len(self):
+            self._build_vocabulary()
+
+    def _get_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=config.DB_BUSY_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._get_connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def search(self, terms, k=5):
+        """Top k (score, Document) pairs for already tokenized query terms, best first"""
+        if self.memory_index is not None:
+            return self.memory_index.search(terms, k)
+
+        terms = {term for term in terms if term}
+        if not terms:
+            return []
+
+        # Quoted, so no query term is taken for FTS5 syntax (AND, NEAR, column filters)
+        match = " OR ".join('"' + term.replace('"', '') + '"' for term in sorted(terms))
+        ranked = self._get_connection().execute(f"""
+            SELECT rowid, bm25(entries_fts, {InvertedIndex.TOPIC_BOOST}, 1.0, 1.0, 1.0) AS score
+            FROM entries_fts WHERE entries_fts MATCH ?
+            ORDER BY score, rowid LIMIT ?
+        """, (match, k)).fetchall()
+
+        documents = self.get(row[0] for row in ranked)
+        # FTS5 scores are negative, lower is better
+        return [(-score, documents[doc_id]) for doc_id, score in ranked if doc_id in documents]
+
+    def correct(self, terms):
+        """Query terms with misheard ones replaced by the closest knowledge-base terms (see DeletionIndex)"""
+        return self.spelling.correct(self._get_connection(), terms)
+
+    def get(self, ids):
+        """{id: Document} for entry ids, from the cache where possible"""
+        found = {}
+        missing = []
+        with self.lock:
+            for doc_id in ids:
+                document = self.cache.get(doc_id)
+                if document is None:
+                    missing.append(doc_id)
+                else:
+                    self.cache.move_to_end(doc_id)
+                    found[doc_id] = document
+
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            rows = self._get_connection().execute(
+                f"SELECT id, category, subcategory, topic, answer FROM entries WHERE id IN ({placeholders})",
+                missing).fetchall()
+            loaded = {row[0]: Document(*row) for row in rows}
+            self._remember(loaded)
+            found.update(loaded)
+        return found
+
+    def _remember(self, documents):
+        with self.lock:
+            self.cache.update(documents)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def categories(self):
+        """[(category, number of topics)] in name order"""
+        return self._get_connection().execute(
+            "SELECT category, COUNT(*) FROM entries GROUP BY category ORDER BY category").fetchall()
+
+    def topics(self, category, subcategory=None, page=0, page_size=None):
+        """One page of a category's (or subcategory's) entries as Documents, in name order"""
+        page_size = page_size or config.KNOWLEDGE_PAGE_SIZE
+        sql = "SELECT id, category, subcategory, topic, answer FROM entries WHERE category = ?"
+        params = [category]
+        if subcategory is not None:
+            sql += " AND subcategory = ?"
+            params.append(subcategory)
+        sql += " ORDER BY subcategory, topic LIMIT ? OFFSET ?"
+        params += [page_size, page * page_size]
+
+        documents = [Document(*row) for row in self._get_connection().execute(sql, params)]
+        self._remember({document.id: document for document in documents})
+        return documents
+
+    def import_entries(self, entries, replace=False, sync=False):
+        """Upsert (category, subcategory, topic, answer) tuples; returns how many were read.
+
+        With sync, topics of the imported categories that are not among the entries
+        are deleted. Unchanged topics are left alone, so the index only does work for
+        what actually changed.
+        """
+        conn = self._get_connection()
+        count = 0
+        seen = set()
+        try:
+            if replace:
+                conn.execute("DELETE FROM entries")
+                self.spelling.clear(conn)
+            known = self.spelling.known_terms(conn)
+
+            chunk = []
+            for entry in entries:
+                chunk.append(entry)
+                if sync:
+                    seen.add(entry[:3])
+                if len(chunk) >= config.IMPORT_CHUNK_SIZE:
+                    self._write_chunk(conn, chunk, known)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                self._write_chunk(conn, chunk, known)
+                count += len(chunk)
+            if sync:
+                self._remove_missing(conn, seen, known)
+
+            if self.memory_index is None and count >= config.IMPORT_CHUNK_SIZE:
+                conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('optimize')")
+            conn.execute("DELETE FROM entry_changes WHERE version <= ?",
+                         (self._latest_version(conn) - config.KNOWLEDGE_CHANGES_KEPT,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        self.refresh()
+        return count
+
+    def _remove_missing(self, conn, seen, known):
+        stale = []
+        for category in {key[0] for key in seen}:
+            for entry_id, subcategory, topic, answer in conn.execute(
+                    "SELECT id, subcategory, topic, answer FROM entries WHERE category = ?", (category,)):
+                if (category, subcategory, topic) not in seen:
+                    stale.append((entry_id, (category, subcategory, topic, answer)))
+        conn.executemany("DELETE FROM entries WHERE id = ?", ((entry_id,) for entry_id, _ in stale))
+        # Committed together with the deletions, so a reload never corrects towards a removed topic
+        if stale:
+            self.spelling.remove_entries(conn, [entry for _, entry in stale], known)
+        return len(stale)
+
+    def refresh(self):
+        """Catch up with changes committed since the last refresh, by this or any other process.
+
+        Drops only the changed entries from the cache; searches read committed
+        snapshots from SQLite, so they are never blocked and never see half an
+        import. Returns the changed entry ids, or None when the change log no
+        longer reaches back far enough and everything was dropped.
+        """
+        with self.refresh_lock:
+            conn = self._get_connection()
+            latest = self._latest_version(conn)
+            if latest <= self.version:
+                return []
+
+            oldest = conn.execute("SELECT MIN(version) FROM entry_changes").fetchone()[0] or 0
+            if oldest > self.version + 1:
+                changed = None
+                with self.lock:
+                    self.cache.clear()
+            else:
+                changed = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT entry_id FROM entry_changes WHERE version > ? AND version <= ?",
+                    (self.version, latest))]
+                with self.lock:
+                    for entry_id in changed:
+                        self.cache.pop(entry_id, None)
+
+            if self.memory_index is not None:
+                # Without FTS5 a fresh index is built and swapped in whole
+                self.memory_index = self._build_memory_index()
+            self.version = latest
+            return changed
+
+    def _latest_version(self, conn):
+        return conn.execute("SELECT MAX(version) FROM entry_changes").fetchone()[0] or 0
+
+    def _write_chunk(self, conn, chunk, known):
+        # Later duplicates of a topic win, as they would with one UPSERT after another
+        latest = {tuple(entry[:3]): entry[3] for entry in chunk}
+
+        changed = []
+        replaced = []
+        for key, answer in latest.items():
+            row = conn.execute("SELECT answer FROM entries WHERE category = ? AND subcategory = ? AND topic = ?",
+                               key).fetchone()
+            if row is None or row[0] != answer:
+                changed.append(key + (answer,))
+                if row is not None:
+                    replaced.append(key + (row[0],))
+
+        # Only new and edited entries count towards the vocabulary, so re-importing
+        # the same file leaves the term counts as they were
+        if replaced:
+            self.spelling.remove_entries(conn, replaced, known)
+        conn.executemany(UPSERT, changed)
+        self.spelling.add_entries(conn, changed, known)
+
+    def _build_vocabulary(self):
+        """Fill the spelling tables of a store created before they existed"""
+        conn = self._get_connection()
+        known = set()
+        cursor = conn.execute("SELECT category, subcategory, topic, answer FROM entries")
+        while True:
+            chunk = cursor.fetchmany(config.IMPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.spelling.add_entries(conn, chunk, known)
+        conn.commit()
+
+    def _build_memory_index(self):
+        index = InvertedIndex()
+        for row in self._get_connection().execute(
+                "SELECT id, category, subcategory, topic, answer FROM entries ORDER BY id"):
+            index.add(*row)
+        return index
+
+def flatten(knowledge_base):
+    """(category, subcategory, topic, answer) tuples from the nested dict layout"""
+    for category, subcategories in knowledge_base.items():
+        for subcategory, topics in subcategories.items():
+            for topic, answer in topics.items():
+                yield category, subcategory, topic, answer
+
+def read_entries(path):
+    """Entries of a JSON or JSONL file; JSONL is streamed line by line"""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield _entry(json.loads(line), f"{path}:{line_number}")
+        return
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        yield from flatten(data)
+    else:
+        for position, item in enumerate(data):
+            yield _entry(item, f"{path}[{position}]")
+
+def _entry(item, where):
+    try:
+        entry = tuple(str(item[column]).strip() for column in COLUMNS)
+    except (KeyError, TypeError):
+        raise ValueError(f"{where}: expected an object with {', '.join(COLUMNS)}")
+    if not all(entry):
+        raise ValueError(f"{where}: {', '.join(COLUMNS)} must not be empty")
+    return entry
+
+def main():
+    parser = argparse.ArgumentParser(description="Import knowledge base entries from JSON or JSONL")
+    parser.add_argument("files", nargs="+", help="JSON or JSONL files")
+    parser.add_argument("--db", help=f"knowledge base file (default {config.KNOWLEDGE_BASE_PATH})")
+    parser.add_argument("--replace", action="store_true", help="delete every existing entry first")
+    parser.add_argument("--sync", action="store_true",
+                        help="remove topics of the imported categories that the files no longer list")
+    args = parser.parse_args()
+
+    knowledge_base = KnowledgeBase(args.db)
+    start = time.time()
+    # One transaction for all files, so --sync sees every topic they list
+    entries = itertools.chain.from_iterable(read_entries(path) for path in args.files)
+    count = knowledge_base.import_entries(entries, replace=args.replace, sync=args.sync)
+    print(f"{len(knowledge_base)} entries in {knowledge_base.path} "
+          f"({count} imported from {len(args.files)} files in {time.time() - start:.1f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,19 @@ import os
 import sys
 sys.path.append('..')
 import config
+from nlp.knowledge_base import KnowledgeBase, flatten
+from nlp.search_index import tokenize
 
 class QueryProcessor:
     def __init__(self):
-        # Load academic knowledge base
-        self.knowledge_base = self._load_knowledge_base()
+        # Academic knowledge base on disk, searched in place (see nlp/knowledge_base.py)
+        self.knowledge_base = KnowledgeBase()
+        if not len(self.knowledge_base):
+            self.knowledge_base.import_entries(flatten(self._load_knowledge_base()))
     
     def _load_knowledge_base(self):
-        # This would typically load from a JSON file or database
-        # For this example, we'll create a simple in-memory knowledge base
+        # Sample entries for a fresh install; real curricula are imported with
+        # python -m nlp.knowledge_base
         
         return {
             "math": {
@@ -62,7 +66,7 @@ class QueryProcessor:
         key_terms = self._extract_key_terms(query)
         
         # Search the knowledge base
-        response = self._search_knowledge_base(key_terms, query)
+        response = self._search_knowledge_base(key_terms)
         
         # If no specific answer is found, provide a general response
         if not response:
@@ -77,35 +81,23 @@ class QueryProcessor:
         return response
     
     def _extract_key_terms(self, query):
-        # Remove common words and keep important ones
-        common_words = [
-            "what", "is", "the", "a", "an", "of", "in", "for", "to", "and",
-            "or", "can", "you", "tell", "me", "about", "explain", "define"
-        ]
-        
-        words = query.split()
-        key_terms = [word for word in words if word not in common_words]
-        
-        return key_terms
+        # Remove common words, fold the rest to their index form and map
+        # mis-transcribed words onto the knowledge base vocabulary
+        return self.knowledge_base.correct(tokenize(query))
+    
+    def search(self, query, k=5):
+        """The k most relevant knowledge base entries as (score, category, subcategory, topic, answer)"""
+        return [(score, d.category, d.subcategory, d.topic, d.answer)
+                for score, d in self.knowledge_base.search(self._extract_key_terms(query.lower()), k)]
     
-    def _search_knowledge_base(self, key_terms, full_query):
-        # First, try direct matches in the knowledge base
-        for category in self.knowledge_base:
-            for subcategory in self.knowledge_base[category]:
-                for topic, info in self.knowledge_base[category][subcategory].items():
-                    # Check if topic matches any key terms
-                    if any(term in topic for term in key_terms):
-                        return info
+    def _search_knowledge_base(self, key_terms):
+        results = self.knowledge_base.search(key_terms, 1)
+        if not results:
+            return None
         
-        # If no direct match, try more flexible matching
-        for category in self.knowledge_base:
-            for subcategory in self.knowledge_base[category]:
-                # Check if category or subcategory matches
-                if category in full_query or subcategory in full_query:
-                    # Return a relevant piece of information
-                    topics = list(self.knowledge_base[category][subcategory].keys())
-                    if topics:
-                        topic = topics[0]  # Just pick the first one
-                        return f"On {topic}: {self.knowledge_base[category][subcategory][topic]}"
+        score, document = results[0]
+        if document.topic_terms & set(key_terms):
+            return document.answer
         
-        return None
\ No newline at end of file
+        # Only the category, subcategory or answer text matched: say which topic this is
+        return f"On {document.topic}: {document.answer}"
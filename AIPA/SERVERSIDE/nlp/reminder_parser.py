@@ -0,0 +1,91 @@
+import calendar
+import re
+import time
+import sys
+sys.path.append('..')
+import config
+
+UNITS = {'minute': 60, 'min': 60, 'hour': 3600, 'hr': 3600, 'day': 86400, 'week': 7 * 86400}
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+NUMBER_WORDS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'ten': 10,
+                'fifteen': 15, 'twenty': 20, 'thirty': 30, 'forty five': 45, 'half an': 0.5}
+
+RELATIVE = re.compile(r"\bin (\d+|" + "|".join(NUMBER_WORDS) + r") (minute|min|hour|hr|day|week)s?\b")
+CLOCK = re.compile(r"\bat (\d{1,2})(?:[:.](\d{2}))? ?(am|pm|a\.m\.|p\.m\.)?(?=\W|$)")
+DAY = re.compile(r"\b(today|tonight|tomorrow|(?:on )?(?:" + "|".join(WEEKDAYS) + r"))\b")
+# "class 12", "room b12", "class 7a", "class b"; never a following day or time word ("to class tomorrow")
+CLASSROOM = re.compile(r"\b(?:for|in|to) ((?:classroom|class|room)[ -]?(?:\d+[a-z]?|[a-z]\d+|(?!a\b)[a-z]))\b")
+FILLER = re.compile(r"^(?:me|us|everyone|the class)?\s*(?:to|that|about|of)?\s*")
+
+def now_ts():
+    """Current local wall-clock time as naive epoch seconds, like the database ts columns"""
+    return calendar.timegm(time.localtime())
+
+def parse_reminder(text, now=None):
+    """Split a spoken reminder into (text, due ts, classroom or None).
+
+    Understands "in 10 minutes", "in two hours", "at 3 pm", "at 14:30", "tomorrow",
+    weekday names and "for class B" / "in room 12". Without a time the reminder is
+    due REMINDER_DEFAULT_DELAY seconds from now.
+    """
+    now = now_ts() if now is None else now
+    text = text.lower().strip()
+    due = None
+
+    classroom = None
+    match = CLASSROOM.search(text)
+    if match:
+        classroom = match.group(1)
+        text = _cut(text, match)
+
+    match = RELATIVE.search(text)
+    if match:
+        amount = match.group(1)
+        amount = float(amount) if amount.isdigit() else NUMBER_WORDS[amount]
+        due = now + int(amount * UNITS[match.group(2)])
+        text = _cut(text, match)
+
+    day_offset = None
+    match = DAY.search(text)
+    if match:
+        day_offset = _day_offset(match.group(1), now)
+        text = _cut(text, match)
+
+    match = CLOCK.search(text)
+    if match and due is None:
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        suffix = (match.group(3) or "").replace(".", "")
+        if suffix == "pm" and hour < 12:
+            hour += 12
+        elif suffix == "am" and hour == 12:
+            hour = 0
+        elif not suffix and hour < 7:
+            hour += 12  # "at 3" during a school day means the afternoon
+
+        if hour < 24 and minute < 60:
+            midnight = now - now % 86400
+            due = midnight + (day_offset or 0) * 86400 + hour * 3600 + minute * 60
+            if due <= now and day_offset is None:
+                due += 86400  # That time has passed today: tomorrow
+            text = _cut(text, match)
+
+    if due is None:
+        if day_offset:
+            due = now - now % 86400 + day_offset * 86400 + config.REMINDER_DEFAULT_HOUR * 3600
+        else:
+            due = now + config.REMINDER_DEFAULT_DELAY
+
+    text = FILLER.sub("", re.sub(r"\s+", " ", text).strip(" ,.")).strip()
+    return text, due, classroom
+
+def _cut(text, match):
+    return text[:match.start()] + " " + text[match.end():]
+
+def _day_offset(word, now):
+    word = word.replace("on ", "")
+    if word in ("today", "tonight"):
+        return 0
+    if word == "tomorrow":
+        return 1
+    today = time.gmtime(now).tm_wday
+    return (WEEKDAYS.index(word) - today) % 7 or 7
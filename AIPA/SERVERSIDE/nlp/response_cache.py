@@ -0,0 +1,117 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+import sys
+sys.path.append('..')
+import config
+
+# Intents whose answers are only true for the day they were given ("who is here")
+DAILY_INTENTS = ("attendance_query",)
+
+class CachedResponse:
+    def __init__(self, intent, response, audio=None):
+        self.intent = intent
+        self.response = response
+        self.audio = audio
+        self.created = time.time()
+        self.day = time.strftime("%Y-%m-%d")
+
+class ResponseCache:
+    """Bounded LRU/TTL cache of answers to spoken questions, keyed by normalized transcript"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries if max_entries is not None else config.RESPONSE_CACHE_SIZE
+        self.ttl = ttl if ttl is not None else config.RESPONSE_CACHE_TTL
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped by every invalidation, so an answer computed before one is not stored after it
+        self.generation = 0
+
+        # Hit-rate counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def normalize(text):
+        """Lowercase, drop punctuation and collapse whitespace"""
+        text = re.sub(r"[^\w\s']", " ", text.lower())
+        return " ".join(text.split())
+
+    def get(self, text):
+        key = self.normalize(text)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expired = self.ttl and time.time() - entry.created > self.ttl
+            if expired or (entry.intent in DAILY_INTENTS and entry.day != time.strftime("%Y-%m-%d")):
+                # Expired, or a daily answer given before midnight
+                del self.entries[key]
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, text, intent, response, audio=None, generation=None):
+        """Store an answer; generation is self.generation as read before computing it"""
+        key = self.normalize(text)
+        if not key or self.max_entries <= 0:
+            return
+
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                # Invalidated while it was being computed
+                return
+            self.entries[key] = CachedResponse(intent, response, audio)
+            self.entries.move_to_end(key)
+
+            # Evict least recently used entries
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_audio(self, text, audio):
+        """Attach synthesized audio to an existing entry"""
+        key = self.normalize(text)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.audio = audio
+
+    def invalidate_intent(self, intent):
+        """Drop every entry answered with the given intent"""
+        with self.lock:
+            self.generation += 1
+            stale = [key for key, entry in self.entries.items() if entry.intent == intent]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
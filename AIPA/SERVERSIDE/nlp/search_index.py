@@ -0,0 +1,137 @@
+import heapq
+import math
+import re
+
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = {
+    "what", "is", "the", "a", "an", "of", "in", "for", "to", "and", "or", "can", "you",
+    "tell", "me", "about", "explain", "define", "are", "was", "were", "how", "why", "who",
+    "does", "do", "did", "it", "that", "this", "with", "on", "by", "be", "as", "at", "from",
+    "please", "i", "we", "my", "our", "your", "which", "like", "some"
+}
+
+def normalize(word):
+    """Fold a word to its index form: drop possessives and plain plurals"""
+    if word.endswith("'s"):
+        word = word[:-2]
+    word = word.replace("'", "")
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def tokenize(text):
+    """Normalized, stopword-free terms of a piece of text"""
+    terms = []
+    for word in WORD.findall(text.lower().replace("’", "'")):
+        if word not in STOPWORDS:
+            terms.append(normalize(word))
+    return terms
+
+class Document:
+    def __init__(self, doc_id, category, subcategory, topic, answer):
+        self.id = doc_id
+        self.category = category
+        self.subcategory = subcategory
+        self.topic = topic
+        self.answer = answer
+        self.topic_terms = set(tokenize(topic))
+
+class InvertedIndex:
+    """BM25 index over knowledge-base entries.
+
+    Each entry is indexed under its topic name (weighted TOPIC_BOOST times), its
+    category and subcategory, and its answer text. A query only touches the
+    postings of its own terms, so lookups stay fast however large the knowledge
+    base grows, and results are ranked by relevance rather than dict order.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    TOPIC_BOOST = 3
+    COMMON_TERM_RATIO = 8  # see search()
+
+    def __init__(self):
+        self.documents = {}  # doc id -> Document
+        self.postings = {}   # term -> {doc id: term frequency}
+        self.lengths = {}    # doc id -> number of indexed terms
+        self.total_length = 0
+        self.norms = None    # doc id -> BM25 length normalization, see _get_norms
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, category, subcategory, topic, answer):
+        if doc_id in self.documents:
+            self.remove(doc_id)
+
+        document = Document(doc_id, category, subcategory, topic, answer)
+        terms = tokenize(topic) * self.TOPIC_BOOST + tokenize(f"{category} {subcategory} {answer}")
+
+        frequencies = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+
+        self.documents[doc_id] = document
+        self.lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+        self.norms = None
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+
+        terms = tokenize(document.topic) + tokenize(f"{document.category} {document.subcategory} {document.answer}")
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+        self.total_length -= self.lengths.pop(doc_id)
+        self.norms = None
+
+    def _get_norms(self):
+        """BM25 length normalization per document, recomputed only after the index changed"""
+        if self.norms is None:
+            average_length = self.total_length / len(self.documents)
+            self.norms = {doc_id: self.K1 * (1 - self.B + self.B * length / average_length)
+                          for doc_id, length in self.lengths.items()}
+        return self.norms
+
+    def search(self, terms, k=5):
+        """Top k (score, Document) pairs for already tokenized query terms, best first"""
+        if not self.documents:
+            return []
+
+        count = len(self.documents)
+        norms = self._get_norms()
+        scores = {}
+
+        # Rarest terms first; once they have found candidates, very common terms
+        # (a category name shared by thousands of entries) only re-rank those
+        # candidates instead of walking their whole posting list
+        postings_lists = sorted((p for p in (self.postings.get(t) for t in set(terms)) if p), key=len)
+        for postings in postings_lists:
+            weight = (self.K1 + 1) * math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+
+            if scores and len(postings) > len(scores) * self.COMMON_TERM_RATIO:
+                for doc_id in scores:
+                    frequency = postings.get(doc_id)
+                    if frequency:
+                        scores[doc_id] += weight * frequency / (frequency + norms[doc_id])
+                continue
+
+            get = scores.get
+            for doc_id, frequency in postings.items():
+                scores[doc_id] = get(doc_id, 0.0) + weight * frequency / (frequency + norms[doc_id])
+
+        # Ties go to the entry that was added first, so answers are stable
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(score, self.documents[doc_id]) for doc_id, score in best]
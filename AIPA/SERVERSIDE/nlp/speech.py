@@ -0,0 +1,44 @@
+import io
+import wave
+
+def transcribe(sr, audio_data):
+    """Convert raw 16 kHz 16-bit mono PCM to text with the speech_recognition module"""
+    recognizer = sr.Recognizer()
+    
+    # Create a WAV file in memory
+    wav_file = io.BytesIO()
+    with wave.open(wav_file, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)  # 2 bytes per sample (16-bit)
+        wf.setframerate(16000)
+        wf.writeframes(audio_data)
+    
+    wav_file.seek(0)
+    
+    with sr.AudioFile(wav_file) as source:
+        audio = recognizer.record(source)
+        return recognizer.recognize_google(audio)
+
+def synthesize(text):
+    """Render text to speech with pyttsx3 and return the audio bytes"""
+    import pyttsx3
+    
+    # Initialize the TTS engine
+    engine = pyttsx3.init()
+    
+    # Set properties
+    engine.setProperty('rate', 150)  # Speed of speech
+    engine.setProperty('volume', 0.9)  # Volume (0.0 to 1.0)
+    
+    # Save speech to a BytesIO object
+    output = io.BytesIO()
+    
+    def save_to_buffer(audio):
+        output.write(audio)
+    
+    engine.connect('write', save_to_buffer)
+    engine.say(text)
+    engine.runAndWait()
+    
+    # Get the audio data
+    return output.getvalue()
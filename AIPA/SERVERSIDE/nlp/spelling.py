@@ -0,0 +1,177 @@
+import sys
+sys.path.append('..')
+import config
+from nlp.search_index import tokenize
+
+SCHEMA = [
+    # Every term of the knowledge base, with how often it was imported
+    """
+    CREATE TABLE IF NOT EXISTS vocabulary (
+        term TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """,
+    # Deletion -> term; a term is also stored as its own (zero-deletion) entry
+    """
+    CREATE TABLE IF NOT EXISTS term_deletes (
+        deletion TEXT NOT NULL,
+        term TEXT NOT NULL,
+        PRIMARY KEY (deletion, term)
+    ) WITHOUT ROWID
+    """
+]
+
+def deletes(word, distance):
+    """Every string made by deleting up to distance characters from word"""
+    found = set()
+    edge = {word}
+    for _ in range(distance):
+        edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))} - found
+        found |= edge
+    return found
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class DeletionIndex:
+    """SymSpell-style lookup of misheard terms in the knowledge-base vocabulary.
+
+    Each vocabulary term is stored under every deletion of up to
+    SPELLING_MAX_DISTANCE characters from its first SPELLING_PREFIX_LENGTH
+    characters. A noisy term generates its own deletions the same way and one
+    indexed query returns the only vocabulary terms that can be within that edit
+    distance, so a lookup costs the same however large the vocabulary is. The
+    tables live in the knowledge base file next to the entries.
+    """
+
+    def __init__(self):
+        self.max_distance = config.SPELLING_MAX_DISTANCE
+        self.prefix_length = config.SPELLING_PREFIX_LENGTH
+
+    def create(self, conn):
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    def clear(self, conn):
+        conn.execute("DELETE FROM vocabulary")
+        conn.execute("DELETE FROM term_deletes")
+
+    def known_terms(self, conn):
+        return {row[0] for row in conn.execute("SELECT term FROM vocabulary")}
+
+    def add_entries(self, conn, entries, known):
+        """Add the terms of (category, subcategory, topic, answer) entries; known is updated in place"""
+        counts = {}
+        for entry in entries:
+            for term in tokenize(" ".join(entry)):
+                counts[term] = counts.get(term, 0) + 1
+
+        conn.executemany("""
+            INSERT INTO vocabulary (term, count) VALUES (?, ?)
+            ON CONFLICT (term) DO UPDATE SET count = count + excluded.count
+        """, counts.items())
+
+        new_terms = [term for term in counts if term not in known and len(term) > 2 and not term.isdigit()]
+        known.update(counts)
+        conn.executemany("INSERT OR IGNORE INTO term_deletes (deletion, term) VALUES (?, ?)",
+                         ((deletion, term) for term in new_terms for deletion in self._deletes(term)))
+
+    def remove_entries(self, conn, entries, known):
+        """Take back the terms of entries that were updated or deleted; known is updated in place.
+
+        Terms no entry uses any more leave the vocabulary and the deletion table,
+        so they are no longer offered as corrections.
+        """
+        counts = {}
+        for entry in entries:
+            for term in tokenize(" ".join(entry)):
+                counts[term] = counts.get(term, 0) + 1
+
+        conn.executemany("UPDATE vocabulary SET count = count - ? WHERE term = ?",
+                         ((count, term) for term, count in counts.items()))
+
+        placeholders = ",".join("?" * len(counts))
+        gone = [row[0] for row in conn.execute(
+            f"SELECT term FROM vocabulary WHERE count <= 0 AND term IN ({placeholders})", list(counts))]
+        conn.executemany("DELETE FROM vocabulary WHERE term = ?", ((term,) for term in gone))
+        conn.executemany("DELETE FROM term_deletes WHERE deletion = ? AND term = ?",
+                         ((deletion, term) for term in gone for deletion in self._deletes(term)))
+        known.difference_update(gone)
+
+    def _deletes(self, term):
+        prefix = term[:self.prefix_length]
+        return deletes(prefix, self.max_distance) | {prefix}
+
+    def correct(self, conn, terms):
+        """Replace terms missing from the vocabulary with their closest vocabulary terms.
+
+        Two unknown neighbours are also tried as one word, for speech-to-text
+        splits like "quad radic". Terms with no close match are kept as they are.
+        """
+        if not terms:
+            return terms
+
+        placeholders = ",".join("?" * len(terms))
+        known = {row[0] for row in conn.execute(
+            f"SELECT term FROM vocabulary WHERE term IN ({placeholders})", list(terms))}
+
+        corrected = []
+        i = 0
+        while i < len(terms):
+            term = terms[i]
+            if term in known or not self._correctable(term):
+                corrected.append(term)
+                i += 1
+                continue
+
+            if i + 1 < len(terms) and terms[i + 1] not in known:
+                joined = self.lookup(conn, term + terms[i + 1])
+                if joined:
+                    corrected.append(joined)
+                    i += 2
+                    continue
+
+            corrected.append(self.lookup(conn, term) or term)
+            i += 1
+        return corrected
+
+    def _correctable(self, term):
+        return len(term) >= config.SPELLING_MIN_LENGTH and not term.isdigit()
+
+    def lookup(self, conn, term):
+        """Closest vocabulary term within the allowed edit distance, the more common one on ties, or None"""
+        # Short words tolerate one edit; two would turn them into almost anything
+        limit = 1 if len(term) < 6 else self.max_distance
+        prefix = term[:self.prefix_length]
+        candidates = deletes(prefix, limit) | {prefix}
+
+        placeholders = ",".join("?" * len(candidates))
+        rows = conn.execute(f"""
+            SELECT DISTINCT v.term, v.count FROM term_deletes d JOIN vocabulary v ON v.term = d.term
+            WHERE d.deletion IN ({placeholders})
+        """, list(candidates)).fetchall()
+
+        best = None
+        for candidate, count in rows:
+            distance = edit_distance(term, candidate, limit)
+            if distance <= limit:
+                key = (distance, -count, candidate)
+                if best is None or key < best:
+                    best = key
+        return best[2] if best else None
@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+import config
+from monitoring import metrics
+
+RELOADS = metrics.REGISTRY.counter("aipa_reloads_total", "Hot reloads that changed something", ("component",))
+
+class HotReloader:
+    """Applies knowledge base and intent keyword changes to a running server.
+
+    Every RELOAD_INTERVAL seconds (or when /reload is requested) the knowledge
+    base catches up with entries changed since the last check, e.g. by
+    python -m nlp.knowledge_base in another process, and the intent keyword file
+    is re-read if it was modified. Only what changed is touched; cached answers
+    that may depend on it are dropped. Spelling corrections are looked up in the
+    vocabulary the import updated in the same transaction, so they follow edits
+    and deletions without a rebuild. Client connections and the face gallery
+    are left alone.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.lock = threading.Lock()
+        self.keywords_mtime = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="reloader")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(config.RELOAD_INTERVAL)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error reloading: {str(e)}")
+
+    def reload(self, force=False):
+        """Apply pending changes now; force re-reads the keyword file even if it looks unchanged"""
+        start = time.time()
+        result = {'knowledge_version': None, 'entries_changed': 0, 'keywords_changed': {}}
+
+        with self.lock:
+            query_processor = self.server.query_processor
+            if query_processor is not None:
+                changed = query_processor.knowledge_base.refresh()
+                if changed is None or changed:
+                    self.server.response_cache.invalidate_intent("academic_query")
+                    RELOADS.inc(component="knowledge_base")
+                result['knowledge_version'] = query_processor.knowledge_base.version
+                result['entries_changed'] = "all" if changed is None else len(changed)
+
+            intent_classifier = self.server.intent_classifier
+            if intent_classifier is not None:
+                mtime = self._mtime(intent_classifier.keywords_path)
+                if force or mtime != self.keywords_mtime:
+                    # Remember it first, so a broken file is reported once rather than every interval
+                    self.keywords_mtime = mtime
+                    changes = intent_classifier.load_keywords()
+                    if changes:
+                        # Cached answers were classified with the old phrases
+                        self.server.response_cache.clear()
+                        RELOADS.inc(component="intent_keywords")
+                    result['keywords_changed'] = {intent: {'added': added, 'removed': removed}
+                                                  for intent, (added, removed) in changes.items()}
+
+        result['seconds'] = time.time() - start
+        if result['entries_changed'] or result['keywords_changed']:
+            print(f"Reloaded {result['entries_changed']} knowledge base entries and "
+                  f"{len(result['keywords_changed'])} intent keyword lists in {result['seconds']:.3f}s")
+        return result
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,123 @@
+import heapq
+import threading
+import config
+from monitoring import metrics
+from nlp.reminder_parser import now_ts
+
+REMINDERS = metrics.REGISTRY.counter("aipa_reminders_total", "Reminders by what happened to them", ("outcome",))
+
+class Reminder:
+    def __init__(self, reminder_id, text, due_ts, classroom):
+        self.id = reminder_id
+        self.text = text
+        self.due_ts = due_ts
+        self.classroom = classroom
+
+    def __lt__(self, other):
+        return (self.due_ts, self.id) < (other.due_ts, other.id)
+
+class ReminderScheduler:
+    """Fires reminders at their due time from one in-process timer heap.
+
+    Pending reminders are read once at startup (through the partial index on
+    incomplete reminders) and new ones are pushed as they are created; the database
+    is only written to when a reminder has been delivered. deliver(reminder) must
+    return True once at least one client of the reminder's classroom received it;
+    otherwise the reminder waits for client_connected() for that classroom, or for
+    any classroom if it has none.
+    """
+
+    def __init__(self, db, deliver):
+        self.db = db
+        self.deliver = deliver
+        self.heap = []
+        self.waiting = {}  # classroom -> reminders that fell due while nobody there was connected
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        metrics.QUEUE_DEPTH.set_function(lambda: len(self.heap), queue="reminders")
+        metrics.QUEUE_DEPTH.set_function(lambda: sum(len(r) for r in self.waiting.values()),
+                                         queue="reminders_waiting")
+
+    def start(self):
+        pending = self.db.get_active_reminders()
+        stale_before = now_ts() - config.REMINDER_STALE_SECONDS
+
+        stale = [r['id'] for r in pending if r['due_ts'] < stale_before]
+        if stale:
+            # Missed by a long outage; reading them out now would only confuse the class
+            self.db.mark_reminders_completed(stale)
+            REMINDERS.inc(len(stale), outcome="expired")
+            print(f"Dropped {len(stale)} reminders that were due more than {config.REMINDER_STALE_SECONDS}s ago")
+
+        with self.condition:
+            self.heap = [Reminder(r['id'], r['text'], r['due_ts'], r['classroom'])
+                         for r in pending if r['due_ts'] >= stale_before]
+            heapq.heapify(self.heap)
+            self.running = True
+        print(f"Reminder scheduler started with {len(self.heap)} pending reminders")
+
+        self.thread = threading.Thread(target=self._run, name="reminders")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def add(self, reminder_id, text, due_ts, classroom):
+        with self.condition:
+            reminder = Reminder(reminder_id, text, due_ts, classroom)
+            heapq.heappush(self.heap, reminder)
+            if self.heap[0] is reminder:
+                # New earliest reminder: wake the timer so it sleeps for the right amount
+                self.condition.notify()
+
+    def client_connected(self, classroom):
+        """Hand over reminders that fell due while the classroom had no client connected.
+
+        Reminders without a classroom go to whichever client connects first.
+        """
+        with self.condition:
+            waiting = self.waiting.pop(classroom, [])
+            if classroom is not None:
+                waiting += self.waiting.pop(None, [])
+        self._fire(waiting)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.heap or self.heap[0].due_ts > now_ts()):
+                    timeout = self.heap[0].due_ts - now_ts() if self.heap else None
+                    self.condition.wait(timeout)
+                if not self.running:
+                    return
+
+                due = []
+                now = now_ts()
+                while self.heap and self.heap[0].due_ts <= now:
+                    due.append(heapq.heappop(self.heap))
+
+            self._fire(due)
+
+    def _fire(self, reminders):
+        delivered = []
+        for reminder in reminders:
+            try:
+                sent = self.deliver(reminder)
+            except Exception as e:
+                print(f"Error delivering reminder {reminder.id}: {str(e)}")
+                sent = False
+
+            if sent:
+                delivered.append(reminder.id)
+                REMINDERS.inc(outcome="delivered")
+            else:
+                with self.condition:
+                    self.waiting.setdefault(reminder.classroom, []).append(reminder)
+                REMINDERS.inc(outcome="waiting")
+
+        if delivered:
+            self.db.mark_reminders_completed(delivered)
@@ -0,0 +1,406 @@
+"""Regression checks for failure paths that are hard to notice on a running server.
+
+Run from the SERVERSIDE directory:
+
+    python selfcheck.py
+
+Every check works on a throwaway database; the configured one is never touched.
+Exits with status 1 if any check fails.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import config
+
+CHECKS = []
+
+def check(function):
+    CHECKS.append(function)
+    return function
+
+def _scratch_database():
+    """A fresh, initialized DatabaseOperations in a temporary directory"""
+    from database.operations import DatabaseOperations
+
+    directory = tempfile.mkdtemp(prefix="aipa-selfcheck-")
+    config.DATABASE_PATH = os.path.join(directory, "academic_assistant.db")
+    config.ARCHIVE_PATH = os.path.join(directory, "archive")
+    db = DatabaseOperations()
+    db.initialize_database()
+    return db, directory
+
+def _scratch_knowledge_base(entries):
+    """A KnowledgeBase in a temporary directory, with entries imported"""
+    from nlp.knowledge_base import KnowledgeBase
+
+    directory = tempfile.mkdtemp(prefix="aipa-selfcheck-")
+    knowledge_base = KnowledgeBase(os.path.join(directory, "knowledge.db"))
+    knowledge_base.import_entries(entries)
+    return knowledge_base, directory
+
+def _vocabulary(knowledge_base):
+    return dict(knowledge_base._get_connection().execute("SELECT term, count FROM vocabulary"))
+
+def _fail_inserts(db, table):
+    """Make every INSERT into table on this thread's connection fail until the trigger is dropped"""
+    db._get_connection().execute(
+        f"CREATE TEMP TRIGGER selfcheck_fail BEFORE INSERT ON {table} "
+        f"BEGIN SELECT RAISE(ABORT, 'injected failure'); END")
+
+def _allow_inserts(db):
+    db._get_connection().execute("DROP TRIGGER IF EXISTS temp.selfcheck_fail")
+
+@check
+def failed_presence_insert_can_be_retried():
+    db, directory = _scratch_database()
+    try:
+        _fail_inserts(db, "attendance")
+        try:
+            db.record_attendance("S002")
+        except Exception:
+            pass
+        else:
+            raise AssertionError("the injected INSERT failure did not surface")
+        _allow_inserts(db)
+
+        assert db.record_attendance("S002"), "retry after a failed INSERT was taken for a repeat"
+        rows = db._get_connection().execute("SELECT COUNT(*) FROM attendance WHERE student_id = 'S002'")
+        assert rows.fetchone()[0] == 1, "retry did not write the attendance row"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def failed_attendance_batch_is_retried():
+    from database.attendance_writer import AttendanceWriter
+
+    db, directory = _scratch_database()
+    config.ATTENDANCE_RETRY_DELAY = 0.01
+    record_presence_batch = db.record_presence_batch
+    attempts = []
+
+    def fail_first_attempt(events):
+        attempts.append(events)
+        if len(attempts) == 1:
+            _fail_inserts(db, "attendance")
+        try:
+            return record_presence_batch(events)
+        finally:
+            _allow_inserts(db)
+
+    try:
+        db.record_presence_batch = fail_first_attempt
+        writer = AttendanceWriter(db)
+        writer.start()
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        writer.record_attendance("S001", now)
+        writer.record_attendance("S003", now)
+        writer.stop()
+        assert len(attempts) >= 2, "the failed batch was not retried"
+
+        # After stop() events are written through rather than queued behind the final drain
+        writer.record_attendance("S004", now)
+
+        rows = db._get_connection().execute("SELECT COUNT(*) FROM attendance")
+        assert rows.fetchone()[0] == 3, "attendance events were lost"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def interrupted_import_gets_its_indexes_back():
+    from database.bulk_import import BulkImporter
+    from database.migrations import INDEXES
+
+    db, directory = _scratch_database()
+    try:
+        importer = BulkImporter(config.DATABASE_PATH)
+        importer._drop_indexes("attendance")  # and then the import dies
+        importer.close()
+
+        db.initialize_database()
+        rows = db._get_connection().execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        names = {row[0] for row in rows}
+        missing = [sql for sql in INDEXES if sql.split()[5] not in names]
+        assert not missing, f"indexes not recreated: {missing}"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def numeric_json_ids_are_imported_as_text():
+    from database.bulk_import import BulkImporter
+
+    db, directory = _scratch_database()
+    try:
+        importer = BulkImporter(config.DATABASE_PATH)
+        importer.import_rows("students", iter([(1, {'id': 7, 'name': "Ada"})]))
+        result = importer.import_rows("performance_metrics", iter([(1, {
+            'student_id': 7, 'subject': "Mathematics", 'metric_type': "quiz", 'value': 90,
+            'timestamp': "2024-01-01 09:00:00"})]))
+        importer.close()
+
+        assert result['imported'] == 1, "metric for a numeric student id was rejected"
+        row = db._get_connection().execute("SELECT typeof(id) FROM students WHERE id = '7'").fetchone()
+        assert row and row[0] == "text", "numeric id was not stored as text"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def backdated_presence_in_archived_month_is_not_duplicated():
+    db, directory = _scratch_database()
+    try:
+        old = "2020-03-02 09:00:00"
+        assert db.record_attendance("S001", old), "backdated attendance was not recorded"
+        db.archive_old_data()
+
+        assert not db.record_attendance("S001", old), "archived attendance was recorded a second time"
+        rows = db._get_connection().execute("SELECT COUNT(*) FROM attendance")
+        assert rows.fetchone()[0] == 0, "duplicate row written to the hot table"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def day_and_time_words_are_not_taken_for_a_classroom():
+    from nlp.reminder_parser import parse_reminder
+
+    for request, classroom in (("us to go to class tomorrow at 9", None),
+                               ("me to bring the posters to class a bit early", None),
+                               ("everyone in class 7a to bring books tomorrow", "class 7a"),
+                               ("me in room b12 to collect the tests at noon", "room b12")):
+        found = parse_reminder(request)[2]
+        assert found == classroom, f"{request!r}: classroom {found!r}, expected {classroom!r}"
+
+@check
+def reminder_without_classroom_reaches_the_next_client():
+    from reminders import Reminder, ReminderScheduler
+
+    db, directory = _scratch_database()
+    try:
+        delivered = []
+        connected = set()
+
+        def deliver(reminder):
+            if reminder.classroom is None and connected or reminder.classroom in connected:
+                delivered.append(reminder.id)
+                return True
+            return False
+
+        scheduler = ReminderScheduler(db, deliver)
+        reminder_id = db.add_reminder("go to class", due_ts=int(time.time()), classroom=None)
+        scheduler._fire([Reminder(reminder_id, "go to class", int(time.time()), None)])
+        assert not delivered, "delivered with no client connected"
+
+        connected.add("room 12")
+        scheduler.client_connected("room 12")
+        assert delivered == [reminder_id], "reminder without a classroom kept waiting"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def knowledge_route_answers_503_while_loading():
+    from types import SimpleNamespace
+    from web_interface.app import ROUTES
+
+    status, _, body = ROUTES['/knowledge'](SimpleNamespace(query_processor=None), {})
+    assert status == 503, f"/knowledge answered {status} before the knowledge base was loaded: {body!r}"
+
+@check
+def reimported_entries_keep_their_term_counts():
+    entries = [("Science", "Biology", "photosynthesis", "Plants turn light into chlorophyll energy"),
+               ("Science", "Biology", "cells", "Cells are the units of life")]
+    knowledge_base, directory = _scratch_knowledge_base(entries)
+    try:
+        before = _vocabulary(knowledge_base)
+        knowledge_base.import_entries(entries)
+        assert _vocabulary(knowledge_base) == before, "re-importing unchanged entries changed the term counts"
+
+        knowledge_base.import_entries([("Science", "Biology", "photosynthesis", "Plants turn light into sugar")])
+        vocabulary = _vocabulary(knowledge_base)
+        assert "chlorophyll" not in vocabulary, "a word edited out of an answer stayed in the vocabulary"
+        assert vocabulary.get("plant") == 1, "the edited entry was counted twice"
+        assert knowledge_base.correct(["chlorophyl"]) == ["chlorophyl"], "corrected towards an edited-out word"
+    finally:
+        shutil.rmtree(directory)
+
+@check
+def synced_deletions_leave_the_vocabulary():
+    entries = [("Mathematics", "Algebra", "quadratic equations", "Use the quadratic formula"),
+               ("Mathematics", "Geometry", "pythagoras", "The hypotenuse squared is the sum of the squares")]
+    knowledge_base, directory = _scratch_knowledge_base(entries)
+    try:
+        knowledge_base.import_entries(entries[:1], sync=True)
+        vocabulary = _vocabulary(knowledge_base)
+        assert "hypotenuse" not in vocabulary, "a deleted topic's words stayed in the vocabulary"
+        assert knowledge_base.correct(["hypotenuze"]) == ["hypotenuze"], "corrected towards a deleted topic"
+        rows = knowledge_base._get_connection().execute("SELECT COUNT(*) FROM term_deletes WHERE term = 'hypotenuse'")
+        assert rows.fetchone()[0] == 0, "deletions of a removed term were left behind"
+    finally:
+        shutil.rmtree(directory)
+
+@check
+def broken_keyword_file_keeps_the_builtin_phrases():
+    from nlp.intent_classifier import IntentClassifier
+
+    directory = tempfile.mkdtemp(prefix="aipa-selfcheck-")
+    try:
+        for content in ('{"attendance": ["who is here"', '{"homework_help": ["help"]}'):
+            path = os.path.join(directory, "intent_keywords.json")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+            classifier = IntentClassifier(path)
+            assert classifier.classify("set a reminder for the quiz") == "reminder", \
+                f"built-in phrases lost after loading {content!r}"
+            try:
+                classifier.load_keywords()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"an explicit reload of {content!r} did not report the error")
+    finally:
+        shutil.rmtree(directory)
+
+@check
+def timed_out_local_job_keeps_its_frame_slot():
+    from cluster.coordinator import WorkerHandle, _PendingJob
+    from cluster.frame_ring import FrameRing, SharedFrame
+
+    ring = FrameRing(slots=1, slot_size=16)
+    try:
+        frame = SharedFrame(ring, ring.acquire(), 4)
+        worker = WorkerHandle("selfcheck", "127.0.0.1", 0, 1, ["recognize"], local=True)
+        worker.pending[1] = _PendingJob()
+
+        worker.discard(1, on_finish=frame.detach().release)
+        frame.release()  # what the server does once submit() has returned
+        assert ring.free_slots() == 0, "the slot was recycled while the timed-out worker could still read it"
+
+        worker.close()
+        assert ring.free_slots() == 1, "the slot was not freed once the worker was lost"
+    finally:
+        ring.close()
+
+@check
+def empty_frame_takes_no_slot():
+    import socket
+    from cluster.frame_ring import FrameRing
+
+    ring = FrameRing(slots=1, slot_size=16)
+    sender, receiver = socket.socketpair()
+    try:
+        assert ring.recv_frame(receiver, 0) is False, "an empty frame was received into a slot"
+        assert ring.free_slots() == 1, "an empty frame kept a slot"
+    finally:
+        sender.close()
+        receiver.close()
+        ring.close()
+
+@check
+def answer_computed_across_an_invalidation_is_not_cached():
+    from nlp.response_cache import ResponseCache
+
+    cache = ResponseCache(max_entries=10, ttl=0)
+    generation = cache.generation
+    cache.invalidate_intent("attendance_query")  # an attendance batch commits meanwhile
+    cache.put("who is here", "attendance_query", "Nobody yet", generation=generation)
+    assert cache.get("who is here") is None, "a stale attendance answer was cached after the invalidation"
+
+    cache.put("who is here", "attendance_query", "S001", generation=cache.generation)
+    assert cache.get("who is here") is not None, "a current answer was not cached"
+
+@check
+def full_attendance_queue_does_not_hold_up_stop():
+    import threading
+    from database.attendance_writer import AttendanceWriter
+
+    db, directory = _scratch_database()
+    queue_size, config.ATTENDANCE_QUEUE_SIZE = config.ATTENDANCE_QUEUE_SIZE, 1
+    record_presence_batch = db.record_presence_batch
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_disk(events):
+        writing.set()
+        release.wait(5)
+        return record_presence_batch(events)
+
+    try:
+        db.record_presence_batch = slow_disk
+        writer = AttendanceWriter(db)
+        writer.start()
+        now = time.strftime("%Y-%m-%d %H:%M:%S")
+        writer.record_attendance("S001", now)
+        assert writing.wait(5), "the writer never started its batch"
+        writer.record_attendance("S002", now)  # fills the queue
+
+        blocked = threading.Thread(target=writer.record_attendance, args=("S003", now))
+        blocked.start()
+        stopping = threading.Thread(target=writer.stop)
+        time.sleep(0.05)
+        stopping.start()
+        time.sleep(0.2)
+        assert writer.stopped, "stop() waited for the lock held by a blocked enqueue"
+
+        release.set()
+        stopping.join(5)
+        blocked.join(5)
+        rows = db._get_connection().execute("SELECT COUNT(*) FROM attendance")
+        assert rows.fetchone()[0] == 3, "attendance events were lost"
+    finally:
+        release.set()
+        config.ATTENDANCE_QUEUE_SIZE = queue_size
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def wide_attendance_range_keeps_the_cached_days():
+    db, directory = _scratch_database()
+    try:
+        today = time.strftime("%Y-%m-%d")
+        db.get_attendance_counts(today)
+        db.get_attendance_counts("2020-01-01", today)
+        assert today in db.summary.days, "a wide range pushed today out of the summary cache"
+        assert len(db.summary.days) <= config.ATTENDANCE_SUMMARY_DAYS, "the summary cache grew past its cap"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+@check
+def attendance_summary_follows_class_changes():
+    db, directory = _scratch_database()
+    try:
+        today = time.strftime("%Y-%m-%d")
+        db.get_attendance_counts(today)
+        conn = db._get_connection()
+        conn.execute("UPDATE students SET class_id = 'Class-C' WHERE id = 'S001'")
+        conn.commit()
+        db.summary.students_loaded_at -= config.ANALYTICS_ROSTER_TTL + 1
+
+        db.record_attendance("S001")
+        counts = dict(db.get_attendance_counts(today))[today]
+        assert counts.get("Class-C") == 1, f"attendance filed under the old class: {counts}"
+    finally:
+        db.close()
+        shutil.rmtree(directory)
+
+def main():
+    failed = 0
+    for function in CHECKS:
+        try:
+            function()
+            print(f"ok   {function.__name__}")
+        except Exception:
+            failed += 1
+            print(f"FAIL {function.__name__}")
+            traceback.print_exc()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
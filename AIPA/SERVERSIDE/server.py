@@ -5,22 +5,46 @@ import time
 import queue
 import os
 import json
-from face_recognition.recognizer import FaceRecognizer
-from nlp.intent_classifier import IntentClassifier
-from nlp.query_processor import QueryProcessor
+from nlp.response_cache import ResponseCache
+from nlp import speech
+from startup import StartupTracker
+from admission import AdmissionController
 from database.operations import DatabaseOperations
+from database.attendance_writer import AttendanceWriter
+from reminders import ReminderScheduler
+from reloader import HotReloader
+from nlp.reminder_parser import parse_reminder
 from web_interface.app import start_web_server
+from monitoring import metrics
+from monitoring.profiler import SamplingProfiler
 import config
 
 class Server:
-    def __init__(self):
+    MESSAGE_TYPES = {1: "frame", 2: "audio", 6: "frame_stats"}
+    
+    def __init__(self, port=None, web_port=None):
+        self.port = port if port is not None else config.SERVER_PORT
+        self.web_port = web_port if web_port is not None else config.WEB_PORT
         self.server_socket = None
         self.clients = []
+        self.send_locks = {}  # client socket -> lock, so pushed reminders don't interleave with answers
+        self.frame_stats = {}  # client address -> frames processed and dropped since the last feedback
         self.running = False
-        self.face_recognizer = FaceRecognizer()
-        self.intent_classifier = IntentClassifier()
-        self.query_processor = QueryProcessor()
+        self.startup = StartupTracker()
+        self.profiler = SamplingProfiler(config.PROFILER_RATE)
+        self.admission = AdmissionController()
+        
+        # Heavy subsystems are loaded in the background by start()
+        self.face_recognizer = None
+        self.intent_classifier = None
+        self.query_processor = None
+        self.speech_recognition = None
+        self.response_cache = ResponseCache()
+        self._register_cache_metrics()
         self.db = DatabaseOperations()
+        self.attendance_writer = AttendanceWriter(self.db, self._on_presence_recorded)
+        self.reminders = ReminderScheduler(self.db, self._deliver_reminder)
+        self.reloader = HotReloader(self)
         
         # Ensure directories exist
         os.makedirs(config.FACE_RECOGNITION_MODEL_PATH, exist_ok=True)
@@ -30,25 +54,38 @@ class Server:
     
     def start(self):
         # Initialize database
-        self.db.initialize_database()
+        self.startup.run_phase("database", self.db.initialize_database)
+        self.attendance_writer.start()
+        self.reminders.start()
+        
+        # Move months outside the hot window into archive partitions, now and daily
+        self.db.archive.start()
+        
+        # Pick up knowledge base and intent keyword changes without a restart
+        self.reloader.start()
         
         # Start the server socket
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', config.SERVER_PORT))
-        self.server_socket.listen(5)
+        self.startup.run_phase("socket", self._open_socket)
         
         self.running = True
-        print(f"Server started on port {config.SERVER_PORT}")
+        print(f"Server started on port {self.port}")
         
         # Start web interface in a separate thread
-        web_thread = threading.Thread(target=start_web_server, args=(config.WEB_PORT,))
+        web_thread = threading.Thread(target=start_web_server, args=(self.web_port, self), name="web")
         web_thread.daemon = True
         web_thread.start()
-        print(f"Web interface started on port {config.WEB_PORT}")
+        print(f"Web interface started on port {self.web_port}")
         
-        # Load face recognition model
-        self.face_recognizer.load_model()
+        # Load the face gallery, STT and NLP in parallel while accepting connections
+        loaders = [
+            self.startup.run_in_background("face_model", self._load_face_recognizer),
+            self.startup.run_in_background("speech", self._load_speech_recognition),
+            self.startup.run_in_background("nlp", self._load_nlp)
+        ]
+        
+        report_thread = threading.Thread(target=self._report_startup, args=(loaders,))
+        report_thread.daemon = True
+        report_thread.start()
         
         # Accept client connections
         while self.running:
@@ -57,27 +94,76 @@ class Server:
                 print(f"New connection from {address}")
                 
                 # Start client handling thread
-                client_thread = threading.Thread(target=self._handle_client, args=(client_socket, address))
+                client_thread = threading.Thread(target=self._handle_client, args=(client_socket, address),
+                                                 name=f"client-{address[0]}:{address[1]}")
                 client_thread.daemon = True
                 client_thread.start()
                 
             except Exception as e:
                 print(f"Error accepting connection: {str(e)}")
     
+    def _open_socket(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(5)
+        
+        # Pick up the real port when bound to port 0
+        self.port = self.server_socket.getsockname()[1]
+    
+    def _load_face_recognizer(self):
+        from face_recognition.recognizer import FaceRecognizer
+        
+        face_recognizer = FaceRecognizer()
+        face_recognizer.load_model()
+        self.face_recognizer = face_recognizer
+    
+    def _load_speech_recognition(self):
+        import speech_recognition
+        self.speech_recognition = speech_recognition
+    
+    def _load_nlp(self):
+        from nlp.intent_classifier import IntentClassifier
+        from nlp.query_processor import QueryProcessor
+        
+        self.intent_classifier = IntentClassifier()
+        self.query_processor = QueryProcessor()
+    
+    def _register_cache_metrics(self):
+        cache_gauge = metrics.REGISTRY.gauge("aipa_response_cache", "Response cache statistics", ("stat",))
+        for stat in ("entries", "hits", "misses", "hit_rate", "evictions", "invalidations"):
+            cache_gauge.set_function(lambda stat=stat: self.response_cache.get_stats()[stat], stat=stat)
+    
+    def _report_startup(self, loaders):
+        for loader in loaders:
+            loader.join()
+        print(self.startup.get_report())
+    
     def stop(self):
         self.running = False
+        self.profiler.stop()
         if self.server_socket:
             self.server_socket.close()
         
         for client in self.clients:
             client[0].close()
         
+        # Commit every queued attendance event before exiting
+        self.attendance_writer.stop()
+        self.reminders.stop()
+        
         print("Server stopped")
     
     def _handle_client(self, client_socket, address):
         # Add client to list
         client_info = (client_socket, address)
+        self.send_locks[client_socket] = threading.Lock()
         self.clients.append(client_info)
+        metrics.CONNECTED_CLIENTS.inc()
+        client_label = address[0]
+        
+        # Reminders that fell due while this classroom was offline
+        self.reminders.client_connected(self._classroom(address))
         
         try:
             while self.running:
@@ -89,15 +175,28 @@ class Server:
                 msg_type, data_len = struct.unpack("!BI", header)
                 
                 # Read data
-                data = self._recv_all(client_socket, data_len)
+                with metrics.STAGE_SECONDS.time(stage="recv"):
+                    data = self._recv_payload(client_socket, msg_type, data_len)
                 if not data:
                     break
                 
-                # Process based on message type
-                if msg_type == 1:  # Frame data
-                    self._process_frame(client_socket, data)
-                elif msg_type == 2:  # Audio data
-                    self._process_audio(client_socket, data)
+                msg_name = self.MESSAGE_TYPES.get(msg_type, "unknown")
+                metrics.MESSAGES.inc(type=msg_name)
+                metrics.BYTES_RECEIVED.inc(data_len, type=msg_name)
+                metrics.IN_FLIGHT.inc(type=msg_name)
+                
+                try:
+                    # Process based on message type
+                    if msg_type == 1:  # Frame data
+                        metrics.FRAMES.inc(client=client_label)
+                        self._admit_frame(client_socket, address, data)
+                    elif msg_type == 2:  # Audio data
+                        self._admit_audio(client_socket, data)
+                    elif msg_type == 6:  # Frame counts from the Pi
+                        self._record_pi_frame_stats(client_label, data)
+                finally:
+                    metrics.IN_FLIGHT.dec(type=msg_name)
+                    self._release_payload(data)
         
         except Exception as e:
             print(f"Error handling client {address}: {str(e)}")
@@ -105,8 +204,18 @@ class Server:
             client_socket.close()
             if client_info in self.clients:
                 self.clients.remove(client_info)
+            self.send_locks.pop(client_socket, None)
+            metrics.CONNECTED_CLIENTS.dec()
+            self.admission.forget(address)
+            self.frame_stats.pop(address, None)
             print(f"Connection from {address} closed")
     
+    def _recv_payload(self, sock, msg_type, n):
+        return self._recv_all(sock, n)
+    
+    def _release_payload(self, data):
+        pass
+    
     def _recv_all(self, sock, n):
         data = b''
         while len(data) < n:
@@ -116,81 +225,122 @@ class Server:
             data += packet
         return data
     
+    def _admit_frame(self, client_socket, address, frame_data):
+        # Frames keep streaming, so just drop them until the gallery is loaded
+        if not self.startup.is_ready("face_model"):
+            metrics.FRAMES_DROPPED.inc(reason="loading")
+            self._note_frame(client_socket, address, None)
+            return
+        
+        # Low-value frame work is thinned or shed first under load
+        shed_reason = self.admission.admit_frame(address)
+        if shed_reason:
+            metrics.FRAMES_DROPPED.inc(reason=shed_reason)
+            self._note_frame(client_socket, address, None)
+            return
+        
+        started = time.monotonic()
+        cpu_start = time.thread_time()
+        try:
+            self._process_frame(client_socket, frame_data)
+        finally:
+            self.admission.release_frame(time.thread_time() - cpu_start)
+            self._note_frame(client_socket, address, time.monotonic() - started)
+    
+    def _record_pi_frame_stats(self, client_label, data):
+        """Frames the Pi sent, skipped because nothing changed, or replaced in its send queue"""
+        stats = json.loads(bytes(data).decode('utf-8'))
+        for outcome in ("sent", "skipped", "replaced"):
+            if stats.get(outcome):
+                metrics.PI_FRAMES.inc(int(stats[outcome]), client=client_label, outcome=outcome)
+    
+    def _note_frame(self, client_socket, address, latency):
+        """Count a processed (latency in seconds) or dropped (None) frame and
+        tell the Pi every FRAME_FEEDBACK_INTERVAL seconds, so it captures at a rate
+        the server actually keeps"""
+        now = time.monotonic()
+        stats = self.frame_stats.get(address)
+        if stats is None:
+            stats = self.frame_stats[address] = {'processed': 0, 'dropped': 0, 'latency': 0.0, 'sent_at': now}
+        
+        if latency is None:
+            stats['dropped'] += 1
+        else:
+            stats['processed'] += 1
+            stats['latency'] = latency if not stats['latency'] else 0.8 * stats['latency'] + 0.2 * latency
+        
+        if now - stats['sent_at'] >= config.FRAME_FEEDBACK_INTERVAL:
+            feedback = {
+                'interval': self.admission.frame_interval,
+                'latency': stats['latency'],
+                'processed': stats['processed'],
+                'dropped': stats['dropped']
+            }
+            stats['processed'] = stats['dropped'] = 0
+            stats['sent_at'] = now
+            self._send_frame_feedback(client_socket, feedback)
+    
+    def _admit_audio(self, client_socket, audio_data):
+        # Spoken questions are never shed, they only wait for an audio slot
+        received_at = time.monotonic()
+        self.admission.acquire_audio()
+        try:
+            self._process_audio(client_socket, audio_data)
+        finally:
+            latency = time.monotonic() - received_at
+            metrics.STAGE_SECONDS.observe(latency, stage="audio_response")
+            self.admission.release_audio(latency)
+    
     def _process_frame(self, client_socket, frame_data):
         # Process the frame for face recognition
-        names = self.face_recognizer.recognize_faces(frame_data)
+        names = self._recognize(frame_data)
         
         if names:
             # Record attendance for recognized faces
             current_time = time.strftime("%Y-%m-%d %H:%M:%S")
             for name in names:
                 # Check if student or teacher
+                # Queued and group-committed by the attendance writer
                 if name.startswith("S_"):  # Student
-                    student_id = name[2:]
-                    self.db.record_attendance(student_id, current_time)
-                    print(f"Recorded attendance for student {student_id}")
+                    self.attendance_writer.record_attendance(name[2:], current_time)
                 elif name.startswith("T_"):  # Teacher
-                    teacher_id = name[2:]
-                    self.db.record_teacher_presence(teacher_id, current_time)
-                    print(f"Recorded presence for teacher {teacher_id}")
+                    self.attendance_writer.record_teacher_presence(name[2:], current_time)
             
             # Send text response
             response = f"Recognized: {', '.join(names)}"
             self._send_text_response(client_socket, response)
     
-    def _process_audio(self, client_socket, audio_data):
-        # Convert audio to text using speech recognition
-        import speech_recognition as sr
-        from io import BytesIO
-        import wave
-        
-        recognizer = sr.Recognizer()
+    def _on_presence_recorded(self, recorded):
+        """Called by the attendance writer after each committed batch"""
+        for kind, person_id, timestamp in recorded:
+            if kind == "student":
+                print(f"Recorded attendance for student {person_id}")
+            else:
+                print(f"Recorded presence for teacher {person_id}")
         
-        # Create a WAV file in memory
-        wav_file = BytesIO()
-        with wave.open(wav_file, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 2 bytes per sample (16-bit)
-            wf.setframerate(16000)
-            wf.writeframes(audio_data)
+        if any(kind == "student" for kind, _, _ in recorded):
+            # Cached "who is here" answers are now stale
+            self.response_cache.invalidate_intent("attendance_query")
+    
+    def _recognize(self, frame_data):
+        return self.face_recognizer.recognize_faces(frame_data)
+    
+    def _process_audio(self, client_socket, audio_data):
+        # Hold the utterance briefly while STT and NLP finish loading
+        for phase in ("speech", "nlp"):
+            if not self.startup.wait(phase, config.STARTUP_AUDIO_WAIT):
+                self._send_text_response(client_socket, "I'm still starting up. Please ask again in a moment.")
+                return
         
-        wav_file.seek(0)
+        sr = self.speech_recognition
         
         try:
-            with sr.AudioFile(wav_file) as source:
-                audio = recognizer.record(source)
-                text = recognizer.recognize_google(audio)
-                print(f"Recognized speech: {text}")
-                
-                # Process the intent
-                intent = self.intent_classifier.classify(text)
-                
-                if intent == "attendance_query":
-                    # Query attendance information
-                    response = self.db.get_attendance_summary()
-                    self._send_text_response(client_socket, response)
-                
-                elif intent == "academic_query":
-                    # Process academic question
-                    answer = self.query_processor.process_query(text)
-                    self._send_text_response(client_socket, answer)
-                    
-                    # Send audio response
-                    self._generate_and_send_audio(client_socket, answer)
-                
-                elif intent == "reminder":
-                    # Set a reminder
-                    parts = text.lower().split("remind")
-                    if len(parts) > 1:
-                        reminder_text = parts[1].strip()
-                        self.db.add_reminder(reminder_text)
-                        response = f"Reminder set: {reminder_text}"
-                        self._send_text_response(client_socket, response)
-                
-                else:
-                    # General conversation
-                    response = "I'm your academic assistant. How can I help you with your classes today?"
-                    self._send_text_response(client_socket, response)
+            # Convert audio to text using speech recognition
+            with metrics.STAGE_SECONDS.time(stage="stt"):
+                text = self._transcribe(audio_data)
+            print(f"Recognized speech: {text}")
+            
+            self._answer_query(client_socket, text)
         
         except sr.UnknownValueError:
             self._send_text_response(client_socket, "Sorry, I didn't understand that.")
@@ -200,6 +350,10 @@ class Server:
             print(f"Error processing audio: {str(e)}")
             self._send_text_response(client_socket, "Sorry, an error occurred.")
     
+    def _transcribe(self, audio_data):
+        """Convert raw 16 kHz 16-bit mono PCM to text"""
+        return speech.transcribe(self.speech_recognition, audio_data)
+    
     def _send_text_response(self, client_socket, text):
         try:
             # Encode text to bytes
@@ -209,47 +363,179 @@ class Server:
             header = struct.pack("!BI", 4, len(text_bytes))  # 4 = text response
             
             # Send header followed by data
-            client_socket.sendall(header + text_bytes)
+            self._send(client_socket, header + text_bytes)
         except Exception as e:
             print(f"Error sending text response: {str(e)}")
     
-    def _generate_and_send_audio(self, client_socket, text):
+    def _send_frame_feedback(self, client_socket, feedback):
         try:
-            import pyttsx3
-            
-            # Initialize the TTS engine
-            engine = pyttsx3.init()
-            
-            # Set properties
-            engine.setProperty('rate', 150)  # Speed of speech
-            engine.setProperty('volume', 0.9)  # Volume (0.0 to 1.0)
-            
-            # Save speech to a BytesIO object
-            import io
-            output = io.BytesIO()
-            
-            def save_to_buffer(audio):
-                output.write(audio)
-            
-            engine.connect('write', save_to_buffer)
-            engine.say(text)
-            engine.runAndWait()
+            feedback_bytes = json.dumps(feedback).encode('utf-8')
+            header = struct.pack("!BI", 5, len(feedback_bytes))  # 5 = frame feedback
+            self._send(client_socket, header + feedback_bytes)
+        except Exception as e:
+            print(f"Error sending frame feedback: {str(e)}")
+    
+    def _answer_query(self, client_socket, text):
+        # Serve repeated questions straight from the response cache
+        cached = self.response_cache.get(text)
+        if cached:
+            self._send_text_response(client_socket, cached.response)
             
-            # Get the audio data
-            audio_data = output.getvalue()
+            if cached.audio:
+                self._send_audio_response(client_socket, cached.audio)
+            elif cached.intent == "academic_query":
+                audio_data = self._generate_and_send_audio(client_socket, cached.response)
+                self.response_cache.set_audio(text, audio_data)
+            return
+        
+        # Process the intent
+        with metrics.STAGE_SECONDS.time(stage="intent"):
+            intent = self.intent_classifier.classify(text)
+        generation = self.response_cache.generation
+        
+        if intent == "attendance_query":
+            # Query attendance information
+            with metrics.STAGE_SECONDS.time(stage="query"):
+                response = self.db.get_attendance_summary()
+            self._send_text_response(client_socket, response)
+            self.response_cache.put(text, intent, response, generation=generation)
+        
+        elif intent == "academic_query":
+            # Process academic question
+            with metrics.STAGE_SECONDS.time(stage="query"):
+                answer = self.query_processor.process_query(text)
+            self._send_text_response(client_socket, answer)
             
+            # Send audio response
+            audio_data = self._generate_and_send_audio(client_socket, answer)
+            self.response_cache.put(text, intent, answer, audio_data, generation=generation)
+        
+        elif intent == "reminder":
+            # Set a reminder (never cached, it has side effects)
+            parts = text.lower().split("remind", 1)
+            if len(parts) > 1:
+                self._set_reminder(client_socket, parts[1])
+        
+        else:
+            # General conversation
+            response = "I'm your academic assistant. How can I help you with your classes today?"
+            self._send_text_response(client_socket, response)
+            self.response_cache.put(text, intent, response)
+    
+    def _set_reminder(self, client_socket, request):
+        reminder_text, due_ts, spoken_classroom = parse_reminder(request)
+        if not reminder_text:
+            self._send_text_response(client_socket, "What should I remind you about?")
+            return
+        
+        # Reminders go to the classroom that asked unless another one is named
+        classroom = self._find_classroom(spoken_classroom)
+        if classroom is None:
+            address = next((a for s, a in list(self.clients) if s is client_socket), None)
+            classroom = self._classroom(address) if address else None
+        
+        reminder_id = self.db.add_reminder(reminder_text, due_ts=due_ts, classroom=classroom)
+        self.reminders.add(reminder_id, reminder_text, due_ts, classroom)
+        
+        due = time.strftime("%a %H:%M", time.gmtime(due_ts))
+        self._send_text_response(client_socket, f"Reminder set for {due}: {reminder_text}")
+    
+    def _classroom(self, address):
+        return config.CLASSROOMS.get(address[0], address[0])
+    
+    def _find_classroom(self, spoken):
+        """The configured classroom a spoken name like "class b" refers to, if any"""
+        if not spoken:
+            return None
+        key = "".join(c for c in spoken.lower() if c.isalnum())
+        for classroom in set(config.CLASSROOMS.values()):
+            if "".join(c for c in classroom.lower() if c.isalnum()) == key:
+                return classroom
+        return None
+    
+    def _deliver_reminder(self, reminder):
+        """Push a due reminder to every client in its classroom; False if none is connected"""
+        targets = [s for s, a in list(self.clients)
+                   if reminder.classroom is None or self._classroom(a) == reminder.classroom]
+        if not targets:
+            return False
+        
+        message = f"Reminder: {reminder.text}"
+        audio_data = None
+        if config.REMINDER_SPEAK:
+            try:
+                with metrics.STAGE_SECONDS.time(stage="tts"):
+                    audio_data = self._synthesize_speech(message)
+            except Exception as e:
+                print(f"Error synthesizing reminder: {str(e)}")
+        
+        for client_socket in targets:
+            self._send_text_response(client_socket, message)
+            if audio_data:
+                self._send_audio_response(client_socket, audio_data)
+        print(f"Delivered reminder {reminder.id} to {len(targets)} client(s)")
+        return True
+    
+    def _send(self, client_socket, message):
+        lock = self.send_locks.get(client_socket)
+        if lock is None:
+            client_socket.sendall(message)
+        else:
+            with lock:
+                client_socket.sendall(message)
+    
+    def _send_audio_response(self, client_socket, audio_data):
+        try:
             # Prepare header (message type + data length)
             header = struct.pack("!BI", 3, len(audio_data))  # 3 = audio response
             
             # Send header followed by data
-            client_socket.sendall(header + audio_data)
+            self._send(client_socket, header + audio_data)
+        except Exception as e:
+            print(f"Error sending audio response: {str(e)}")
+    
+    def _synthesize_speech(self, text):
+        return speech.synthesize(text)
+    
+    def _generate_and_send_audio(self, client_socket, text):
+        """Synthesize text and send it; returns the audio bytes (None on failure)"""
+        try:
+            with metrics.STAGE_SECONDS.time(stage="tts"):
+                audio_data = self._synthesize_speech(text)
         except Exception as e:
-            print(f"Error generating/sending audio: {str(e)}")
+            print(f"Error generating audio: {str(e)}")
+            return None
+        
+        self._send_audio_response(client_socket, audio_data)
+        return audio_data
 
 if __name__ == "__main__":
-    server = Server()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="AI academic assistant server")
+    parser.add_argument("--mode", choices=["standalone", "frontend", "worker"], default="standalone",
+                        help="standalone does everything in one process; frontend dispatches to worker nodes")
+    parser.add_argument("--port", type=int, help="client port (frontend/standalone) or job port (worker)")
+    parser.add_argument("--coordinator", help="coordinator host:port for worker mode")
+    parser.add_argument("--capacity", type=int, help="concurrent jobs per worker")
+    args = parser.parse_args()
+    
+    if args.mode == "worker":
+        from cluster.worker import RecognitionWorker
+        
+        coordinator_address = None
+        if args.coordinator:
+            host, port = args.coordinator.rsplit(":", 1)
+            coordinator_address = (host, int(port))
+        server = RecognitionWorker(args.port or 0, coordinator_address, args.capacity)
+    elif args.mode == "frontend":
+        from cluster.frontend import FrontEndServer
+        server = FrontEndServer(args.port)
+    else:
+        server = Server(args.port)
+    
     try:
         server.start()
     except KeyboardInterrupt:
         print("Shutting down server...")
-        server.stop()
\ No newline at end of file
+        server.stop()
@@ -0,0 +1,89 @@
+import threading
+import time
+
+class StartupTracker:
+    """Runs startup phases (in the foreground or background) and tracks their readiness and timings"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.phases = {}
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def _event(self, name):
+        with self.lock:
+            if name not in self.events:
+                self.events[name] = threading.Event()
+            return self.events[name]
+
+    def run_phase(self, name, func, *args):
+        """Run a phase in the calling thread and record how long it took"""
+        event = self._event(name)
+        start = time.time()
+        status = "ready"
+        error = None
+
+        try:
+            return func(*args)
+        except Exception as e:
+            status = "failed"
+            error = str(e)
+            print(f"Startup phase '{name}' failed: {error}")
+        finally:
+            with self.lock:
+                self.phases[name] = {
+                    'status': status,
+                    'offset': start - self.started,
+                    'duration': time.time() - start,
+                    'error': error
+                }
+            # Wake waiters whether the phase succeeded or failed
+            event.set()
+
+    def run_in_background(self, name, func, *args):
+        """Run a phase in its own daemon thread"""
+        self._event(name)
+        with self.lock:
+            self.phases[name] = {'status': "loading", 'offset': time.time() - self.started,
+                                 'duration': None, 'error': None}
+
+        thread = threading.Thread(target=self.run_phase, args=(name, func) + args, name=f"startup-{name}")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def is_ready(self, name):
+        with self.lock:
+            phase = self.phases.get(name)
+            return phase is not None and phase['status'] == "ready"
+
+    def wait(self, name, timeout=None):
+        """Block until the phase has finished; returns False on timeout or failure"""
+        self._event(name).wait(timeout)
+        return self.is_ready(name)
+
+    def is_failed(self, name):
+        with self.lock:
+            phase = self.phases.get(name)
+            return phase is not None and phase['status'] == "failed"
+
+    def all_done(self):
+        with self.lock:
+            return all(p['status'] != "loading" for p in self.phases.values())
+
+    def get_report(self):
+        """Per-phase startup timing report"""
+        with self.lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1]['offset'])
+
+        lines = ["Startup timing:"]
+        for name, phase in phases:
+            if phase['duration'] is None:
+                lines.append(f"- {name}: {phase['status']} (started at +{phase['offset'] * 1000:.1f} ms)")
+            else:
+                line = f"- {name}: {phase['status']} in {phase['duration'] * 1000:.1f} ms (started at +{phase['offset'] * 1000:.1f} ms)"
+                if phase['error']:
+                    line += f" - {phase['error']}"
+                lines.append(line)
+
+        return "\n".join(lines)
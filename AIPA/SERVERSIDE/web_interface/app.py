@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import sys
+sys.path.append('..')
+from monitoring.metrics import REGISTRY
+import config
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class WebInterfaceHandler(BaseHTTPRequestHandler):
+    # Set by start_web_server
+    server_app = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._send(404, "text/plain; charset=utf-8", "Not found\n")
+            return
+
+        try:
+            status, content_type, body = route(self.server_app, params)
+        except Exception as e:
+            status, content_type, body = 500, "text/plain; charset=utf-8", f"Error: {str(e)}\n"
+
+        self._send(status, content_type, body)
+
+    def _send(self, status, content_type, body):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapers hit /metrics every few seconds; keep the console quiet
+        pass
+
+def _metrics(server_app, params):
+    return 200, PROMETHEUS_CONTENT_TYPE, REGISTRY.render()
+
+def _status(server_app, params):
+    status = {'clients': 0, 'startup': None}
+    if server_app is not None:
+        status['clients'] = len(server_app.clients)
+        status['startup'] = server_app.startup.get_report()
+    return 200, "application/json", json.dumps(status)
+
+def _profiler_start(server_app, params):
+    server_app.profiler.start(params.get('rate'))
+    return 200, "application/json", json.dumps(server_app.profiler.get_status())
+
+def _profiler_stop(server_app, params):
+    server_app.profiler.stop()
+    return 200, "application/json", json.dumps(server_app.profiler.get_status())
+
+def _profiler_dump(server_app, params):
+    """Return the collapsed stacks and keep a copy on disk for flamegraph tools"""
+    filename = time.strftime("profile-%Y%m%d-%H%M%S.collapsed")
+    server_app.profiler.dump(os.path.join(config.PROFILE_OUTPUT_PATH, filename))
+
+    body = server_app.profiler.get_collapsed()
+    if params.get('reset') == '1':
+        server_app.profiler.reset()
+    return 200, "text/plain; charset=utf-8", body
+
+def _cluster(server_app, params):
+    coordinator = getattr(server_app, 'coordinator', None)
+    if coordinator is None:
+        return 404, "text/plain; charset=utf-8", "Not running in front-end mode\n"
+    return 200, "application/json", json.dumps(coordinator.get_status())
+
+def _analytics_class(server_app, params):
+    window_days = int(params['window_days']) if params.get('window_days') else None
+    report = server_app.db.get_class_report(params.get('class_id'), window_days)
+    return 200, "application/json", json.dumps(report)
+
+def _analytics_trend(server_app, params):
+    if not params.get('student_id') or not params.get('subject'):
+        return 400, "text/plain; charset=utf-8", "student_id and subject are required\n"
+    trend = server_app.db.get_performance_trend(params['student_id'], params['subject'])
+    return 200, "application/json", json.dumps(trend)
+
+def _knowledge(server_app, params):
+    """Categories with their topic counts, or one page of a category's topics"""
+    if server_app.query_processor is None:
+        # Set by the background "nlp" startup phase
+        return 503, "text/plain; charset=utf-8", "Knowledge base is still loading\n"
+    knowledge_base = server_app.query_processor.knowledge_base
+    if not params.get('category'):
+        return 200, "application/json", json.dumps(knowledge_base.categories())
+
+    page = int(params['page']) if params.get('page') else 0
+    topics = knowledge_base.topics(params['category'], params.get('subcategory'), page)
+    return 200, "application/json", json.dumps([
+        {'subcategory': d.subcategory, 'topic': d.topic, 'answer': d.answer} for d in topics])
+
+def _reload(server_app, params):
+    """Apply knowledge base and intent keyword changes now instead of at the next interval"""
+    return 200, "application/json", json.dumps(server_app.reloader.reload(force=True))
+
+ROUTES = {
+    '/metrics': _metrics,
+    '/status': _status,
+    '/profiler/start': _profiler_start,
+    '/profiler/stop': _profiler_stop,
+    '/profiler/dump': _profiler_dump,
+    '/cluster': _cluster,
+    '/analytics/class': _analytics_class,
+    '/analytics/trend': _analytics_trend,
+    '/knowledge': _knowledge,
+    '/reload': _reload
+}
+
+def create_web_server(port, server_app=None):
+    handler = type("BoundWebInterfaceHandler", (WebInterfaceHandler,), {'server_app': server_app})
+    return ThreadingHTTPServer(('0.0.0.0', port), handler)
+
+def start_web_server(port, server_app=None):
+    """Serve the web interface until the process exits (run in a daemon thread)"""
+    httpd = create_web_server(port, server_app)
+    httpd.daemon_threads = True
+    httpd.serve_forever()
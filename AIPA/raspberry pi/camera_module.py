@@ -1,44 +1,171 @@
 import io
 import time
 import threading
+import numpy as np
 import picamera
 import config
 
+class FrameRateController:
+    """Picks the capture interval and JPEG quality from how frames are faring.
+
+    The server reports (message type 5) the interval its admission control
+    currently accepts frames at, its recent processing latency and how many frames
+    it dropped; frames sent faster than that would only be discarded. A full local
+    send queue means Wi-Fi can't keep up, so frames are also made smaller.
+    """
+
+    def __init__(self):
+        self.min_interval = 1.0 / config.CAMERA_MAX_FPS
+        self.interval = self.min_interval
+        self.quality = config.CAMERA_JPEG_QUALITY
+
+    def update(self, feedback, queue_full):
+        if queue_full:
+            self.interval *= 1.25
+            self.quality = max(config.CAMERA_MIN_QUALITY, self.quality - 10)
+
+        if feedback is not None:
+            if feedback['dropped']:
+                # The server shed frames: back off quickly
+                self.interval *= 1.5
+            else:
+                # Everything was processed: speed up gradually
+                self.interval *= 0.9
+                if not queue_full:
+                    self.quality = min(config.CAMERA_JPEG_QUALITY, self.quality + 5)
+            self.interval = max(self.interval, feedback['interval'], feedback['latency'])
+
+        self.interval = min(max(self.interval, self.min_interval), config.CAMERA_MAX_INTERVAL)
+
+class MotionGate:
+    """Decides from tiny luma frames whether a frame is worth sending.
+
+    Each luma frame is compared with the one taken when a frame was last sent,
+    so slow changes add up until they count. A frame is also let through every
+    MOTION_KEEPALIVE seconds, so the server still sees a static classroom now
+    and then.
+    """
+
+    def __init__(self):
+        self.reference = None
+        self.passed_at = 0.0
+
+    def check(self, luma, now):
+        if self.reference is not None and now - self.passed_at < config.MOTION_KEEPALIVE:
+            changed = np.count_nonzero(np.abs(luma - self.reference) > config.MOTION_PIXEL_THRESHOLD)
+            if changed < config.MOTION_AREA_THRESHOLD * luma.size:
+                return False
+
+        self.reference = luma
+        self.passed_at = now
+        return True
+
 class CameraModule:
     def __init__(self, network_client):
         self.network_client = network_client
         self.camera = None
         self.running = False
+        self.controller = FrameRateController()
+        self.gate = MotionGate()
         
+        # Reported to the server every FRAME_STATS_INTERVAL seconds; sent and replaced
+        # are the network client's counts at the last report
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.frames_replaced = 0
+        self.stats_reported_at = time.monotonic()
+
     def start_streaming(self):
         self.running = True
         self.camera = picamera.PiCamera()
         self.camera.resolution = config.CAMERA_RESOLUTION
         self.camera.framerate = config.CAMERA_FRAMERATE
-        
+
         # Let camera warm up
         time.sleep(2)
-        
+
         print("Camera module started")
-        
+
+        # One buffer for every frame; send_frame gets its own copy of the bytes
+        stream = io.BytesIO()
+        luma_stream = io.BytesIO()
+        next_capture = time.monotonic()
+
         try:
             while self.running:
-                # Capture frame
-                stream = io.BytesIO()
-                self.camera.capture(stream, format='jpeg', use_video_port=True)
-                frame = stream.getvalue()
-                
-                # Send frame to server
-                self.network_client.send_frame(frame)
-                
-                # Small delay to control frame rate
-                time.sleep(0.1)
-                
+                if not self._wait_for_change(luma_stream):
+                    break
+
+                # The encoder quality is fixed per capture sequence, so a quality
+                # change restarts the sequence
+                quality = self.controller.quality
+                for _ in self.camera.capture_continuous(stream, format='jpeg', use_video_port=True,
+                                                        quality=quality):
+                    # Send frame to server
+                    self.network_client.send_frame(stream.getvalue())
+                    stream.seek(0)
+                    stream.truncate()
+
+                    self.controller.update(self.network_client.take_frame_feedback(),
+                                           self.network_client.frame_queue_full())
+                    if not self.running or self.controller.quality != quality:
+                        break
+
+                    # Pace captures by the adaptive interval, counting the time spent encoding
+                    now = time.monotonic()
+                    next_capture = max(next_capture + self.controller.interval, now)
+                    time.sleep(next_capture - now)
+
+                    if not self._wait_for_change(luma_stream):
+                        break
+
         except Exception as e:
             print(f"Camera error: {str(e)}")
         finally:
             if self.camera:
                 self.camera.close()
-    
+
+    def _wait_for_change(self, luma_stream):
+        """Hold the next JPEG capture until the scene changed or a keep-alive is due.
+
+        Returns False once streaming was stopped. Checking a luma frame costs a
+        resize on the GPU and a few thousand byte comparisons, against a JPEG
+        encode, a Wi-Fi transfer and a face detection pass for a frame the
+        server would find nothing new in.
+        """
+        while self.running:
+            self._report_stats()
+            if not config.MOTION_GATING or self.gate.check(self._capture_luma(luma_stream), time.monotonic()):
+                return True
+
+            self.frames_skipped += 1
+            time.sleep(self.controller.interval)
+        return False
+
+    def _capture_luma(self, luma_stream):
+        # YUV from a separate splitter port, so the JPEG capture sequence keeps its encoder
+        luma_stream.seek(0)
+        self.camera.capture(luma_stream, format='yuv', use_video_port=True, resize=config.MOTION_SIZE,
+                            splitter_port=2)
+        width, height = config.MOTION_SIZE
+        # The Y plane comes first; signed, so differences don't wrap around
+        return np.frombuffer(luma_stream.getvalue(), dtype=np.uint8, count=width * height).astype(np.int16)
+
+    def _report_stats(self):
+        now = time.monotonic()
+        if now - self.stats_reported_at < config.FRAME_STATS_INTERVAL:
+            return
+
+        # Queued frames may still be replaced, so only those on the wire count as sent
+        sent = self.network_client.frames_sent
+        replaced = self.network_client.frames_replaced
+        stats = {'sent': sent - self.frames_sent, 'skipped': self.frames_skipped,
+                 'replaced': replaced - self.frames_replaced}
+        if self.network_client.send_frame_stats(stats):
+            self.frames_sent = sent
+            self.frames_skipped = 0
+            self.frames_replaced = replaced
+        self.stats_reported_at = now
+
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
@@ -3,4 +3,15 @@ SERVER_PORT = 5000
 CAMERA_RESOLUTION = (640, 480)
 CAMERA_FRAMERATE = 30
 AUDIO_RATE = 16000
-AUDIO_CHUNK = 1024
\ No newline at end of file
+AUDIO_CHUNK = 1024
+CAMERA_MAX_FPS = 10  # frames sent per second at most; fewer when the server or the link falls behind
+CAMERA_MAX_INTERVAL = 2.0  # seconds between frames at most
+CAMERA_JPEG_QUALITY = 85  # JPEG quality when the link keeps up
+CAMERA_MIN_QUALITY = 40  # lowest JPEG quality used while the send queue is backed up
+FRAME_SEND_QUEUE = 2  # frames waiting to be sent; older ones are replaced by newer ones
+MOTION_GATING = True  # only send frames when the scene changed (plus keep-alives)
+MOTION_SIZE = (64, 48)  # luma frame compared for changes (multiples of 32 x 16)
+MOTION_PIXEL_THRESHOLD = 25  # brightness change (0-255) that counts a pixel as changed
+MOTION_AREA_THRESHOLD = 0.02  # share of changed pixels that counts as a scene change
+MOTION_KEEPALIVE = 10.0  # seconds between frames sent even when nothing changed
+FRAME_STATS_INTERVAL = 5.0  # seconds between sent/skipped frame counts reported to the server
\ No newline at end of file
@@ -1,8 +1,10 @@
 import socket
 import json
+import queue
 import struct
 import threading
 import time
+import config
 
 class NetworkClient:
     def __init__(self, server_ip, server_port):
@@ -11,6 +13,19 @@ class NetworkClient:
         self.socket = None
         self.connected = False
         self.response_handler_thread = None
+        self.sender_thread = None
+        self.send_lock = threading.Lock()  # camera and microphone share the socket
+        
+        # Frames wait here for the sender thread; when the link falls behind the
+        # oldest waiting frame is replaced, since only the newest one is worth sending.
+        # The load test imports this module next to the server's config, which has no
+        # FRAME_SEND_QUEUE, hence the default.
+        self.frame_queue = queue.Queue(maxsize=getattr(config, "FRAME_SEND_QUEUE", 2))
+        self.frames_sent = 0  # written to the socket by the sender thread
+        self.frames_replaced = 0
+        
+        # Latest frame feedback from the server (message type 5), see take_frame_feedback
+        self.frame_feedback = None
     
     def connect(self):
         try:
@@ -23,6 +38,11 @@ class NetworkClient:
             self.response_handler_thread.daemon = True
             self.response_handler_thread.start()
             
+            # Start frame sender thread
+            self.sender_thread = threading.Thread(target=self._send_frames)
+            self.sender_thread.daemon = True
+            self.sender_thread.start()
+            
             print(f"Connected to server at {self.server_ip}:{self.server_port}")
             return True
         except Exception as e:
@@ -37,18 +57,61 @@ class NetworkClient:
             print("Disconnected from server")
     
     def send_frame(self, frame_data):
+        """Queue a frame for the sender thread; returns at once"""
         if not self.connected:
             return False
         
-        try:
-            # Prepare header (message type + data length)
-            header = struct.pack("!BI", 1, len(frame_data))  # 1 = frame data
+        while True:
+            try:
+                self.frame_queue.put_nowait(frame_data)
+                return True
+            except queue.Full:
+                try:
+                    self.frame_queue.get_nowait()
+                    self.frames_replaced += 1
+                except queue.Empty:
+                    pass
+    
+    def frame_queue_full(self):
+        return self.frame_queue.full()
+    
+    def take_frame_feedback(self):
+        """The server's latest frame feedback, or None if nothing new arrived since the last call"""
+        feedback, self.frame_feedback = self.frame_feedback, None
+        return feedback
+    
+    def _send_frames(self):
+        while self.connected:
+            try:
+                frame_data = self.frame_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
             
-            # Send header followed by data
-            self.socket.sendall(header + frame_data)
+            try:
+                # Prepare header (message type + data length)
+                header = struct.pack("!BI", 1, len(frame_data))  # 1 = frame data
+                
+                # Send header followed by data
+                with self.send_lock:
+                    self.socket.sendall(header + frame_data)
+                self.frames_sent += 1
+            except Exception as e:
+                print(f"Error sending frame: {str(e)}")
+                self.connected = False
+    
+    def send_frame_stats(self, stats):
+        """Report how many frames the Pi sent, skipped and replaced (message type 6)"""
+        if not self.connected:
+            return False
+        
+        try:
+            stats_bytes = json.dumps(stats).encode('utf-8')
+            header = struct.pack("!BI", 6, len(stats_bytes))  # 6 = frame stats
+            with self.send_lock:
+                self.socket.sendall(header + stats_bytes)
             return True
         except Exception as e:
-            print(f"Error sending frame: {str(e)}")
+            print(f"Error sending frame stats: {str(e)}")
             self.connected = False
             return False
     
@@ -61,7 +124,8 @@ class NetworkClient:
             header = struct.pack("!BI", 2, len(audio_data))  # 2 = audio data
             
             # Send header followed by data
-            self.socket.sendall(header + audio_data)
+            with self.send_lock:
+                self.socket.sendall(header + audio_data)
             return True
         except Exception as e:
             print(f"Error sending audio: {str(e)}")
@@ -100,6 +164,9 @@ class NetworkClient:
                     text = data.decode('utf-8')
                     print(f"Server: {text}")
                 
+                elif msg_type == 5:  # Frame feedback
+                    self.frame_feedback = json.loads(data.decode('utf-8'))
+                
             except Exception as e:
                 print(f"Error handling server response: {str(e)}")
                 self.connected = False